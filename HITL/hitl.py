@@ -1,25 +1,14 @@
-from typing_extensions import TypedDict, Literal
-from langgraph.graph import StateGraph, START, END, MessagesState
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.types import interrupt, Command
-from dotenv import load_dotenv
-import os
+from typing import TYPE_CHECKING
+from functools import lru_cache
 
-# --- Setup ---
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+# shared helpers come from the workflows package; run from the repository root: python -m HITL.hitl
 
-llm = ChatOpenAI(model="gpt-4.1-mini")
+if TYPE_CHECKING:
+    from langgraph.graph import MessagesState
 
-sys_message = SystemMessage(
-    content=(
-        "You are an AI assistant with access to the following mathematical tools: "
-        "add, multiply, subtract, divide. Use these tools to perform calculations as needed."
-    )
-)
+# --- Setup ---
+# langgraph, the model client and the checkpoint database are set up by build_graph();
+# the system prompt is the "calculator_assistant" template in workflows/prompts.py
 
 # --- Define tools ---
 def add(a: int, b: int) -> int:
@@ -39,49 +28,139 @@ def divide(a: int, b: int) -> float:
     return 0 if b == 0 else a / b
 
 tools = [add, multiply, subtract, divide]
-llm_with_tools = llm.bind_tools(tools)
+
+@lru_cache(maxsize=None)
+def get_llm_with_tools():
+    from dotenv import load_dotenv
+    from workflows.models import chat_model
+    load_dotenv()
+    return chat_model(model="gpt-4.1-mini").bind_tools(tools)
 
 # --- Assistant node ---
-def assistant(state: MessagesState):
-    human_decision = interrupt({
-        "prompt": "About to call tool for computation. Do you want to continue?",
-        "latest_message": state["messages"][-1].content
+def assistant(state: "MessagesState"):
+    from workflows.prompts import with_history
+    from workflows.rate_limit import call_priority
+    # system prompt first: every turn's prompt then extends the previous one, which providers cache
+    with call_priority("interactive"):
+        response = get_llm_with_tools().invoke(with_history("calculator_assistant", state["messages"]))
+    return {"messages": [response]}  # MessagesState appends, so return only the new message
+
+# --- Review node ---
+# Runs only when the assistant proposed tool calls. Calls the policy allows
+# (workflows/approvals.py) go straight to the tools; otherwise the thread is
+# paused until someone answers {"proceed": bool, "reason": str}. A rejection
+# rejects every call of that turn and lets the assistant answer without them.
+def human_review(state: "MessagesState"):
+    from langchain_core.messages import ToolMessage
+    from langgraph.types import Command, interrupt
+    from workflows.approvals import get_policy
+    policy = get_policy()
+    proposed = state["messages"][-1].tool_calls
+    approved, review = policy.split(proposed)
+    if not review:
+        policy.record(len(approved), 0)
+        return Command(goto="tools")
+    decision = interrupt({
+        "prompt": "The assistant wants to call tools. Do you want to continue?",
+        "latest_message": next((m.content for m in reversed(state["messages"]) if m.type == "human"), ""),
+        "tool_calls": [{"id": call["id"], "name": call["name"], "args": call["args"], "reason": reason}
+                       for call, reason in review],
     })
-    if human_decision.get("proceed", False):
-        response = llm_with_tools.invoke(state["messages"] + [sys_message])
-        return {"messages": state["messages"] + [response]}
-    else:
-        return {"messages": state["messages"] + [AIMessage(content="Operation cancelled.")], "__next__": END}
+    policy.record(len(approved), len(review))
+    if (decision or {}).get("proceed", False):
+        return Command(goto="tools")
+    reason = (decision or {}).get("reason") or "rejected by the reviewer"
+    rejected = [ToolMessage(content=f"Tool call not executed: {reason}.", tool_call_id=call["id"], name=call["name"])
+                for call in proposed]
+    return Command(goto="assistant", update={"messages": rejected})
 
 # --- Build graph ---
-builder = StateGraph(MessagesState)
-builder.add_node("assistant", assistant)
-builder.add_node("tools", ToolNode(tools))
-builder.add_edge(START, "assistant")
-builder.add_conditional_edges(
-    "assistant",
-    tools_condition,
-    {"tools": "tools", "__end__": END},
-)
-builder.add_edge("tools", "assistant")
-
-graph = builder.compile(checkpointer=MemorySaver())
-config = {"configurable": {"thread_id": "123"}}
-initial_input = {"messages": [HumanMessage(content="What is 123 multiplied by 2 and then plus 123?")]}
-next_input = initial_input
-while True:
-    result = graph.invoke(next_input, config=config)
+@lru_cache(maxsize=None)
+def build_graph():
+    from langgraph.graph import StateGraph, START, END, MessagesState
+    from langgraph.prebuilt import ToolNode, tools_condition
+    from workflows.checkpointer import DeltaSqliteSaver
+    builder = StateGraph(MessagesState)
+    builder.add_node("assistant", assistant)
+    builder.add_node("human_review", human_review, destinations=("tools", "assistant"))
+    builder.add_node("tools", ToolNode(tools))
+    builder.add_edge(START, "assistant")
+    builder.add_conditional_edges(
+        "assistant",
+        tools_condition,
+        {"tools": "human_review", "__end__": END},
+    )
+    builder.add_edge("tools", "assistant")
+
+    # threads survive restarts and each step only stores the messages it added
+    return builder.compile(checkpointer=DeltaSqliteSaver())
+
+async def run_thread(graph, thread_id, payload, approvals):
+    """Advance one thread until it finishes or pauses; a pause is handed to `approvals`."""
+    config = {"configurable": {"thread_id": thread_id}}
+    result = await graph.ainvoke(payload, config=config)
     if "__interrupt__" in result:
-        interrupt_obj = result["__interrupt__"][0]
-        data = interrupt_obj.value
-        print("\INTERRUPT:", data["prompt"])
-        print(f"User said: {data['latest_message']}")
-        user_input = input("Proceed? (yes/no): ").strip().lower()
-        resume_value = {"proceed": user_input == "yes"}
-        next_input = Command(resume=resume_value)
-        continue  
-
-    for event in graph.stream(None, config=config, stream_mode="values"):
-        if "messages" in event:
-            event["messages"][-1].pretty_print()
-    break
\ No newline at end of file
+        approvals.add(thread_id, result["__interrupt__"][0].value, graph="hitl")
+        return None
+    print(f"\n[{thread_id}]")
+    result["messages"][-1].pretty_print()
+    return result
+
+async def ask(graph, thread_id, question, approvals):
+    """Send `question` to a thread, unless an earlier run left it waiting for approval."""
+    from langchain_core.messages import HumanMessage
+    snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+    if snapshot.interrupts:
+        # answering the old approval comes first; a new message would leave its tool calls unanswered
+        print(f"\n[{thread_id}] still waits for approval, '{question}' is not sent")
+        approvals.add(thread_id, snapshot.interrupts[0].value, graph="hitl")
+        return None
+    return await run_thread(graph, thread_id, {"messages": [HumanMessage(content=question)]}, approvals)
+
+
+async def serve(questions, run_id):
+    """Run every question on its own thread; one operator answers the paused ones as they come in.
+
+    Threads are `<run_id>-<n>`, so a new run starts new conversations and passing the ID of an
+    earlier run continues its threads, pending approvals included.
+    """
+    import asyncio
+    from langgraph.types import Command
+    from workflows.approvals import ApprovalQueue
+    graph = build_graph()
+    approvals = ApprovalQueue(resume=lambda approval, decision: run_thread(
+        graph, approval.thread_id, Command(resume=decision), approvals))
+    tasks = [asyncio.create_task(ask(graph, f"{run_id}-{i}", q, approvals)) for i, q in enumerate(questions)]
+    while any(not t.done() for t in tasks) or approvals.pending():
+        try:
+            approval = await approvals.wait(timeout=0.2)
+        except asyncio.TimeoutError:
+            continue
+        print(f"\nINTERRUPT [{approval.thread_id}]:", approval.request["prompt"])
+        print(f"User said: {approval.request['latest_message']}")
+        for call in approval.request["tool_calls"]:
+            print(f"  {call['name']}({call['args']}): {call['reason']}")
+        # the other threads keep running while this one waits for an answer
+        answer = (await asyncio.to_thread(input, "Proceed? (yes/no): ")).strip().lower()
+        tasks.append(asyncio.create_task(approvals.resolve(approval.id, {"proceed": answer == "yes"})))
+    await asyncio.gather(*tasks)
+    print("\napprovals:", approvals.stats())
+
+
+def main():
+    import argparse
+    import asyncio
+    import uuid
+    parser = argparse.ArgumentParser(description="Calculator assistant whose risky tool calls wait for approval.")
+    parser.add_argument("questions", nargs="*", default=[
+        "What is 123 multiplied by 2 and then plus 123?",
+        "What is 10 divided by 0?",
+    ])
+    parser.add_argument("--run-id", help="continue the threads of an earlier run (default: new threads)")
+    args = parser.parse_args()
+    run_id = args.run_id or uuid.uuid4().hex[:12]
+    print(f"run id: {run_id} (continue with --run-id {run_id})")
+    asyncio.run(serve(args.questions, run_id))
+
+if __name__ == "__main__":
+    main()
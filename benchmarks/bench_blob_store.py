@@ -0,0 +1,124 @@
+"""ReAct threads with large search results, with and without the blob store.
+
+Runs `--threads` conversations of `--turns` turns each through the ReAct
+agent (fake model, stub search tools whose results are `--result-chars`
+long); every turn asks arxiv, wikipedia and tavily_search at once. Each mode
+runs in its own process against fresh SQLite files:
+
+- inline: `BLOB_STORE=0`, tool results live in the thread state;
+- blobs: `BLOB_STORE=1`, results above `BLOB_THRESHOLD_CHARS` are offloaded
+  (blob_store.py) and the state keeps a preview and a reference.
+
+Per mode it reports the checkpoint database size (and the blob store's), the
+Python memory held by the loaded state of one thread (tracemalloc), and the
+prompt tokens the model was sent per turn, on average and on the last turn,
+summaries included.
+
+    python benchmarks/bench_blob_store.py --threads 4 --turns 6 --result-chars 6000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODES = {"inline": "0", "blobs": "1"}
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def worker(args):
+    sys.path.append(ROOT)
+    from workflows import get_graph
+    from workflows.fake_llm import CALL_LOG
+    from workflows.blob_store import get_blob_store
+    from langchain_core.messages import HumanMessage
+
+    graph = get_graph("react_agent")
+    configs = [{"configurable": {"thread_id": f"bench-{t}"}} for t in range(args.threads)]
+    per_turn = []
+    for turn in range(args.turns):
+        tokens = 0
+        for t, config in enumerate(configs):
+            seen = len(CALL_LOG)
+            question = f"Use arxiv, wikipedia and tavily_search to look up topic {t} in depth, part {turn}"
+            graph.invoke({"messages": [HumanMessage(content=question)]}, config=config)
+            tokens += sum(call["prompt_tokens"] for call in CALL_LOG[seen:])
+        per_turn.append(tokens / len(configs))
+
+    saver = graph.checkpointer
+    saver._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    # every thread's state read back from the database, as a server resuming them would hold it
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [graph.get_state(config).values for config in configs]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    store = get_blob_store()
+    return {
+        "messages_per_thread": len(states[0]["messages"]),
+        "checkpoint_db_kb": round(file_size(os.environ["CHECKPOINT_DB"]) / 1024, 1),
+        "blob_db_kb": round(file_size(os.environ["BLOB_STORE_PATH"]) / 1024, 1) if store is not None else 0.0,
+        "state_kb_per_thread": round(held / len(configs) / 1024, 1),
+        "prompt_tokens_per_turn": round(sum(per_turn) / len(per_turn)),
+        "prompt_tokens_last_turn": round(per_turn[-1]),
+        "blob_store": store.stats() if store is not None else None,
+    }
+
+
+def run_mode(mode, args, tmp):
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "TOOLS_BACKEND": "stub",
+        "LLM_CACHE": "0",
+        "TOOL_CACHE": "0",
+        "STUB_RESULT_CHARS": str(args.result_chars),
+        "BLOB_STORE": MODES[mode],
+        "CHECKPOINT_DB": os.path.join(tmp, f"{mode}.checkpoints.sqlite"),
+        "BLOB_STORE_PATH": os.path.join(tmp, f"{mode}.blobs.sqlite"),
+    }
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", *sys.argv[1:]], env=env,
+                            cwd=tmp, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["wall_s"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--result-chars", type=int, default=6000, help="length of every stub search result")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(worker(args)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            results[mode] = run_mode(mode, args, tmp)
+            print(f"{mode:7s} " + ", ".join(f"{k}={v}" for k, v in results[mode].items() if k != "blob_store"))
+    inline, blobs = results["inline"], results["blobs"]
+    for key in ("checkpoint_db_kb", "state_kb_per_thread", "prompt_tokens_per_turn", "prompt_tokens_last_turn"):
+        if inline[key]:
+            print(f"{key}: {100 * (blobs[key] - inline[key]) / inline[key]:+.0f}%")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
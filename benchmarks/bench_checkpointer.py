@@ -0,0 +1,109 @@
+"""Checkpoint write latency and storage per step over long threads.
+
+Runs a model-free chat graph (every turn appends a user and an assistant
+message of realistic size) against MemorySaver and DeltaSqliteSaver, with and
+without list deltas, and reports per-step put latency, bytes stored per step
+and the time to restore the latest state of the thread.
+
+    python benchmarks/bench_checkpointer.py --turns 500
+"""
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from workflows.checkpointer import DeltaSqliteSaver
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+
+class TimedSaver:
+    """Wraps a checkpointer and times every put."""
+
+    def __init__(self, saver):
+        self.saver = saver
+        self.put_seconds = []
+        original = saver.put
+
+        def put(*args, **kwargs):
+            started = time.perf_counter()
+            result = original(*args, **kwargs)
+            self.put_seconds.append(time.perf_counter() - started)
+            return result
+
+        saver.put = put
+
+
+def build_graph(checkpointer, reply_chars):
+    def assistant(state: MessagesState):
+        return {"messages": [AIMessage(content="x" * reply_chars)]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("assistant", assistant)
+    builder.add_edge(START, "assistant")
+    builder.add_edge("assistant", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def stored_bytes(saver, path):
+    if isinstance(saver, MemorySaver):
+        return len(pickle.dumps((dict(saver.storage), dict(saver.writes), dict(saver.blobs))))
+    saver._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(path)
+
+
+def run(name, saver, path, turns, reply_chars):
+    timed = TimedSaver(saver)
+    graph = build_graph(saver, reply_chars)
+    config = {"configurable": {"thread_id": "bench"}}
+    started = time.perf_counter()
+    for turn in range(turns):
+        graph.invoke({"messages": [HumanMessage(content=f"question {turn} " + "y" * 200)]}, config)
+    total = time.perf_counter() - started
+    restore_started = time.perf_counter()
+    state = graph.get_state(config)
+    restore = time.perf_counter() - restore_started
+    assert len(state.values["messages"]) == 2 * turns
+    puts = timed.put_seconds
+    size = stored_bytes(saver, path)
+    return {
+        "saver": name,
+        "steps": len(puts),
+        "put_p50_ms": statistics.median(puts) * 1000,
+        "put_p95_ms": statistics.quantiles(puts, n=20)[-1] * 1000,
+        "last_100_put_ms": statistics.mean(puts[-100:]) * 1000,
+        "bytes_per_step": size / len(puts),
+        "restore_ms": restore * 1000,
+        "run_s": total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--reply-chars", type=int, default=800)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        delta_path = os.path.join(tmp, "delta.sqlite")
+        full_path = os.path.join(tmp, "full.sqlite")
+        results = [
+            run("MemorySaver", MemorySaver(), None, args.turns, args.reply_chars),
+            run("DeltaSqliteSaver", DeltaSqliteSaver(delta_path), delta_path, args.turns, args.reply_chars),
+            run("DeltaSqliteSaver(no deltas)", DeltaSqliteSaver(full_path, snapshot_every=0), full_path,
+                args.turns, args.reply_chars),
+        ]
+
+    columns = list(results[0])
+    print(" | ".join(f"{c:>16}" for c in columns))
+    for row in results:
+        print(" | ".join(f"{v:>16.3f}" if isinstance(v, float) else f"{v:>16}" for v in row.values()))
+
+
+if __name__ == "__main__":
+    main()
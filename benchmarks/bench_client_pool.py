@@ -0,0 +1,109 @@
+"""Per-call model clients vs the shared registry, against the local OpenAI stand-in.
+
+Starts workflows/fake_openai_server.py in-process (with a simulated
+handshake on every new connection) and runs the same calls three ways:
+
+- fresh_client: a new `ChatOpenAI` with its own HTTP client per call, i.e. a
+  new connection per call;
+- per_call: a new `ChatOpenAI` per call on langchain's default client (what
+  chatbot.py's superbot used to do);
+- registry: `models.chat_model(...)`, one client and one keep-alive pool
+  for the process.
+
+Each mode runs `--calls` sequential calls and `--calls` concurrent async
+calls, and reports wall time, time spent constructing clients and the
+connections the server accepted; the registry mode also prints its
+`pool_stats()`.
+
+    python benchmarks/bench_client_pool.py --calls 50 --handshake-delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+os.environ.setdefault("FAKE_LLM_LATENCY", "fixed:0.05")
+os.environ.setdefault("FAKE_LLM_COMPLETION_TOKENS", "40")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["LLM_BACKEND"] = "openai"     # the point is the real client talking to the stand-in
+sys.path.append(ROOT)
+import httpx  # noqa: E402
+from langchain_openai import ChatOpenAI  # noqa: E402
+from workflows.fake_openai_server import start_server  # noqa: E402
+from workflows import models  # noqa: E402
+
+MODEL = "gpt-4.1-mini"
+
+
+def factories(base_url):
+    def fresh_client():
+        return ChatOpenAI(model=MODEL, base_url=base_url, http_client=httpx.Client(),
+                          http_async_client=httpx.AsyncClient())
+
+    def per_call():
+        return ChatOpenAI(model=MODEL, base_url=base_url)
+
+    def registry():
+        return models.chat_model(model=MODEL, base_url=base_url)
+
+    return {"fresh_client": fresh_client, "per_call": per_call, "registry": registry}
+
+
+def run_mode(server, factory, calls):
+    construct = 0.0
+
+    def make():
+        nonlocal construct
+        started = time.perf_counter()
+        llm = factory()
+        construct += time.perf_counter() - started
+        return llm
+
+    before = server.stats()["connections"]
+    started = time.perf_counter()
+    for i in range(calls):
+        make().invoke(f"sequential question {i}")
+    sequential = time.perf_counter() - started
+
+    async def burst():
+        return await asyncio.gather(*[make().ainvoke(f"concurrent question {i}") for i in range(calls)])
+
+    started = time.perf_counter()
+    asyncio.run(burst())
+    concurrent = time.perf_counter() - started
+    return {
+        "sequential_s": round(sequential, 3),
+        "concurrent_s": round(concurrent, 3),
+        "construct_ms_per_call": round(construct / (2 * calls) * 1000, 3),
+        "connections": server.stats()["connections"] - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--handshake-delay", type=float, default=0.05, help="seconds every new connection stalls")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    server = start_server(handshake_delay=args.handshake_delay)
+    results = {}
+    try:
+        for name, factory in factories(server.base_url).items():
+            results[name] = run_mode(server, factory, args.calls)
+            print(f"{name:13s} " + ", ".join(f"{k}={v}" for k, v in results[name].items()))
+        results["pool_stats"] = models.pool_stats()
+        print(json.dumps(results["pool_stats"], indent=2))
+    finally:
+        server.shutdown()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Client retries vs the process-wide rate limiter, against a rate-limited OpenAI stand-in.
+
+Starts workflows/fake_openai_server.py in-process with `--server-rpm`, then
+fires a burst of `--batch` report-style calls (priority `batch`) at once,
+while `--interactive` calls (priority `interactive`) arrive every
+`--interactive-every` seconds. Two modes:
+
+- client_retries: plain `ChatOpenAI` with its own retries (`max_retries=2`),
+  i.e. what the graphs did before;
+- limiter: `rate_limited(ChatOpenAI)` with `max_retries=0`, whose limiter
+  starts at `--limiter-rpm` (by default twice what the server allows, so it
+  has to adapt to the 429s).
+
+Each mode reports completed and failed calls, the 429s the server sent,
+wall time, and latency percentiles per priority; the limiter mode also
+prints its `rate_limit_stats()`.
+
+    python benchmarks/bench_rate_limit.py --batch 60 --interactive 10 --server-rpm 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+os.environ.setdefault("FAKE_LLM_LATENCY", "fixed:0.05")
+os.environ.setdefault("FAKE_LLM_COMPLETION_TOKENS", "40")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+sys.path.append(ROOT)
+from langchain_openai import ChatOpenAI  # noqa: E402
+from workflows.fake_openai_server import start_server  # noqa: E402
+from workflows.rate_limit import call_priority, configure_limiter, rate_limit_stats, rate_limited  # noqa: E402
+
+MODEL = "gpt-4.1-mini"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[int(q * (len(values) - 1))], 3) if values else None
+
+
+async def run_mode(server, llm, args):
+    rows = []
+
+    async def call(kind, i):
+        started = time.perf_counter()
+        try:
+            with call_priority(kind):
+                await llm.ainvoke(f"{kind} question {i}")
+            rows.append((kind, time.perf_counter() - started, None))
+        except Exception as e:
+            rows.append((kind, time.perf_counter() - started, type(e).__name__))
+
+    async def interactive():
+        await asyncio.sleep(args.interactive_every)
+        calls = []
+        for i in range(args.interactive):
+            calls.append(asyncio.create_task(call("interactive", i)))
+            await asyncio.sleep(args.interactive_every)
+        await asyncio.gather(*calls)
+
+    before = server.stats()["rate_limited"]
+    started = time.perf_counter()
+    await asyncio.gather(interactive(), *(call("batch", i) for i in range(args.batch)))
+    result = {
+        "wall_s": round(time.perf_counter() - started, 3),
+        "completed": sum(error is None for _, _, error in rows),
+        "failed": sum(error is not None for _, _, error in rows),
+        "errors": sorted({error for _, _, error in rows if error is not None}),
+        "server_429s": server.stats()["rate_limited"] - before,
+    }
+    for kind in ("interactive", "batch"):
+        latencies = [seconds for k, seconds, error in rows if k == kind and error is None]
+        result[f"{kind}_s_p50"] = percentile(latencies, 0.5)
+        result[f"{kind}_s_p95"] = percentile(latencies, 0.95)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=60, help="report-style calls fired at once")
+    parser.add_argument("--interactive", type=int, default=10, help="interactive calls arriving during the batch")
+    parser.add_argument("--interactive-every", type=float, default=0.5, help="seconds between interactive calls")
+    parser.add_argument("--server-rpm", type=float, default=300, help="requests per minute the server accepts")
+    parser.add_argument("--limiter-rpm", type=float, help="starting limit of the limiter (default: 2x the server)")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    server = start_server(rpm=args.server_rpm)
+    configure_limiter(server.base_url, MODEL, rpm=args.limiter_rpm or 2 * args.server_rpm)
+    modes = {
+        "client_retries": ChatOpenAI(model=MODEL, base_url=server.base_url, max_retries=2),
+        "limiter": rate_limited(ChatOpenAI)(model=MODEL, base_url=server.base_url, max_retries=0),
+    }
+    results = {}
+
+    async def run_all():
+        # one event loop: langchain's default async HTTP client is shared and bound to it
+        for name, llm in modes.items():
+            await asyncio.sleep(2)     # let the server's bucket refill between modes
+            results[name] = await run_mode(server, llm, args)
+            print(f"{name:15s} " + ", ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    try:
+        asyncio.run(run_all())
+        results["rate_limit_stats"] = rate_limit_stats()
+        print(json.dumps(results["rate_limit_stats"], indent=2))
+    finally:
+        server.shutdown()
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
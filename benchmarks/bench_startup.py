@@ -0,0 +1,95 @@
+"""Cold-start cost of the workflow package, one fresh interpreter per measurement.
+
+For every graph it reports, as medians over `--repeat` fresh processes:
+
+- package_ms: `import workflows`;
+- import_ms: import of the graph's module (should stay small: nothing heavy
+  is imported until the graph is built);
+- build_ms: `get_graph(name)` right after, i.e. langgraph, langchain, the model
+  client and compilation.
+
+`--top N` lists the N slowest top-level imports of a full build (from
+`python -X importtime`), to see what a worker pays for before it serves its
+first request. `--out` saves the medians as JSON to track them across commits.
+
+    python benchmarks/bench_startup.py --repeat 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+from workflows import GRAPHS  # noqa: E402
+
+# built offline: no API key, no network
+ENV = {**os.environ, "LLM_BACKEND": "fake", "TOOLS_BACKEND": "stub"}
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import workflows
+package = time.perf_counter()
+module = workflows.load_module({name!r})
+imported = time.perf_counter()
+workflows.get_graph({name!r})
+built = time.perf_counter()
+print(json.dumps({{"package_ms": (package - started) * 1000, "module_ms": (imported - package) * 1000,
+                  "build_ms": (built - imported) * 1000}}))
+"""
+
+
+def probe(name, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE.format(root=ROOT, name=name)]
+    done = subprocess.run(command, env=ENV, capture_output=True, text=True, cwd=ROOT, timeout=300)
+    if done.returncode != 0:
+        raise RuntimeError(f"{name}: {done.stderr.strip().splitlines()[-1] if done.stderr else done.returncode}")
+    return json.loads(done.stdout.strip().splitlines()[-1]), done.stderr
+
+
+def slowest_imports(stderr, top):
+    """(cumulative microseconds, module) of the top-level imports in `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if not module[1:].startswith(" "):     # nested imports are indented
+            rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=sorted(GRAPHS), help="graphs to measure (default: all)")
+    parser.add_argument("--top", type=int, default=0, help="list the slowest top-level imports of each build")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or sorted(GRAPHS):
+        try:
+            samples = [probe(name)[0] for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:28s} failed: {e}")
+            continue
+        row = {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+        results[name] = row
+        print(f"{name:28s} package_ms={row['package_ms']:7.1f} import_ms={row['module_ms']:7.1f} build_ms={row['build_ms']:7.1f}")
+        if args.top:
+            _, stderr = probe(name, importtime=True)
+            for micros, module in slowest_imports(stderr, args.top):
+                print(f"    {micros / 1000:8.1f} ms  {module}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
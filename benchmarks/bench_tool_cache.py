@@ -0,0 +1,92 @@
+"""Hit rate and latency savings of the tool result cache, measured offline.
+
+Simulates many agent threads asking the stub search backends about a skewed
+(Zipf-like) set of entities, with the casing and spacing variations real
+queries have, once straight against the backends and once through
+`cached_tool`. Reports requests that reached the backend, cache hit rate,
+coalesced in-flight requests and per-call latency.
+
+    python benchmarks/bench_tool_cache.py --threads 50 --queries 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from workflows.tool_cache import ToolResultCache, cached_tool, stub_search_tool
+
+ENTITIES = [f"entity number {i}" for i in range(200)]
+
+
+def variant(query):
+    query = query.upper() if random.random() < 0.2 else query
+    return query.replace(" ", "  ") if random.random() < 0.2 else query
+
+
+def workload(threads, queries, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(ENTITIES))]
+    return [
+        [(rng.choice(["arxiv", "wikipedia", "tavily_search"]), rng.choices(ENTITIES, weights)[0]) for _ in range(queries)]
+        for _ in range(threads)
+    ]
+
+
+async def run(plan, tools):
+    latencies = []
+
+    async def agent(calls):
+        for tool_name, query in calls:
+            started = time.perf_counter()
+            await tools[tool_name].ainvoke({"query": variant(query)})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(agent(calls) for calls in plan))
+    return time.perf_counter() - started, latencies
+
+
+def report(name, total, latencies, backends, cache=None):
+    row = {
+        "mode": name,
+        "calls": len(latencies),
+        "upstream": sum(t.metadata["upstream_calls"] for t in backends.values()),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": statistics.quantiles(latencies, n=20)[-1] * 1000,
+        "wall_s": total,
+    }
+    if cache is not None:
+        row.update(cache.stats())
+    print(", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="mean stub backend latency in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    plan = workload(args.threads, args.queries, args.seed)
+
+    def backends():
+        return {name: stub_search_tool(name, latency=args.latency, jitter=args.latency / 4)
+                for name in ("arxiv", "wikipedia", "tavily_search")}
+
+    direct = backends()
+    report("direct", *asyncio.run(run(plan, direct)), direct)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ToolResultCache(path=os.path.join(tmp, "tools.sqlite"))
+        upstream = backends()
+        tools = {name: cached_tool(tool, ttl=3600, cache=cache) for name, tool in upstream.items()}
+        report("cached", *asyncio.run(run(plan, tools)), upstream, cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Load test of workflows/server.py against the fake chat model.
+
+Starts the service in a subprocess (`LLM_BACKEND=fake`, stub search tools,
+caches off, run from a scratch directory) unless `--url` points at a running
+one, then fires `--requests` streaming requests with at most `--concurrency`
+open at a time. A `--duplicates` fraction of them repeats an earlier input, to
+exercise coalescing. It reports throughput, latency and time-to-first-token
+percentiles, status codes (429 = shed by admission control), how many
+requests were coalesced and the server's own `/stats`.
+
+    python benchmarks/load_test.py --graph routing --requests 200 --concurrency 50 --max-runs 8 --max-queue 16
+    python benchmarks/load_test.py --graph story --duplicates 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SERVER_ENV = {
+    "LLM_BACKEND": "fake",
+    "TOOLS_BACKEND": "stub",
+    "LLM_CACHE": "0",
+    "TOOL_CACHE": "0",
+    "SECTION_STORE": "0",
+    "STREAM_OUTPUT": "0",
+}
+
+INPUTS = {
+    "routing": lambda k: {"input": f"Write a poem about the sea, take {k}"},
+    "story": lambda k: {"topic": f"A comedy story about guest arrival, take {k}"},
+    "report": lambda k: {"topic": f"AI bubble and future of software engineers, take {k}"},
+    "react": lambda k: {"messages": [f"Use arxiv and wikipedia to look up transformer models, take {k}"]},
+    "hitl": lambda k: {"messages": [f"Please add and multiply {k} and 7"]},
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, workdir):
+    port = free_port()
+    env = {**SERVER_ENV, **os.environ, "PYTHONPATH": os.path.abspath(ROOT),
+           "SERVER_MAX_RUNS": str(args.max_runs), "SERVER_MAX_QUEUE": str(args.max_queue)}
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "workflows.server:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL)   # the graphs print as they go
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}/graphs", timeout=1).raise_for_status()
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not come up")
+
+
+async def one_request(client, url, graph, body):
+    started = time.perf_counter()
+    row = {"status": None, "first_event_s": None, "first_token_s": None, "tokens": 0, "coalesced": False, "error": None}
+    try:
+        async with client.stream("POST", f"{url}/graphs/{graph}/stream", json=body) as response:
+            row["status"] = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                return {**row, "total_s": time.perf_counter() - started}
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if row["first_event_s"] is None:
+                        row["first_event_s"] = time.perf_counter() - started
+                    row["coalesced"] |= event == "coalesced"
+                elif line.startswith("data: ") and event == "token":
+                    row["tokens"] += 1
+                    if row["first_token_s"] is None:
+                        row["first_token_s"] = time.perf_counter() - started
+                elif line.startswith("data: ") and event == "error":
+                    row["error"] = json.loads(line[len("data: "):])["message"]
+    except httpx.HTTPError as e:
+        row["error"] = repr(e)
+    return {**row, "total_s": time.perf_counter() - started}
+
+
+def percentile(values, q):
+    values = sorted(v for v in values if v is not None)
+    return round(values[int(q * (len(values) - 1))], 3) if values else None
+
+
+async def run_load(url, args):
+    rng = random.Random(args.seed)
+    bodies, seen = [], []
+    for i in range(args.requests):
+        k = rng.choice(seen) if seen and rng.random() < args.duplicates else i
+        seen.append(k)
+        bodies.append({"input": INPUTS[args.graph](k)})
+
+    limit = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300, connect=10), limits=limits) as client:
+        async def limited(body):
+            async with limit:
+                return await one_request(client, url, args.graph, body)
+
+        started = time.perf_counter()
+        rows = await asyncio.gather(*(limited(body) for body in bodies))
+        wall = time.perf_counter() - started
+        server_stats = (await client.get(f"{url}/stats")).json()
+
+    ok = [r for r in rows if r["status"] == 200 and r["error"] is None]
+    statuses = {}
+    for r in rows:
+        statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+    return {
+        "graph": args.graph,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "wall_s": round(wall, 3),
+        "completed_per_second": round(len(ok) / wall, 2),
+        "statuses": statuses,
+        "errors": sum(r["error"] is not None for r in rows),
+        "coalesced": sum(r["coalesced"] for r in rows),
+        "latency_s_p50": percentile([r["total_s"] for r in ok], 0.5),
+        "latency_s_p95": percentile([r["total_s"] for r in ok], 0.95),
+        "first_event_s_p50": percentile([r["first_event_s"] for r in ok], 0.5),
+        "first_token_s_p50": percentile([r["first_token_s"] for r in ok], 0.5),
+        "first_token_s_p95": percentile([r["first_token_s"] for r in ok], 0.95),
+        "tokens_per_request": round(statistics.mean(r["tokens"] for r in ok), 1) if ok else 0,
+        "server": server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--graph", choices=sorted(INPUTS), default="routing")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20, help="requests open at once")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of requests repeating an earlier input")
+    parser.add_argument("--max-runs", type=int, default=8, help="SERVER_MAX_RUNS of the spawned server")
+    parser.add_argument("--max-queue", type=int, default=32, help="SERVER_MAX_QUEUE of the spawned server")
+    parser.add_argument("--url", help="test a running server instead of spawning one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, url = (None, args.url.rstrip("/")) if args.url else start_server(args, workdir)
+        try:
+            result = asyncio.run(run_load(url, args))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
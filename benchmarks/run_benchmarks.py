@@ -0,0 +1,291 @@
+"""End-to-end benchmarks of every graph against the fake chat model.
+
+Runs promptChaining, routing, parallelization, orchestrator_worker, the HITL
+calculator (approving every interrupt) and the ReAct agent with
+`LLM_BACKEND=fake` and stub search tools, so no API key or network is needed.
+Per scenario it reports:
+
+- wall time per run;
+- critical-path time: how long at least one model call was in flight, the
+  floor no scheduling change can beat without fewer or faster calls;
+- overhead: wall minus critical path (tools, graph and checkpoint work);
+- model calls and tokens per run, and their cost at list prices;
+- structured outputs that had to be escalated to a larger model tier;
+- cached prefix: the share of input tokens the provider would serve from its
+  prompt-prefix cache, overall and per prompt template (prompts.py) in the
+  results file. The fake model only caches prefixes of at least
+  `FAKE_LLM_PREFIX_CACHE_MIN` tokens (default 1024, like OpenAI); set it to 0
+  to see how well each node's prompt layout shares its prefix;
+- peak Python memory of one run, measured in a separate tracemalloc pass;
+- first output: when the first text of the result became visible. Without
+  `--stream` that is when the run ends; with it, the generation nodes stream
+  into a file sink and it is the time to the first token on disk.
+
+Results are written to `benchmarks/results/<commit>.json` together with the
+fake model settings, and `--compare` prints the change against an earlier file.
+`--tiers-baseline` also runs the same scenarios with `MODEL_TIERS=0` (every
+node on its module's single model) in a subprocess and prints the latency and
+cost of the per-node tiers (model_tiers.py) against it. Comparing against a
+`PIPELINED_PLANNER=0` run shows the end-to-end gain of the pipelined report
+planner (orchestrator_worker.py).
+
+    python benchmarks/run_benchmarks.py --runs 5
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/2795be8.json
+    python benchmarks/run_benchmarks.py --tiers-baseline
+    PIPELINED_PLANNER=0 python benchmarks/run_benchmarks.py --only orchestrator_worker --out serial.json
+    python benchmarks/run_benchmarks.py --only orchestrator_worker --compare serial.json
+    FAKE_LLM_COMPLETION_TOKENS=2000 python benchmarks/run_benchmarks.py --only parallelization --stream
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# must be set before the graph modules create their models and tools
+BENCH_ENV = {
+    "LLM_BACKEND": "fake",
+    "TOOLS_BACKEND": "stub",
+    "LLM_CACHE": "0",          # every run pays for its calls
+    "TOOL_CACHE": "0",
+    "SECTION_STORE": "0",
+    "STREAM_OUTPUT": "0",
+}
+for key, value in BENCH_ENV.items():
+    os.environ.setdefault(key, value)
+sys.path.append(ROOT)
+from workflows import get_graph  # noqa: E402
+from workflows.fake_llm import CALL_LOG, reset_call_log  # noqa: E402
+from workflows.model_tiers import MODEL_TIERS_ENABLED, call_cost, tier_stats  # noqa: E402
+from workflows.prompts import prefix_cache_meter  # noqa: E402
+from workflows.orchestrator_worker import PIPELINED_PLANNER  # noqa: E402
+from workflows.output_sink import StreamingSink  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.types import Command  # noqa: E402
+
+FAKE_SETTINGS = ("FAKE_LLM_LATENCY", "FAKE_LLM_TOKENS_PER_SECOND", "FAKE_LLM_COMPLETION_TOKENS", "FAKE_LLM_SEED",
+                 "FAKE_LLM_PREFIX_CACHE_MIN")
+
+
+# --- scenarios: run(graph, i, config) ---
+
+def run_prompt_chaining(graph, i, config):
+    graph.invoke({"topic": f"A horror story about a nun, take {i}"}, config=config)
+
+
+def run_routing(graph, i, config):
+    kind = ("poem", "joke", "story")[i % 3]
+    graph.invoke({"input": f"Write a {kind} about the sea, take {i}"}, config=config)
+
+
+def run_parallelization(graph, i, config):
+    graph.invoke({"topic": f"A comedy story about guest arrival, take {i}"}, config=config)
+
+
+def run_orchestrator(graph, i, config):
+    state = {"topic": f"AI bubble and future of software engineers, take {i}", "sections": [],
+             "completed_sections": [], "final_report": ""}
+    asyncio.run(graph.ainvoke(state, config=config))
+
+
+def run_hitl(graph, i, config):
+    config = {**config, "configurable": {**config.get("configurable", {}), "thread_id": f"bench-{uuid.uuid4()}"}}
+    result = graph.invoke({"messages": [HumanMessage(content=f"Please add and multiply {i} and 7")]}, config=config)
+    for _ in range(20):
+        if "__interrupt__" not in result:
+            break
+        result = graph.invoke(Command(resume={"proceed": True}), config=config)
+
+
+def run_react(graph, i, config):
+    config = {**config, "configurable": {**config.get("configurable", {}), "thread_id": f"bench-{uuid.uuid4()}"}}
+    question = f"Use arxiv, wikipedia and tavily_search to look up transformer models, take {i}"
+    graph.invoke({"messages": [HumanMessage(content=question)]}, config=config)
+
+
+SCENARIOS = {
+    "promptChaining": run_prompt_chaining,
+    "routing": run_routing,
+    "parallelization": run_parallelization,
+    "orchestrator_worker": run_orchestrator,
+    "hitl": run_hitl,
+    "react_agent": run_react,
+}
+
+# scenarios whose generation nodes write to a sink (output_sink.py)
+STREAMING = {"promptChaining", "routing", "parallelization", "orchestrator_worker"}
+
+
+# --- measurement ---
+
+def busy_seconds(calls):
+    """Length of the union of the calls' [start, end] intervals."""
+    total, current_start, current_end = 0.0, None, None
+    for call in sorted(calls, key=lambda c: c["start"]):
+        if current_end is None or call["start"] > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = call["start"], call["end"]
+        else:
+            current_end = max(current_end, call["end"])
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def quietly(run, graph, i, config=None):
+    # the graphs print their intermediate state; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(graph, i, config or {})
+
+
+def measure(graph, run, runs, stream=False):
+    walls, critical, calls, tokens, costs, first_output = [], [], [], [], [], []
+    escalations = tier_stats()["escalations_total"]
+    meter = prefix_cache_meter()
+    for i in range(runs):
+        reset_call_log()
+        sink = StreamingSink(f"bench-output-{uuid.uuid4().hex}.txt", separator="\n\n") if stream else None
+        config = {"callbacks": [meter]}
+        if sink is not None:
+            config["configurable"] = {"sink": sink}
+        started = time.perf_counter()
+        quietly(run, graph, i, config)
+        walls.append(time.perf_counter() - started)
+        # without a sink nothing is visible before the run has written its result
+        first_output.append(sink.first_output - started if sink is not None and sink.first_output else walls[-1])
+        log = list(CALL_LOG)
+        critical.append(busy_seconds(log))
+        calls.append(len(log))
+        tokens.append(sum(c["prompt_tokens"] + c["completion_tokens"] for c in log))
+        costs.append(sum(call_cost(c["model"], c["prompt_tokens"], c["completion_tokens"]) for c in log))
+    escalations = tier_stats()["escalations_total"] - escalations
+
+    tracemalloc.start()
+    quietly(run, graph, runs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "runs": runs,
+        "wall_s_mean": statistics.mean(walls),
+        "wall_s_p50": statistics.median(walls),
+        "critical_path_s_mean": statistics.mean(critical),
+        "overhead_s_mean": statistics.mean(w - c for w, c in zip(walls, critical)),
+        "first_output_s_mean": statistics.mean(first_output),
+        "calls_per_run": statistics.mean(calls),
+        "tokens_per_run": statistics.mean(tokens),
+        "cost_usd_per_run": round(statistics.mean(costs), 6),
+        "escalations_per_run": escalations / runs,
+        "cached_prefix_ratio": meter.cached_ratio(),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }, meter.stats()
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def compare(current, previous):
+    if previous.get("settings") != current["settings"]:
+        print(f"warning: fake model settings differ ({previous.get('settings')} vs {current['settings']})")
+    if previous.get("stream", False) != current["stream"]:
+        print(f"note: comparing stream={current['stream']} against stream={previous.get('stream', False)}")
+    for toggle in ("model_tiers", "pipelined_planner"):
+        if previous.get(toggle, False) != current[toggle]:
+            print(f"note: comparing {toggle}={current[toggle]} against {toggle}={previous.get(toggle, False)}")
+    print(f"\nvs {previous['commit']}{' (single model)' if not previous.get('model_tiers', False) else ''}:")
+    for name, row in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if before is None:
+            continue
+        changes = []
+        for key in ("wall_s_mean", "critical_path_s_mean", "first_output_s_mean", "calls_per_run", "cost_usd_per_run",
+                    "cached_prefix_ratio", "peak_memory_kb"):
+            if before.get(key):
+                changes.append(f"{key}={(row[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"  {name:20s} " + ", ".join(changes))
+
+
+def single_model_baseline(args, out):
+    """Rerun the same scenarios with every node on its module's own model (`MODEL_TIERS=0`)."""
+    baseline_out = os.path.splitext(out)[0] + "-single-model.json"
+    command = [sys.executable, os.path.abspath(__file__), "--runs", str(args.runs), "--out", baseline_out]
+    if args.only:
+        command += ["--only", *args.only]
+    if args.stream:
+        command.append("--stream")
+    print("\nsingle-model baseline (MODEL_TIERS=0):")
+    subprocess.run(command, env={**os.environ, "MODEL_TIERS": "0"}, check=True)
+    with open(baseline_out) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=sorted(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--stream", action="store_true", help="stream generation nodes into a file sink")
+    parser.add_argument("--tiers-baseline", action="store_true",
+                        help="also run with MODEL_TIERS=0 and compare the model tiers against it")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    result = {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "python": platform.python_version(),
+        "settings": {key: os.getenv(key) for key in FAKE_SETTINGS},
+        "stream": args.stream,
+        "model_tiers": MODEL_TIERS_ENABLED,
+        "pipelined_planner": PIPELINED_PLANNER,
+        "scenarios": {},
+        "prefix_cache": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # reports, PDFs, checkpoints and router logs land in a scratch directory
+        os.chdir(tmp)
+        try:
+            for name in args.only or SCENARIOS:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    graph = get_graph(name)
+                row, prefix_cache = measure(graph, SCENARIOS[name], args.runs, stream=args.stream and name in STREAMING)
+                result["scenarios"][name] = row
+                result["prefix_cache"][name] = prefix_cache
+                print(f"{name:20s} " + ", ".join(f"{k}={v:.6f}" if k.startswith("cost") else f"{k}={v:.3f}"
+                                                 if isinstance(v, float) else f"{k}={v}" for k, v in row.items()))
+        finally:
+            os.chdir(cwd)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+    if args.tiers_baseline:
+        compare(result, single_model_baseline(args, out))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,31 +4,49 @@
 from typing import Annotated
 from typing_extensions import TypedDict
 
-from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import TYPE_CHECKING
 import os
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun
-from langchain_community.utilities import ArxivAPIWrapper,WikipediaAPIWrapper
-from langchain_tavily import TavilySearch
 import asyncio
+import logging
+
+# shared helpers come from the workflows package; run from the repository root:
+#   PYTHONPATH=. python "langgraph basics/ReAct_agent.py"
 # from langchain_tavily import TavilySearch
 
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["TAVILY_API_KEY"]=os.getenv("TAVILY_API_KEY")
-os.environ["LANGSMITH_API_KEY"]=os.getenv("LANGSMITH_API_KEY")
-
-api_wrapper_arxiv = ArxivAPIWrapper(top_k_results=2,doc_content_chars_max=500)
-api_wrapper_wiki = WikipediaAPIWrapper(top_k_results=2,doc_content_chars_max=500)
-arxiv = ArxivQueryRun(api_wrapper=api_wrapper_arxiv)
-wiki = WikipediaQueryRun(api_wrapper=api_wrapper_wiki)
-tavily = TavilySearch()
-memory = MemorySaver()
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+# "stub" swaps the search backends for local stand-ins (no network, no API keys)
+TOOLS_BACKEND = os.getenv("TOOLS_BACKEND", "live")
+STUB_RESULT_CHARS = int(os.getenv("STUB_RESULT_CHARS", "500"))
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def search_tools():
+    """arxiv, wikipedia and tavily clients, created on first use."""
+    from dotenv import load_dotenv
+    from workflows.tool_cache import cached_tool, stub_search_tool
+    load_dotenv()
+    if TOOLS_BACKEND == "stub":
+        arxiv_tool, wiki_tool, tavily_tool = (stub_search_tool(n, result_chars=STUB_RESULT_CHARS) for n in ("arxiv", "wikipedia", "tavily_search"))
+    else:
+        from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun
+        from langchain_community.utilities import ArxivAPIWrapper,WikipediaAPIWrapper
+        from langchain_tavily import TavilySearch
+        api_wrapper_arxiv = ArxivAPIWrapper(top_k_results=2,doc_content_chars_max=500)
+        api_wrapper_wiki = WikipediaAPIWrapper(top_k_results=2,doc_content_chars_max=500)
+        arxiv_tool = ArxivQueryRun(api_wrapper=api_wrapper_arxiv)
+        wiki_tool = WikipediaQueryRun(api_wrapper=api_wrapper_wiki)
+        tavily_tool = TavilySearch()
+    # results are cached per normalized query and identical in-flight queries share one request
+    arxiv = cached_tool(arxiv_tool, ttl=24 * 3600)
+    wiki = cached_tool(wiki_tool, ttl=24 * 3600)
+    tavily = cached_tool(tavily_tool, ttl=3600)
+    return [arxiv, wiki, tavily]
+
 # few custom tools
 def add(a: int, b: int) -> int:
     """
@@ -85,9 +103,19 @@ def divide(a: int, b: int) -> int:
 # result = wiki.invoke("Artificial Intelligence")
 # print(result)
 
-tools = [arxiv, wiki, tavily, add, multiply, divide]
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.4)
-llm_with_tools = llm.bind_tools(tools)
+def get_tools():
+    return search_tools() + [add, multiply, divide]
+
+@lru_cache(maxsize=None)
+def get_llm():
+    from dotenv import load_dotenv
+    from workflows.models import chat_model
+    load_dotenv()
+    return chat_model(model="gpt-4.1-mini", temperature=0.4)
+
+@lru_cache(maxsize=None)
+def get_llm_with_tools():
+    return get_llm().bind_tools(get_tools())
 # ai_result = llm_with_tools.invoke([HumanMessage(content="who is mark zuckerberg?")])
 # print(ai_result.tool_calls)
 
@@ -95,17 +123,51 @@ llm_with_tools = llm.bind_tools(tools)
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
-
-def tool_calling_llm(state: State):
-    return {"messages":[llm_with_tools.invoke(state["messages"])]}
-
-builder = StateGraph(State)
-builder.add_node("tool_calling_llm", tool_calling_llm)
-builder.add_node("tools", ToolNode(tools))
-builder.add_edge(START, "tool_calling_llm")
-builder.add_conditional_edges("tool_calling_llm",tools_condition)
-builder.add_edge("tools", "tool_calling_llm")
-graph = builder.compile(checkpointer=memory)
+    summary: str              # rolling summary of the turns that left the window
+    summarized_upto: int      # number of messages folded into the summary
+    tokens_saved: int         # prompt tokens not sent on the latest model call
+
+# only the recent turns that fit the budget (configurable "history_token_budget") are sent
+@lru_cache(maxsize=None)
+def get_history():
+    from workflows.history_window import HistoryManager
+    return HistoryManager(get_llm())
+
+def tool_calling_llm(state: State, config: "RunnableConfig"):
+    from workflows.blob_store import expand
+    from workflows.rate_limit import call_priority
+    # someone is waiting on the answer: summaries and the reply go ahead of batch work
+    with call_priority("interactive"):
+        prompt, updates = get_history().prepare(state, config)
+        # the saving is in the state as tokens_saved; the breakdown is for LOG_LEVEL=DEBUG sessions
+        logger.debug("history: sent %d of %d messages, saved ~%d tokens",
+                     len(prompt), len(state["messages"]), updates["tokens_saved"])
+        # the model reads the results it just asked for in full; older ones stay previews
+        return {"messages":[get_llm_with_tools().invoke(expand(prompt))], **updates}
+
+@lru_cache(maxsize=None)
+def build_graph():
+    """Compile the agent (tools, model client and checkpointer included) once per process."""
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.prebuilt import tools_condition
+    from workflows.blob_store import get_blob_store
+    from workflows.checkpointer import DeltaSqliteSaver
+    from workflows.concurrent_tools import ConcurrentToolNode
+    builder = StateGraph(State)
+    builder.add_node("tool_calling_llm", tool_calling_llm)
+    # tool calls of one turn run concurrently, each search backend with its own timeout and limit;
+    # large results go to the blob store and the thread keeps a preview and a reference
+    blobs = get_blob_store()
+    tool_node = ConcurrentToolNode(get_tools(), limits={
+        "arxiv": {"timeout": 15, "max_concurrency": 2},
+        "wikipedia": {"timeout": 10, "max_concurrency": 2},
+        "tavily_search": {"timeout": 10, "max_concurrency": 4},
+    }, offload=blobs.offload if blobs is not None else None)
+    builder.add_node("tools", tool_node.as_node())
+    builder.add_edge(START, "tool_calling_llm")
+    builder.add_conditional_edges("tool_calling_llm",tools_condition)
+    builder.add_edge("tools", "tool_calling_llm")
+    return builder.compile(checkpointer=DeltaSqliteSaver())
 # messages = graph.invoke(
 #     {"messages": [HumanMessage(content="what is my name?")]},
 #     config={"configurable": {"thread_id": "1"}}
@@ -124,8 +186,11 @@ graph = builder.compile(checkpointer=memory)
 #         print(chunk)
 
 # ASTREAM IN GRAPH async
-async def main():
-    config = {"configurable": {"thread_id": "1"}}
+async def main(thread_id):
+    from workflows.tracing import trace_config
+    graph = build_graph()
+    # TRACE=1 records tool_calling_llm and tools for every turn
+    config = trace_config({"configurable": {"thread_id": thread_id}})
 
     while True:
         user_query = input("User: ")
@@ -142,5 +207,17 @@ async def main():
             print(event)
 
 # Run the async function
-asyncio.run(main())
+if __name__ == "__main__":
+    import argparse
+    import uuid
+    from workflows.tracing import export_traces
+    parser = argparse.ArgumentParser(description="Research agent over arxiv, wikipedia and web search.")
+    parser.add_argument("--thread", help="continue an earlier conversation (default: a new one)")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+    # threads are kept on disk, so every session gets its own unless one is named
+    thread_id = args.thread or uuid.uuid4().hex[:12]
+    print(f"thread id: {thread_id} (continue with --thread {thread_id})")
+    asyncio.run(main(thread_id))
+    export_traces()
     
@@ -1,19 +1,12 @@
 from typing_extensions import TypedDict
-from langgraph.graph import StateGraph, START, END
-import os
-from IPython.display import display, Image
-from dotenv import load_dotenv
+from functools import lru_cache
 ## reducers
 from typing import Annotated
 from langgraph.graph.message import add_messages
-from langchain_openai import ChatOpenAI
-# # defining the state schema
-
+# shared helpers come from the workflows package; run from the repository root:
+#   PYTHONPATH=. python "langgraph basics/chatbot.py"
 
-# setting up the environment variables
-load_dotenv()  
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["LANGSMITH_API_KEY"] = os.getenv("LANGSMITH_API_KEY")
+# # defining the state schema
 
 
 class State(TypedDict):
@@ -22,24 +15,37 @@ class State(TypedDict):
 # defining the functions
 
 def superbot(state:State):
-    llm = ChatOpenAI(model_name="gpt-5-nano",temperature=0.7)
+    from dotenv import load_dotenv
+    from workflows.models import chat_model
+    # setting up the environment variables
+    load_dotenv()
+    # one shared client per process, not a new one (and a new connection) per message
+    llm = chat_model(model="gpt-5-nano", temperature=0.7)
     return {"messages":[llm.invoke(state["messages"])]}
 
 #definig the graph
 
-graph = StateGraph(State)
-graph.add_node("Superbot", superbot)
-graph.add_edge(START, "Superbot")
-graph.add_edge("Superbot", END)
-
-graph_builder = graph.compile()
+@lru_cache(maxsize=None)
+def build_graph():
+    from langgraph.graph import StateGraph, START, END
+    graph = StateGraph(State)
+    graph.add_node("Superbot", superbot)
+    graph.add_edge(START, "Superbot")
+    graph.add_edge("Superbot", END)
+    return graph.compile()
 
 # visulaize the graph
 
-# png_bytes = graph_builder.get_graph().draw_mermaid_png()
-
-# # Save the bytes to a file
-# with open("graph.png", "wb") as f:
-#     f.write(png_bytes)
-
-print(graph_builder.invoke({'messages':"Hi my name is Abhishek!!"}))
\ No newline at end of file
+def show_graph(path=None):
+    """Render the graph as a PNG: saved to `path` if given, otherwise displayed inline (notebooks)."""
+    png_bytes = build_graph().get_graph().draw_mermaid_png()
+    if path:
+        # Save the bytes to a file
+        with open(path, "wb") as f:
+            f.write(png_bytes)
+        return
+    from IPython.display import display, Image
+    display(Image(png_bytes))
+
+if __name__ == "__main__":
+    print(build_graph().invoke({'messages':"Hi my name is Abhishek!!"}))
@@ -6,27 +6,39 @@
 from typing import Annotated
 from typing_extensions import TypedDict
 
-from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
+from functools import lru_cache
 import os
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun
-from langchain_community.utilities import ArxivAPIWrapper,WikipediaAPIWrapper
-from langchain_tavily import TavilySearch
+
+# shared helpers come from the workflows package; run from the repository root:
+#   PYTHONPATH=. python "langgraph basics/chatbot_with_multiple_tools.py"
 # from langchain_tavily import TavilySearch
 
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["TAVILY_API_KEY"]=os.getenv("TAVILY_API_KEY")
+# "stub" swaps the search backends for local stand-ins (no network, no API keys)
+TOOLS_BACKEND = os.getenv("TOOLS_BACKEND", "live")
 
-api_wrapper_arxiv = ArxivAPIWrapper(top_k_results=2,doc_content_chars_max=500)
-api_wrapper_wiki = WikipediaAPIWrapper(top_k_results=2,doc_content_chars_max=500)
-arxiv = ArxivQueryRun(api_wrapper=api_wrapper_arxiv)
-wiki = WikipediaQueryRun(api_wrapper=api_wrapper_wiki)
-tavily = TavilySearch()
+# clients are created on first use, not at import
+@lru_cache(maxsize=None)
+def get_tools():
+    from dotenv import load_dotenv
+    from workflows.tool_cache import cached_tool, stub_search_tool
+    load_dotenv()
+    if TOOLS_BACKEND == "stub":
+        arxiv_tool, wiki_tool, tavily_tool = (stub_search_tool(n) for n in ("arxiv", "wikipedia", "tavily_search"))
+    else:
+        from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun
+        from langchain_community.utilities import ArxivAPIWrapper,WikipediaAPIWrapper
+        from langchain_tavily import TavilySearch
+        api_wrapper_arxiv = ArxivAPIWrapper(top_k_results=2,doc_content_chars_max=500)
+        api_wrapper_wiki = WikipediaAPIWrapper(top_k_results=2,doc_content_chars_max=500)
+        arxiv_tool = ArxivQueryRun(api_wrapper=api_wrapper_arxiv)
+        wiki_tool = WikipediaQueryRun(api_wrapper=api_wrapper_wiki)
+        tavily_tool = TavilySearch()
+    # results are cached per normalized query and identical in-flight queries share one request
+    arxiv = cached_tool(arxiv_tool, ttl=24 * 3600)
+    wiki = cached_tool(wiki_tool, ttl=24 * 3600)
+    tavily = cached_tool(tavily_tool, ttl=3600)
+    return [arxiv, wiki, tavily]
 
 # arxiv_result = arxiv.invoke("Attention is all you need")
 # print(arxiv_result)
@@ -37,9 +49,11 @@ tavily = TavilySearch()
 # result = wiki.invoke("Artificial Intelligence")
 # print(result)
 
-tools = [arxiv, wiki, tavily]
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.4)
-llm_with_tools = llm.bind_tools(tools)
+@lru_cache(maxsize=None)
+def get_llm_with_tools():
+    from workflows.models import chat_model
+    llm = chat_model(model="gpt-4.1-mini", temperature=0.4)
+    return llm.bind_tools(get_tools())
 # ai_result = llm_with_tools.invoke([HumanMessage(content="who is mark zuckerberg?")])
 # print(ai_result.tool_calls)
 
@@ -49,18 +63,36 @@ class State(TypedDict):
     messages: Annotated[list, add_messages]
 
 def tool_calling_llm(state: State):
-    return {"messages":[llm_with_tools.invoke(state["messages"])]}
-
-builder = StateGraph(State)
-
-builder.add_node("tool_calling_llm", tool_calling_llm)
-builder.add_node("tools", ToolNode(tools))
-builder.add_edge(START, "tool_calling_llm")
-builder.add_conditional_edges("tool_calling_llm",tools_condition)
-builder.add_edge("tools", END)
-graph = builder.compile()
-messages = graph.invoke({"messages":[HumanMessage(content="which llm model you are?")]} )
-for m in messages["messages"]:
-    m.pretty_print()
+    return {"messages":[get_llm_with_tools().invoke(state["messages"])]}
+
+@lru_cache(maxsize=None)
+def get_tool_node():
+    from workflows.concurrent_tools import ConcurrentToolNode
+    # tool calls of one turn run concurrently, each search backend with its own timeout and limit
+    return ConcurrentToolNode(get_tools(), limits={
+        "arxiv": {"timeout": 15, "max_concurrency": 2},
+        "wikipedia": {"timeout": 10, "max_concurrency": 2},
+        "tavily_search": {"timeout": 10, "max_concurrency": 4},
+    })
+
+@lru_cache(maxsize=None)
+def build_graph():
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.prebuilt import tools_condition
+    builder = StateGraph(State)
+
+    builder.add_node("tool_calling_llm", tool_calling_llm)
+    builder.add_node("tools", get_tool_node().as_node())
+    builder.add_edge(START, "tool_calling_llm")
+    builder.add_conditional_edges("tool_calling_llm",tools_condition)
+    builder.add_edge("tools", END)
+    return builder.compile()
+
+if __name__ == "__main__":
+    from langchain_core.messages import HumanMessage
+    messages = build_graph().invoke({"messages":[HumanMessage(content="which llm model you are?")]} )
+    for m in messages["messages"]:
+        m.pretty_print()
+    print(f"Tool latency: {get_tool_node().stats()}")
 
 
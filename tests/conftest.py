@@ -0,0 +1,31 @@
+"""Shared fixtures: the fake chat model backend, and the report graph running on it."""
+import pytest
+
+from workflows import llm_cache, models
+
+
+@pytest.fixture
+def fake_backend(tmp_path, monkeypatch):
+    """Every model is the instant fake; the files the graphs write (caches, checkpoints, reports) go to tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FAKE_LLM_LATENCY", "fixed:0")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_SECOND", "1000000")
+    monkeypatch.setattr(models, "LLM_BACKEND", "fake")
+    monkeypatch.setattr(models, "_models", {})
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    return tmp_path
+
+
+@pytest.fixture
+def report_graph(fake_backend, monkeypatch):
+    """The checkpointed report graph with a section store of its own and no section retries."""
+    from workflows import orchestrator_worker as report
+    from workflows import section_store
+    monkeypatch.setattr(section_store, "_store", section_store.SectionStore(str(fake_backend / "sections.sqlite")))
+    monkeypatch.setattr(report, "WORKER_RETRIES", 0)
+    cached = (report.get_llm, report.get_planner, report.build_graph)
+    for function in cached:
+        function.cache_clear()
+    yield report.build_graph(checkpointed=True)
+    for function in cached:
+        function.cache_clear()
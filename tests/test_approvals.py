@@ -0,0 +1,96 @@
+"""ApprovalPolicy rules and the ApprovalQueue that holds the calls a human has to see."""
+import asyncio
+import json
+
+import pytest
+
+from workflows.approvals import ApprovalPolicy, ApprovalQueue
+
+
+def call(name, **args):
+    return {"id": f"call_{name}", "name": name, "args": args}
+
+
+@pytest.mark.parametrize("tool_call", [
+    call("add", a=2, b=3),
+    call("multiply", a=-1_000_000, b=1_000_000),
+    call("divide", a=10, b=4),
+    call("subtract", a=0.5, b=-0.25),
+])
+def test_default_rules_approve_calculator_calls_in_range(tool_call):
+    assert ApprovalPolicy().review_reason(tool_call) is None
+
+
+@pytest.mark.parametrize("tool_call", [
+    call("divide", a=10, b=0),
+    call("multiply", a=1_000_001, b=2),
+    call("add", a="2", b=3),
+    call("add", a=True, b=3),
+    call("add", a=2),
+])
+def test_default_rules_send_risky_calls_to_review(tool_call):
+    assert "outside the auto-approved range" in ApprovalPolicy().review_reason(tool_call)
+
+
+def test_tool_without_a_rule_is_reviewed():
+    assert ApprovalPolicy().review_reason(call("delete_file", path="/")) == "no rule for tool 'delete_file'"
+
+
+def test_any_matching_rule_approves():
+    policy = ApprovalPolicy([
+        {"tool": "search", "args": {"source": {"in": ["arxiv", "wikipedia"]}}},
+        {"tool": "*", "args": {"dry_run": {"in": [True]}}},
+    ])
+    assert policy.review_reason(call("search", source="wikipedia")) is None
+    assert policy.review_reason(call("search", source="web")) is not None
+    assert policy.review_reason(call("search", source="web", dry_run=True)) is None
+    assert policy.review_reason(call("deploy", dry_run=True)) is None
+    assert policy.review_reason(call("deploy", dry_run=False)) is not None
+
+
+def test_rule_without_argument_constraints_approves_every_call():
+    assert ApprovalPolicy([{"tool": "lookup"}]).review_reason(call("lookup", anything=[1, 2])) is None
+
+
+def test_split_keeps_reasons_for_reviewed_calls():
+    safe, risky = call("add", a=1, b=2), call("divide", a=1, b=0)
+    approved, review = ApprovalPolicy().split([safe, risky])
+    assert approved == [safe]
+    assert [c for c, _ in review] == [risky]
+    assert "outside the auto-approved range" in review[0][1]
+
+
+def test_rules_from_env_text_and_file(tmp_path, monkeypatch):
+    rules = [{"tool": "add", "args": {"a": {"max": 10}}}]
+    monkeypatch.setenv("HITL_POLICY", json.dumps(rules))
+    assert ApprovalPolicy.from_env().rules == rules
+    path = tmp_path / "policy.json"
+    path.write_text(json.dumps(rules))
+    monkeypatch.setenv("HITL_POLICY", str(path))
+    policy = ApprovalPolicy.from_env()
+    assert policy.review_reason(call("add", a=10, b=99)) is None
+    assert policy.review_reason(call("add", a=11, b=0)) is not None
+    monkeypatch.delenv("HITL_POLICY")
+    assert len(ApprovalPolicy.from_env().rules) == 4
+
+
+def test_queue_resumes_the_thread_with_the_decision():
+    resumed = []
+
+    async def resume(approval, decision):
+        resumed.append((approval.thread_id, decision))
+
+    async def run():
+        queue = ApprovalQueue(resume=resume)
+        queue.add("t1", {"prompt": "first"})
+        queue.add("t2", {"prompt": "second"})
+        # a thread that pauses again replaces its older approval
+        queue.add("t1", {"prompt": "again"})
+        assert [a["request"]["prompt"] for a in queue.pending()] == ["second", "again"]
+        approval = await queue.wait(timeout=1)
+        await queue.resolve(approval.id, {"proceed": True})
+        return queue
+
+    queue = asyncio.run(run())
+    assert resumed == [("t2", {"proceed": True})]
+    assert [a["thread_id"] for a in queue.pending()] == ["t1"]
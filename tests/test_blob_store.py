@@ -0,0 +1,95 @@
+"""Blob store: large tool results offloaded to references, loaded back, deduplicated and aged out."""
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from workflows import blob_store
+from workflows.blob_store import BlobStore, blob_ref
+from workflows.concurrent_tools import ConcurrentToolNode
+
+BIG = "result line\n" * 200
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs.sqlite"), threshold=1000, preview=50)
+
+
+def result(content, call_id="call_1"):
+    return ToolMessage(content=content, tool_call_id=call_id, name="search")
+
+
+def test_large_results_become_a_preview_and_load_back_unchanged(store):
+    original = result(BIG)
+    offloaded = store.offload(original)
+    assert offloaded.content.startswith(BIG[:50]) and len(offloaded.content) < 200
+    assert f"{len(BIG) - 50} more characters" in offloaded.content
+    assert offloaded.artifact == {"blob": blob_ref(offloaded), "chars": len(BIG)}
+    assert offloaded.tool_call_id == "call_1" and original.content == BIG
+
+    loaded = store.load(offloaded)
+    assert loaded.content == BIG and loaded.tool_call_id == "call_1"
+    assert store.stats()["loads"] == 1
+
+
+def test_small_and_already_offloaded_results_are_left_alone(store):
+    small = result("short")
+    assert store.offload(small) is small
+    offloaded = store.offload(result(BIG))
+    assert store.offload(offloaded) is offloaded
+    assert store.stats()["offloaded"] == 1
+
+
+def test_identical_results_are_stored_once(store):
+    first, second = store.offload(result(BIG, "call_1")), store.offload(result(BIG, "call_2"))
+    assert blob_ref(first) == blob_ref(second)
+    stats = store.stats()
+    assert stats["offloaded"] == 2 and stats["blobs"] == 1 and stats["stored_chars"] == len(BIG)
+
+
+def test_expand_loads_the_latest_tool_turn_only_by_default(store):
+    older, latest = store.offload(result(BIG + "old", "call_1")), store.offload(result(BIG + "new", "call_2"))
+    messages = [HumanMessage(content="search twice"), AIMessage(content=""), older,
+                AIMessage(content=""), latest]
+    expanded = store.expand(messages)
+    assert expanded[2] is older and expanded[4].content == BIG + "new"
+    assert [m.content for m in store.expand(messages, latest_only=False)][2::2] == [BIG + "old", BIG + "new"]
+    assert messages[4] is latest
+
+
+def test_a_blob_that_aged_out_leaves_the_preview(store, monkeypatch):
+    offloaded = store.offload(result(BIG))
+    now = blob_store.time.time()
+    monkeypatch.setattr(blob_store.time, "time", lambda: now + store.max_age + 1)
+    store.put("something else")
+    assert store.load(offloaded) is offloaded
+    assert store.stats()["missing"] == 1 and store.stats()["blobs"] == 1
+
+
+def test_blobs_survive_a_new_store_on_the_same_file(store):
+    offloaded = store.offload(result(BIG))
+    assert BlobStore(store.path).load(offloaded).content == BIG
+
+
+def test_shared_store_is_off_with_blob_store_0(monkeypatch):
+    monkeypatch.setattr(blob_store, "_store", None)
+    monkeypatch.setattr(blob_store, "BLOB_STORE_ENABLED", False)
+    messages = [result("x")]
+    assert blob_store.get_blob_store() is None
+    assert blob_store.expand(messages) == messages
+
+
+@tool
+async def search(query: str) -> str:
+    """Search the web."""
+    return BIG if query == "big" else "small"
+
+
+def test_tool_node_offloads_large_results(store):
+    node = ConcurrentToolNode([search], offload=store.offload)
+    calls = [{"name": "search", "args": {"query": q}, "id": f"call_{q}", "type": "tool_call"} for q in ("big", "small")]
+    big, small = asyncio.run(node.ainvoke_state({"messages": [AIMessage(content="", tool_calls=calls)]}))["messages"]
+    assert blob_ref(big) and small.content == "small" and blob_ref(small) is None
+    assert store.load(big).content == BIG
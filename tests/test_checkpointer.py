@@ -0,0 +1,128 @@
+"""DeltaSqliteSaver: forks, restarts and resumed runs."""
+import asyncio
+import operator
+from typing import Annotated
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+from typing_extensions import TypedDict
+
+from workflows.checkpointer import DeltaSqliteSaver
+
+
+class State(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def step(name):
+    def node(state):
+        return {"steps": [name]}
+    return node
+
+
+def chain(saver, names="abc"):
+    builder = StateGraph(State)
+    for name in names:
+        builder.add_node(name, step(name))
+    for before, after in zip((START, *names), (*names, END)):
+        builder.add_edge(before, after)
+    return builder.compile(checkpointer=saver)
+
+
+def thread(thread_id="t"):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_fork_keeps_the_original_branch(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    graph = chain(DeltaSqliteSaver(path))
+    graph.invoke({"steps": ["start"]}, thread())
+    original = graph.get_state(thread()).config
+    after_a = next(s for s in graph.get_state_history(thread()) if s.next == ("b",))
+
+    forked = graph.update_state(after_a.config, {"steps": ["FORK"]}, as_node="b")
+    graph.invoke(None, forked)
+
+    assert graph.get_state(thread()).values["steps"] == ["start", "a", "FORK", "c"]
+    assert graph.get_state(original).values["steps"] == ["start", "a", "b", "c"]
+    reopened = chain(DeltaSqliteSaver(path))
+    assert reopened.get_state(original).values["steps"] == ["start", "a", "b", "c"]
+    assert reopened.get_state(thread()).values["steps"] == ["start", "a", "FORK", "c"]
+
+
+def test_long_thread_is_restored_from_deltas(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    graph = chain(DeltaSqliteSaver(path, snapshot_every=3), names="a")
+    for _ in range(20):
+        graph.invoke({"steps": ["user"]}, thread())
+    expected = ["user", "a"] * 20
+    assert graph.get_state(thread()).values["steps"] == expected
+    assert chain(DeltaSqliteSaver(path), names="a").get_state(thread()).values["steps"] == expected
+
+
+def approval_graph(saver):
+    def ask(state):
+        return {"steps": [interrupt("approve?")]}
+
+    builder = StateGraph(State)
+    builder.add_node("a", step("a"))
+    builder.add_node("ask", ask)
+    builder.add_edge(START, "a")
+    builder.add_edge("a", "ask")
+    builder.add_edge("ask", END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_interrupted_run_resumes_after_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    result = approval_graph(DeltaSqliteSaver(path)).invoke({"steps": []}, thread())
+    assert result["__interrupt__"][0].value == "approve?"
+
+    resumed = approval_graph(DeltaSqliteSaver(path)).invoke(Command(resume="yes"), thread())
+    assert resumed["steps"] == ["a", "yes"]
+
+
+def test_async_run_and_resume(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+
+    async def run():
+        await approval_graph(DeltaSqliteSaver(path)).ainvoke({"steps": []}, thread())
+        graph = approval_graph(DeltaSqliteSaver(path))
+        result = await graph.ainvoke(Command(resume="ok"), thread())
+        history = [s async for s in graph.aget_state_history(thread())]
+        return result, history
+
+    result, history = asyncio.run(run())
+    assert result["steps"] == ["a", "ok"]
+    assert len(history) >= 3
+
+
+class IntegerVersionSaver(DeltaSqliteSaver):
+    """The saver as it was before versions became strings."""
+    get_next_version = BaseCheckpointSaver.get_next_version
+
+
+def test_threads_with_integer_versions_continue(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    chain(IntegerVersionSaver(path), names="a").invoke({"steps": ["old"]}, thread())
+
+    graph = chain(DeltaSqliteSaver(path), names="a")
+    assert graph.get_state(thread()).values["steps"] == ["old", "a"]
+    graph.invoke({"steps": ["new"]}, thread())
+    assert graph.get_state(thread()).values["steps"] == ["old", "a", "new", "a"]
+    assert graph.checkpointer.compact("t", keep_last=1)["checkpoints_removed"] > 0
+    assert graph.get_state(thread()).values["steps"] == ["old", "a", "new", "a"]
+
+
+def test_compacted_thread_continues_from_a_full_snapshot(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    graph = chain(DeltaSqliteSaver(path), names="a")
+    graph.invoke({"steps": ["x"]}, thread())
+    assert graph.checkpointer.compact("t", keep_last=0)["blobs_removed"] > 0
+
+    # the same list again: a delta would point at a blob compact just removed
+    graph.update_state(thread(), {"steps": ["x", "a"]}, as_node="a")
+    assert graph.get_state(thread()).values["steps"] == ["x", "a"]
+    graph.invoke({"steps": ["y"]}, thread())
+    assert chain(DeltaSqliteSaver(path), names="a").get_state(thread()).values["steps"] == ["x", "a", "y", "a"]
@@ -0,0 +1,78 @@
+"""ConcurrentToolNode: calls of one turn in parallel, per-tool timeouts and limits, and errors as tool messages."""
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from workflows.concurrent_tools import ConcurrentToolNode
+
+running = {"now": 0, "peak": 0}
+
+
+@tool
+async def search(query: str) -> str:
+    """Search the web."""
+    running["now"] += 1
+    running["peak"] = max(running["peak"], running["now"])
+    await asyncio.sleep(0.2)
+    running["now"] -= 1
+    return f"results for {query}"
+
+
+@tool
+def stuck(query: str) -> str:
+    """A blocking backend that does not answer."""
+    time.sleep(1)
+    return "too late"
+
+
+@tool
+def broken(query: str) -> str:
+    """A backend that fails."""
+    raise ValueError("backend down")
+
+
+def turn(*names):
+    return {"messages": [AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"query": f"q{i}"}, "id": f"call_{i}", "type": "tool_call"}
+        for i, name in enumerate(names)])]}
+
+
+def test_calls_of_one_turn_run_at_the_same_time():
+    running.update(now=0, peak=0)
+    node = ConcurrentToolNode([search])
+    started = time.perf_counter()
+    messages = asyncio.run(node.ainvoke_state(turn("search", "search", "search")))["messages"]
+    assert time.perf_counter() - started < 0.5
+    assert [m.content for m in messages] == ["results for q0", "results for q1", "results for q2"]
+    assert [m.tool_call_id for m in messages] == ["call_0", "call_1", "call_2"]
+    assert running["peak"] == 3 and node.stats()["search"]["calls"] == 3
+
+
+def test_max_concurrency_queues_the_extra_calls():
+    running.update(now=0, peak=0)
+    node = ConcurrentToolNode([search], limits={"search": {"max_concurrency": 1}})
+    messages = asyncio.run(node.ainvoke_state(turn("search", "search")))["messages"]
+    assert running["peak"] == 1
+    assert max(m.response_metadata["queue_ms"] for m in messages) >= 150
+
+
+def test_a_slow_tool_times_out_without_holding_up_the_others():
+    node = ConcurrentToolNode([search, stuck], limits={"stuck": {"timeout": 0.05}})
+    started = time.perf_counter()
+    fast, slow = node.invoke_state(turn("search", "stuck"))["messages"]
+    assert time.perf_counter() - started < 0.5
+    assert fast.content == "results for q0" and fast.status == "success"
+    assert slow.status == "error" and slow.tool_call_id == "call_1"
+    assert json.loads(slow.content)["error"] == "timeout" and json.loads(slow.content)["timeout_seconds"] == 0.05
+    assert node.stats()["stuck"]["errors"] == 1 and node.stats()["search"]["errors"] == 0
+
+
+def test_failures_and_unknown_tools_come_back_as_error_messages():
+    node = ConcurrentToolNode([broken])
+    failed, unknown = node.invoke_state(turn("broken", "missing"))["messages"]
+    assert json.loads(failed.content) == {"error": "ValueError", "tool": "broken", "message": "backend down"}
+    assert json.loads(unknown.content)["error"] == "unknown_tool" and unknown.status == "error"
+
@@ -0,0 +1,104 @@
+"""FastRouter: keyword rules, the naive Bayes classifier, training from the log, thresholds and the audit sample."""
+import json
+
+import pytest
+
+from workflows.fast_router import FastRouter, NaiveBayes
+
+EXAMPLES = [
+    ("a bedtime piece about a brave little fox", "story"),
+    ("the adventures of a knight and a dragon", "story"),
+    ("something about a detective solving a case", "story"),
+    ("lines about the moon and the quiet sea", "poem"),
+    ("verses about autumn leaves falling", "poem"),
+    ("a few lines about love and longing", "poem"),
+    ("something silly about programmers and coffee", "joke"),
+    ("a one-liner about cats and keyboards", "joke"),
+    ("make me laugh about mondays", "joke"),
+]
+
+
+def trained(model, rounds=3):
+    for _ in range(rounds):
+        for text, label in EXAMPLES:
+            model.learn(text, label)
+    return model
+
+
+@pytest.mark.parametrize("text, label", [
+    ("write a poem about mom", "poem"),
+    ("Haiku on winter", "poem"),
+    ("tell me a JOKE about dentists", "joke"),
+    ("a short tale about a lighthouse", "story"),
+    ("a fable with a moral", "story"),
+])
+def test_a_single_keyword_routes_with_full_confidence(text, label):
+    assert FastRouter(log_path=None).predict(text) == (label, 1.0)
+
+
+def test_no_or_conflicting_keywords_are_left_to_the_classifier():
+    router = FastRouter(log_path=None)
+    assert router.predict("something about the sea") == (None, 0.0)
+    # "poem" and "joke" both match; an untrained classifier has no opinion
+    assert router.predict("a funny poem") == (None, 0.0)
+
+
+def test_classifier_needs_enough_examples_then_predicts():
+    model = NaiveBayes(min_examples=20)
+    assert model.predict("lines about the sea") == (None, 0.0)
+    trained(model)
+    assert model.examples == 27
+    label, probability = model.predict("quiet lines about the sea")
+    assert label == "poem" and 0.5 < probability <= 1.0
+    assert model.predict("a detective and a dragon")[0] == "story"
+
+
+def test_from_log_trains_on_earlier_decisions_and_learn_appends(tmp_path):
+    log = tmp_path / "decisions.jsonl"
+    log.write_text("".join(json.dumps({"input": t, "decision": d}) + "\n" for t, d in EXAMPLES * 3) + "\n")
+    router = FastRouter.from_log(str(log))
+    assert router.model.examples == 27
+    assert FastRouter.from_log(str(tmp_path / "missing.jsonl")).model.examples == 0
+
+    router.learn("an ode to the morning", "poem", guess="story")
+    assert json.loads(log.read_text().splitlines()[-1]) == {"input": "an ode to the morning", "decision": "poem"}
+    assert router.model.examples == 28
+
+
+def test_only_answers_at_the_threshold_skip_the_llm():
+    router = FastRouter(log_path=None)
+    trained(router.model)
+    label, confidence = router.predict("quiet lines about the sea")
+    assert label == "poem" and confidence < 1.0
+
+    router.threshold = confidence
+    assert router.try_route("quiet lines about the sea") == ("poem", "poem")
+    router.threshold = confidence + 1e-6
+    assert router.try_route("quiet lines about the sea") == (None, "poem")
+    # keyword matches are certain, so they pass any threshold up to 1
+    assert router.try_route("a poem please") == ("poem", "poem")
+    assert router.stats()["calls"] == 3 and router.stats()["fast_path_hits"] == 2
+
+
+def test_fallback_and_audit_disagreements_are_reported_apart():
+    answers = {"write a poem about rain": "story", "an ode to the morning": "poem"}
+    llm_calls = []
+
+    def llm_route(text):
+        llm_calls.append(text)
+        return answers[text]
+
+    router = FastRouter(audit_rate=1.0, log_path=None)
+    assert router.route("write a poem about rain", llm_route) == "poem"      # fast, audited, LLM disagrees
+    assert router.route("an ode to the morning", llm_route) == "poem"        # no guess, falls back
+    stats = router.stats()
+    assert llm_calls == ["write a poem about rain", "an ode to the morning"]
+    assert stats["fast_path_hits"] == 1 and stats["llm_fallbacks"] == 1
+    assert stats["audited"] == 1 and stats["audit_disagreement_rate"] == 1.0
+    assert stats["fallback_guesses_compared"] == 0 and stats["fallback_disagreement_rate"] == 0.0
+
+
+def test_without_audits_fast_answers_never_reach_the_llm():
+    router = FastRouter(audit_rate=0.0, log_path=None)
+    assert router.route("tell me a joke", lambda text: pytest.fail("LLM called")) == "joke"
+    assert router.stats()["audited"] == 0
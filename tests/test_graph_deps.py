@@ -0,0 +1,92 @@
+"""Dependency analysis: read/write sets from node source, the planned edges, critical paths and the rewired story graph."""
+import pytest
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from workflows import parallelization as story
+from workflows.graph_deps import ALL, analyze, critical_path, node_access, rewire
+from workflows.tracing import NodeTracer
+
+
+def test_reads_writes_and_model_calls_come_from_the_source():
+    title = node_access(story.title_generator)
+    assert title.reads == {"topic", "story_premise", "story_setting"} and title.writes == {"story_title"}
+    assert title.model_calls == 1 and not title.passthrough
+    assert node_access(story.merge_story_elements).passthrough
+    writer = node_access(story.story_writer_txt)
+    assert writer.reads == {"story_title", "final_Story"} and writer.writes == set()
+
+
+def test_handing_the_state_away_reads_every_key():
+    def opaque(state):
+        return summarize(state)       # noqa: F821 - never run
+
+    access = node_access(opaque)
+    assert access.reads == {ALL} and access.writes == {ALL}
+
+
+def test_story_plan_runs_the_title_next_to_the_final_story():
+    analysis = analyze(story.story_builder())
+    plan = analysis.plan()
+    assert "merge_story_elements" not in plan
+    assert plan["generate_story_premise"] == {START}
+    assert plan["finalize_story"] == {"generate_story_premise", "generate_story_setting", "generate_charachters"}
+    assert plan["title_generator"] == {"generate_story_premise", "generate_story_setting"}
+    assert plan["story_writer_txt"] == {"finalize_story", "title_generator"}
+
+    declared, _ = critical_path(analysis.declared(), analysis.weights)
+    planned, path = critical_path(plan, analysis.weights)
+    assert (declared, planned) == (3, 2) and "merge_story_elements" not in path
+
+
+def test_trace_durations_weight_the_critical_path():
+    durations = {"generate_story_setting": 900, "generate_story_premise": 100, "finalize_story": 500,
+                 "title_generator": 50}
+    analysis = analyze(story.story_builder(), durations)
+    length, path = critical_path(analysis.plan(), analysis.weights)
+    assert length == 1400 and path[:2] == ["generate_story_setting", "finalize_story"]
+    assert "(1400 ms)" in analysis.report()
+
+
+class Small(TypedDict):
+    text: str
+    summary: str
+
+
+def reads_a_typo(state: Small):
+    return {"summary": state["txet"]}
+
+
+def graph_with(node):
+    builder = StateGraph(Small)
+    builder.add_node("summarize", node)
+    builder.add_edge(START, "summarize")
+    builder.add_edge("summarize", END)
+    return builder
+
+
+def test_unknown_keys_warn_or_fail_in_strict_mode():
+    with pytest.warns(UserWarning, match="summarize reads unknown key 'txet'"):
+        analyze(graph_with(reads_a_typo))
+    with pytest.raises(ValueError, match="txet"):
+        analyze(graph_with(reads_a_typo), strict=True)
+
+
+def test_conditional_edges_are_not_rewired():
+    builder = graph_with(lambda state: {"summary": ""})
+    builder.add_conditional_edges("summarize", lambda state: END)
+    with pytest.raises(ValueError):
+        rewire(builder)
+
+
+def test_rewired_story_graph_runs_independent_nodes_in_one_step(fake_backend):
+    story.get_llm.cache_clear()
+    tracer = NodeTracer()
+    result = rewire(story.story_builder()).compile().invoke({"topic": "guests"}, {"callbacks": [tracer]})
+    story.get_llm.cache_clear()
+
+    steps = {span["node"]: span["step"] for span in tracer.spans}
+    assert "merge_story_elements" not in steps
+    assert steps["title_generator"] == steps["finalize_story"] == 2 and steps["story_writer_txt"] == 3
+    assert result["story_title"] and result["final_Story"]
+    assert (fake_backend / f"{result['story_title'].strip()[:100]}.txt").exists()
@@ -0,0 +1,88 @@
+"""HistoryManager: what is sent under a token budget, and how older turns are folded into the summary."""
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from workflows.fake_llm import FakeChatModel
+from workflows.history_window import HistoryManager, estimate_tokens
+
+
+def summarizer(folds):
+    """A fake model that records what it is asked to fold and answers with a numbered summary."""
+    def script(messages, tools):
+        folds.append(messages[-1].content)
+        return f"summary {len(folds)}"
+    return FakeChatModel(latency_mean=0.0, tokens_per_second=1e9, script=script)
+
+
+def conversation(turns, words=40, first=0):
+    messages = []
+    for i in range(first, first + turns):
+        messages.append(HumanMessage(content=f"question {i} " + "word " * words))
+        messages.append(AIMessage(content=f"answer {i} " + "word " * words))
+    return messages
+
+
+def tokens(messages):
+    return sum(estimate_tokens(m) for m in messages)
+
+
+def test_history_within_budget_is_sent_unchanged():
+    folds = []
+    history = HistoryManager(summarizer(folds), token_budget=10_000)
+    messages = conversation(3)
+    prompt, updates = history.prepare({"messages": messages})
+    assert prompt == messages
+    assert updates == {"summary": "", "summarized_upto": 0, "tokens_saved": 0}
+    assert folds == []
+
+
+def test_old_turns_are_folded_and_the_window_fits_the_budget():
+    folds = []
+    history = HistoryManager(summarizer(folds), token_budget=300, keep_ratio=0.6)
+    messages = conversation(10)
+    prompt, updates = history.prepare({"messages": messages})
+
+    assert len(folds) == 1
+    assert isinstance(prompt[0], SystemMessage) and "summary 1" in prompt[0].content
+    window = prompt[1:]
+    assert window == messages[updates["summarized_upto"]:]
+    assert isinstance(window[0], HumanMessage)
+    assert tokens(window) <= 300 * 0.6
+    assert updates["tokens_saved"] == tokens(messages) - tokens(prompt) > 0
+    assert "question 0" in folds[0] and f"question {len(messages) // 2 - 1}" not in folds[0]
+
+
+def test_next_fold_only_sees_the_newly_dropped_turns():
+    folds = []
+    history = HistoryManager(summarizer(folds), token_budget=300)
+    messages = conversation(10)
+    _, state = history.prepare({"messages": messages})
+    messages += conversation(4, first=10)
+    state = {"messages": messages, **state}
+    _, updates = history.prepare(state)
+
+    assert len(folds) == 2
+    assert "summary 1" in folds[1]
+    assert "question 0 " not in folds[1]
+    assert updates["summary"] == "summary 2"
+    assert updates["summarized_upto"] > state["summarized_upto"]
+
+
+def test_tool_results_stay_with_their_tool_call():
+    history = HistoryManager(summarizer([]), token_budget=200)
+    messages = conversation(6)
+    call = {"name": "search", "args": {"query": "x" * 200}, "id": "call_1", "type": "tool_call"}
+    messages += [HumanMessage(content="look it up"), AIMessage(content="", tool_calls=[call]),
+                 ToolMessage(content="result " * 50, tool_call_id="call_1"), AIMessage(content="done")]
+    prompt, _ = history.prepare({"messages": messages})
+    # the last turn alone is over budget, but it is sent whole
+    assert prompt[-4:] == messages[-4:]
+    assert isinstance(prompt[1], HumanMessage) and prompt[1].content == "look it up"
+
+
+def test_budget_can_be_set_per_thread():
+    folds = []
+    history = HistoryManager(summarizer(folds), token_budget=10_000)
+    messages = conversation(10)
+    prompt, _ = history.prepare({"messages": messages}, {"configurable": {"history_token_budget": 300}})
+    assert len(folds) == 1 and len(prompt) < len(messages)
+    assert history.stats()["folds"] == 1 and history.stats()["tokens_saved"] > 0
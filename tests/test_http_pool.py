@@ -0,0 +1,112 @@
+"""Endpoint pools: the per-URL registry and the metrics against the local fake OpenAI server."""
+import asyncio
+
+import httpx
+import pytest
+
+from workflows import fake_openai_server, http_pool
+from workflows.fake_openai_server import start_server
+from workflows.http_pool import Endpoint
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(http_pool, "_endpoints", {})
+    monkeypatch.setattr(http_pool, "ENDPOINT_LIMITS", {})
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv("FAKE_LLM_LATENCY", "fixed:0.1")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_SECOND", "1000000")
+    fake_openai_server.fake_model.cache_clear()
+    server = start_server(handshake_delay=0.05)
+    yield server
+    server.shutdown()
+    server.server_close()
+    fake_openai_server.fake_model.cache_clear()
+
+
+CHAT = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def chat(client, api):
+    return client.post(f"{api.base_url}/chat/completions", json=CHAT)
+
+
+def test_one_endpoint_per_base_url(registry):
+    http_pool.configure_endpoint("http://api.test/v1/", max_connections=4)
+    endpoint = http_pool.get_endpoint("http://api.test/v1")
+    assert http_pool.get_endpoint("http://api.test/v1/") is endpoint
+    assert endpoint.limits.max_connections == 4
+    assert http_pool.get_endpoint("http://other.test/v1").limits.max_connections == http_pool.HTTP_MAX_CONNECTIONS
+    with pytest.raises(RuntimeError):
+        http_pool.configure_endpoint("http://api.test/v1", max_connections=8)
+    assert set(http_pool.pool_stats()) == {"http://api.test/v1", "http://other.test/v1"}
+
+
+def test_sequential_requests_reuse_one_connection(api):
+    endpoint = Endpoint(api.base_url)
+    for _ in range(3):
+        assert chat(endpoint.client, api).status_code == 200
+    stats = endpoint.stats()
+    endpoint.close()
+
+    assert stats["requests"] == 3 and stats["connections_opened"] == 1
+    assert stats["in_flight"] == 0 and stats["peak_in_flight"] == 1
+    assert stats["connect_ms_p50"] is not None
+    assert api.stats()["connections"] == 1
+
+
+def test_concurrent_requests_are_capped_by_max_connections(api):
+    endpoint = Endpoint(api.base_url, max_connections=2)
+
+    async def run():
+        responses = await asyncio.gather(*(chat(endpoint.async_client, api) for _ in range(6)))
+        return [r.status_code for r in responses]
+
+    assert asyncio.run(run()) == [200] * 6
+    stats = endpoint.stats()
+    endpoint.close()
+    assert stats["requests"] == 6 and stats["connections_opened"] == 2
+    assert stats["peak_in_flight"] == 2 and stats["peak_utilization"] == 1.0
+    assert stats["in_flight"] == 0
+    assert stats["wait_ms_p95"] > 0
+
+
+def test_streamed_response_is_in_flight_until_closed(api):
+    endpoint = Endpoint(api.base_url)
+    with endpoint.client.stream("POST", f"{api.base_url}/chat/completions", json=CHAT) as response:
+        assert endpoint.stats()["in_flight"] == 1
+        response.read()
+    assert endpoint.stats()["in_flight"] == 0
+    endpoint.close()
+
+
+class FailingAfterHeaders(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Fails a request after its headers were sent, without httpcore's response_closed event."""
+
+    def handle_request(self, request):
+        request.extensions["trace"]("http11.send_request_headers.started", {})
+        raise httpx.ReadError("connection reset")
+
+    async def handle_async_request(self, request):
+        await request.extensions["trace"]("http11.send_request_headers.started", {})
+        raise httpx.ReadError("connection reset")
+
+
+def test_failed_requests_do_not_stay_in_flight(monkeypatch):
+    endpoint = Endpoint("http://api.test/v1")
+    endpoint._sync_transport = FailingAfterHeaders()
+    monkeypatch.setattr(endpoint, "async_transport", FailingAfterHeaders)
+
+    with pytest.raises(httpx.ReadError):
+        endpoint.client.get("http://api.test/v1/models")
+
+    async def run():
+        with pytest.raises(httpx.ReadError):
+            await endpoint.async_client.get("http://api.test/v1/models")
+
+    asyncio.run(run())
+    stats = endpoint.stats()
+    assert stats["requests"] == 2 and stats["peak_in_flight"] == 1 and stats["in_flight"] == 0
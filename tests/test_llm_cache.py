@@ -0,0 +1,72 @@
+"""LLM cache: key normalization, LRU and age eviction, and which models `cached` wraps."""
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+from workflows import llm_cache
+from workflows.fake_llm import FakeChatModel
+from workflows.llm_cache import SQLiteLLMCache, cache_key, cached
+
+
+def prompt(*contents):
+    return json.dumps([{"type": "human", "data": {"content": c, "type": "human"}} for c in contents])
+
+
+def answer(text):
+    return [ChatGeneration(message=AIMessage(content=text))]
+
+
+def test_keys_ignore_whitespace_and_key_order_but_not_the_model():
+    assert cache_key(prompt("a poem  about\n the sea"), "gpt") == cache_key(prompt("a poem about the sea"), "gpt")
+    reordered = json.dumps([{"data": {"type": "human", "content": "hi"}, "type": "human"}])
+    assert cache_key(reordered, "gpt") == cache_key(prompt("hi"), "gpt")
+    assert cache_key("plain   text", "gpt") == cache_key("plain text", "gpt")
+    assert cache_key(prompt("hi"), "gpt") != cache_key(prompt("hello"), "gpt")
+    assert cache_key(prompt("hi"), "gpt") != cache_key(prompt("hi"), "gpt-mini")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path, clock):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    for text in ("one", "two"):
+        cache.update(prompt(text), "gpt", answer(text))
+        clock[0] += 1
+    assert cache.lookup(prompt("one"), "gpt")[0].message.content == "one"
+    clock[0] += 1
+    cache.update(prompt("three"), "gpt", answer("three"))
+
+    assert cache.lookup(prompt("two"), "gpt") is None
+    assert cache.lookup(prompt("one"), "gpt") and cache.lookup(prompt("three"), "gpt")
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "evictions": 1, "entries": 2}
+
+
+def test_entries_older_than_max_age_miss_and_are_evicted(tmp_path, clock):
+    cache = SQLiteLLMCache(str(tmp_path / "cache.sqlite"), max_age=60)
+    cache.update(prompt("old"), "gpt", answer("old"))
+    clock[0] += 61
+    assert cache.lookup(prompt("old"), "gpt") is None
+    cache.update(prompt("new"), "gpt", answer("new"))
+    assert cache.stats()["entries"] == 1 and cache.stats()["evictions"] == 1
+
+
+def test_only_deterministic_models_are_cached_unless_the_node_opts_in(fake_backend):
+    assert cached(FakeChatModel()).cache is llm_cache.get_cache()
+    assert cached(FakeChatModel(temperature=0)).cache is llm_cache.get_cache()
+    sampling = FakeChatModel(temperature=0.7)
+    assert cached(sampling) is sampling
+    assert cached(sampling, allow_nonzero_temperature=True).cache is llm_cache.get_cache()
+
+
+def test_repeated_calls_are_answered_from_disk(fake_backend):
+    llm = cached(FakeChatModel(latency_mean=0.0))
+    first = llm.invoke("tell me   a joke").content
+    assert llm.invoke("tell me a joke").content == first
+    assert llm_cache.cache_stats()["hits"] == 1 and llm_cache.cache_stats()["entries"] == 1
@@ -0,0 +1,91 @@
+"""Model tiers on the fake backend: the tier and cap per node, escalation, and what the cache keeps of it."""
+import asyncio
+from typing import Literal
+
+import pytest
+from pydantic import BaseModel
+
+from workflows import llm_cache, model_tiers
+from workflows.llm_cache import cached
+
+CONFIG = {
+    "tiers": {"small": "gpt-4.1-nano", "medium": "gpt-4.1-mini", "large": "gpt-4.1"},
+    "escalation": ["small", "medium", "large"],
+    "prices": {"gpt-4.1-nano": [0.10, 0.40]},
+    "nodes": {
+        "test.route": {"tier": "small", "max_tokens": 2},
+        "test.roomy": {"tier": "small", "max_tokens": 200},
+        "test.write": {"tier": "medium", "max_tokens": 1500},
+    },
+}
+
+
+class Route(BaseModel):
+    step: Literal["story", "poem", "joke"]
+
+
+@pytest.fixture
+def tiers(fake_backend, monkeypatch):
+    monkeypatch.setattr(model_tiers, "_config", CONFIG)
+    monkeypatch.setattr(model_tiers, "MODEL_TIERS_ENABLED", True)
+    monkeypatch.setattr(model_tiers, "_structured_calls", model_tiers.defaultdict(int))
+    monkeypatch.setattr(model_tiers, "_escalations", model_tiers.defaultdict(int))
+
+
+def test_nodes_get_their_tier_and_cap_and_can_escalate_upwards(tiers):
+    assert model_tiers.node_tiers("test.route") == [
+        ("small", "gpt-4.1-nano", 2), ("medium", "gpt-4.1-mini", None), ("large", "gpt-4.1", None)]
+    assert model_tiers.node_tiers("test.write") == [("medium", "gpt-4.1-mini", 1500), ("large", "gpt-4.1", None)]
+    assert model_tiers.node_tiers("test.unknown") == []
+
+    llm = model_tiers.node_model("test.write", model="gpt-4.1", temperature=0.5)
+    assert (llm.model_name, llm.max_tokens, llm.temperature) == ("gpt-4.1-mini", 1500, 0.5)
+    untiered = model_tiers.node_model("test.unknown", model="gpt-4.1")
+    assert (untiered.model_name, untiered.max_tokens) == ("gpt-4.1", None)
+
+
+def test_disabled_tiers_give_every_node_its_own_model(tiers, monkeypatch):
+    monkeypatch.setattr(model_tiers, "MODEL_TIERS_ENABLED", False)
+    assert model_tiers.node_tiers("test.route") == []
+    assert model_tiers.node_model("test.route", model="gpt-4.1").model_name == "gpt-4.1"
+
+
+def test_valid_answer_on_the_own_tier_is_not_escalated(tiers):
+    route = model_tiers.structured_model("test.roomy", Route)
+    assert route.invoke("poem about mom") == Route(step="poem")
+    assert model_tiers.tier_stats()["structured_calls"] == {"test.roomy": 1}
+    assert model_tiers.tier_stats()["escalations_total"] == 0
+
+
+def test_cut_off_answer_escalates_to_the_next_tier(tiers):
+    route = model_tiers.structured_model("test.route", Route)
+    assert asyncio.run(route.ainvoke("joke about cats")) == Route(step="joke")
+    stats = model_tiers.tier_stats()
+    assert stats["structured_calls"] == {"test.route": 2} and stats["escalations"] == {"test.route": 1}
+
+
+def test_rejected_answers_are_not_kept_in_the_cache(tiers):
+    route = model_tiers.structured_model("test.route", Route, temperature=0.9,
+                                         wrap=lambda llm: cached(llm, allow_nonzero_temperature=True))
+    assert route.invoke("poem about mom") == Route(step="poem")
+    assert llm_cache.cache_stats()["entries"] == 1
+
+    # the small tier is asked again instead of replaying its cut-off answer; the medium one is a hit
+    assert asyncio.run(route.ainvoke("poem about mom")) == Route(step="poem")
+    stats = llm_cache.cache_stats()
+    assert stats["entries"] == 1 and stats["hits"] == 1
+
+
+def test_track_keys_sees_lookups_and_writes(tiers):
+    llm = cached(model_tiers.node_model("test.write"))
+    with llm_cache.track_keys() as keys:
+        llm.invoke("hello")
+        llm.invoke("hello")
+    assert len(keys) == 3 and len(set(keys)) == 1
+    llm_cache.forget(keys)
+    assert llm_cache.cache_stats()["entries"] == 0
+
+
+def test_call_cost_uses_list_prices(tiers):
+    assert model_tiers.call_cost("gpt-4.1-nano", 1_000_000, 500_000) == pytest.approx(0.30)
+    assert model_tiers.call_cost("unpriced", 10, 10) == 0.0
@@ -0,0 +1,109 @@
+"""OrderedSink: sections written in index order as they stream, and a retried section rewound."""
+import io
+
+import pytest
+
+from workflows.output_sink import OrderedSink, StdoutSink, StreamingSink, TeeSink, stream_text
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class Model:
+    """Streams the given chunks, then raises `error` if set."""
+
+    def __init__(self, chunks, error=None):
+        self.chunks, self.error = chunks, error
+
+    def stream(self, prompt):
+        for text in self.chunks:
+            yield Chunk(text)
+        if self.error:
+            raise self.error
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_ordered_sink_needs_an_emit():
+    class NoEmit(OrderedSink):
+        pass
+
+    with pytest.raises(TypeError):
+        NoEmit()
+
+
+def test_sections_are_written_in_order_and_only_later_ones_are_held(tmp_path):
+    sink = StreamingSink(str(tmp_path / "report.txt"), header="# title\n", separator="|")
+    sink.append(1, "one ")
+    sink.append(2, "two")
+    sink.append(0, "zero ")
+    # section 0 writes straight through, 1 and 2 wait for it
+    assert read(sink.partial_path) == "# title\nzero "
+    assert sink._pending == {1: ["one "], 2: ["two"]}
+
+    sink.finish_section(2)
+    sink.append(0, "done")
+    sink.finish_section(0)
+    assert read(sink.partial_path) == "# title\nzero done|one "
+    sink.append(1, "more")
+    sink.finish_section(1)
+    assert read(sink.partial_path) == "# title\nzero done|one more|two"
+    assert sink._pending == {}
+
+    assert sink.close() == str(tmp_path / "report.txt")
+    assert read(tmp_path / "report.txt") == "# title\nzero done|one more|two"
+    assert not (tmp_path / "report.txt.partial").exists()
+
+
+def test_close_writes_unfinished_sections_in_order_and_prepends_the_header(tmp_path):
+    sink = StreamingSink(str(tmp_path / "report.txt"), separator="\n")
+    sink.append(2, "c")
+    sink.append(1, "b")
+    sink.close(str(tmp_path / "final.txt"), header="topic\n")
+    assert read(tmp_path / "final.txt") == "topic\n\nb\nc"
+
+
+def test_restart_rewinds_the_head_section(tmp_path):
+    sink = StreamingSink(str(tmp_path / "report.txt"), separator="|")
+    sink.append(0, "zero")
+    sink.finish_section(0)
+    sink.append(1, "first attempt")
+    sink.append(2, "held")
+    with pytest.raises(RuntimeError):
+        stream_text(Model(["second ", "attempt"], error=RuntimeError("cut off")), "prompt", sink, index=1)
+    assert read(sink.partial_path) == "zero"
+
+    assert stream_text(Model(["third ", "attempt"]), "prompt", sink, index=1) == "third attempt"
+    sink.finish_section(2)
+    assert read(sink.partial_path) == "zero|third attempt|held"
+
+
+def test_restart_of_a_held_section_drops_its_buffer_and_ignores_finished_ones(tmp_path):
+    sink = StreamingSink(str(tmp_path / "report.txt"))
+    sink.append(0, "zero")
+    sink.append(1, "stale")
+    sink.restart_section(1)
+    sink.append(1, "fresh")
+    sink.finish_section(0)
+    sink.restart_section(0)
+    sink.finish_section(1)
+    assert read(sink.partial_path) == "zerofresh"
+
+
+def test_stdout_marks_a_retry_and_tee_forwards_to_every_sink(tmp_path):
+    out = io.StringIO()
+    sink = TeeSink(StreamingSink(str(tmp_path / "report.txt")), StdoutSink(out, separator=" "))
+    sink.append(0, "partial")
+    sink.restart_section(0)
+    sink.append(0, "whole")
+    sink.finish_section(0)
+    sink.append(1, "next")
+    assert sink.first_output is not None
+    assert sink.close() == str(tmp_path / "report.txt")
+    assert read(tmp_path / "report.txt") == "wholenext"
+    assert out.getvalue() == "partial\n[retrying section]\nwhole next\n"
@@ -0,0 +1,105 @@
+"""Pipelined planner on the fake model: sections start while the plan streams, once each, under their own node."""
+import asyncio
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+
+from workflows import fake_llm, model_tiers
+from workflows import orchestrator_worker as report
+from workflows.fake_llm import FakeChatModel
+
+
+def start(topic="pipelines"):
+    return {"topic": topic, "sections": [], "completed_sections": [], "section_runs": [], "final_report": ""}
+
+
+def run(graph, config=None):
+    return asyncio.run(graph.ainvoke(start(), {"configurable": {"thread_id": "run"}, **(config or {})}))
+
+
+def record_writes(monkeypatch, events):
+    generate = report.agenerate_section
+
+    async def recorded(state, config, llm):
+        events.append(f"write {state['section'].name}")
+        return await generate(state, config, llm)
+
+    monkeypatch.setattr(report, "agenerate_section", recorded)
+
+
+def test_sections_are_written_while_the_plan_is_still_streaming(report_graph, monkeypatch):
+    # a planner slow enough that the plan takes a while to stream; section writers stay instant
+    planner = FakeChatModel(latency_mean=0.0, tokens_per_second=2000)
+    writer = FakeChatModel(latency_mean=0.0, tokens_per_second=1e9)
+    monkeypatch.setattr(report, "get_llm", lambda node=None: planner if node == "orchestrator" else writer)
+    events, stream_plan = [], report.astream_plan
+
+    async def recorded_plan(topic):
+        async for section in stream_plan(topic):
+            yield section
+        events.append("plan done")
+
+    monkeypatch.setattr(report, "astream_plan", recorded_plan)
+    record_writes(monkeypatch, events)
+    result = run(report_graph)
+
+    sections = result["sections"]
+    assert len(sections) >= 3
+    assert events.index(f"write {sections[0].name}") < events.index("plan done")
+    assert sorted(e for e in events if e.startswith("write")) == sorted(f"write {s.name}" for s in sections)
+    assert [r["name"] for r in result["section_runs"]] == [s.name for s in sections]
+    assert report._prefetched == {}
+
+
+def test_a_streamed_plan_is_cached_for_the_next_run(fake_backend):
+    report.get_llm.cache_clear()
+
+    async def plan():
+        return [section async for section in report.astream_plan("caching")]
+
+    first = asyncio.run(plan())
+    calls = len(fake_llm.CALL_LOG)
+    assert asyncio.run(plan()) == first and len(first) > 0
+    assert len(fake_llm.CALL_LOG) == calls
+    report.get_llm.cache_clear()
+
+
+def test_an_escalated_plan_keeps_the_writers_of_unchanged_sections(report_graph, monkeypatch):
+    kept, dropped, added = (report.Section(name=n, description=f"about {n}") for n in ("Kept", "Dropped", "Added"))
+
+    async def cut_off_plan(topic):
+        yield kept
+        yield dropped
+        raise OutputParserException("the plan was cut off at max_tokens")
+
+    class Planner:
+        async def ainvoke(self, messages):
+            return report.Sections(sections=[kept, added])
+
+    monkeypatch.setattr(report, "astream_plan", cut_off_plan)
+    monkeypatch.setattr(report, "get_planner", lambda: Planner())
+    monkeypatch.setattr(model_tiers, "_escalations", model_tiers.defaultdict(int))
+    events = []
+    record_writes(monkeypatch, events)
+    result = run(report_graph)
+
+    assert result["sections"] == [kept, added]
+    assert [r["name"] for r in result["section_runs"]] == ["Kept", "Added"]
+    assert events.count("write Kept") == 1 and events.count("write Added") == 1
+    assert model_tiers.tier_stats()["escalations"] == {report.PLANNER_NODE: 1}
+    assert report._prefetched == {}
+
+
+class NodeOfModelCalls(BaseCallbackHandler):
+    def __init__(self):
+        self.nodes = []
+
+    def on_chat_model_start(self, serialized, messages, *, metadata=None, **kwargs):
+        self.nodes.append((metadata or {}).get("langgraph_node"))
+
+
+def test_prefetched_sections_count_for_the_worker_node(report_graph):
+    calls = NodeOfModelCalls()
+    result = run(report_graph, {"callbacks": [calls]})
+    assert calls.nodes.count("orchestrator") == 1
+    assert calls.nodes.count("llm_call") == len(result["sections"])
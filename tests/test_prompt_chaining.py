@@ -0,0 +1,67 @@
+"""Story chain on fake models: model calls per revision round, the early stop and the REVISE_MODE switch."""
+import pytest
+
+from workflows import promptChaining as chain
+from workflows.fake_llm import FakeChatModel
+
+
+def fake(**kwargs):
+    return FakeChatModel(latency_mean=0.0, tokens_per_second=1e9, **kwargs)
+
+
+@pytest.fixture
+def story(fake_backend, monkeypatch):
+    """Runs the chain in a given mode with fake models; returns (rounds, model calls)."""
+    monkeypatch.setattr(chain, "MAX_REVISION_ROUNDS", 3)
+    monkeypatch.setattr(chain, "get_llm", lambda node=None: fake())
+    chain.build_graph.cache_clear()
+
+    def run(mode, reviser=None, conflicts=None):
+        monkeypatch.setattr(chain, "REVISE_MODE", mode)
+        if reviser:
+            model = fake(structured={"Revision": reviser}).with_structured_output(chain.Revision)
+            monkeypatch.setattr(chain, "get_reviser", lambda: model)
+        if conflicts:
+            monkeypatch.setattr(chain, "get_conflict_llm", lambda: fake(script=lambda m, t: conflicts.pop(0)))
+        counter = chain.call_counter()
+        result = chain.build_graph().invoke({"topic": "a lighthouse keeper"}, {"callbacks": [counter]})
+        assert result["final_story"]
+        return result["rounds"], counter.calls
+
+    yield run
+    chain.build_graph.cache_clear()
+
+
+def drafts():
+    """A reviser that finds conflicts every time and rewrites the story completely."""
+    count = iter(range(100))
+    return lambda messages: {"has_conflicts": True, "revised_story": f"draft {next(count)} " * 20}
+
+
+def test_single_mode_makes_one_call_per_round_up_to_the_limit(story):
+    rounds, calls = story("single", reviser=drafts())
+    assert rounds == 3
+    assert calls == 1 + 3 + 1    # premise, one revision per round, final story
+
+
+def test_single_mode_stops_once_the_story_has_no_conflicts(story):
+    rounds, calls = story("single", reviser=lambda m: {"has_conflicts": False, "revised_story": "fine as it is"})
+    assert (rounds, calls) == (1, 3)
+
+
+def test_single_mode_stops_once_a_revision_barely_changes_the_text(story):
+    same = "the keeper lit the lamp and the ships came home safely"
+    rounds, calls = story("single", reviser=lambda m: {"has_conflicts": True, "revised_story": same})
+    # round 1 rewrites the premise, round 2 returns the same text again
+    assert (rounds, calls) == (2, 4)
+
+
+def test_legacy_mode_makes_two_calls_per_round(story):
+    rounds, calls = story("legacy", conflicts=["Yes.", "Yes.", "No."])
+    assert rounds == 2
+    assert calls == 1 + 2 * 2 + 1 + 1    # premise, check + rewrite per round, passing check, final story
+
+
+def test_legacy_mode_stops_checking_after_the_last_round(story):
+    rounds, calls = story("legacy", conflicts=["Yes."] * 3)
+    assert rounds == 3 and calls == 1 + 2 * 3 + 1
@@ -0,0 +1,59 @@
+"""Prompt registry: static system blocks first, the variable part last, and the cached-prefix meter."""
+import string
+from collections import OrderedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from workflows import fake_llm
+from workflows.fake_llm import FakeChatModel
+from workflows.prompts import TEMPLATES, prefix_cache_meter, prompt, system_message, template_of, with_history
+
+
+def placeholders(template):
+    return {field for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+@pytest.mark.parametrize("name", [name for name, (_, user) in TEMPLATES.items() if user])
+def test_every_template_is_its_static_block_then_the_filled_in_user_part(name):
+    values = {field: f"<{field}>" for field in placeholders(TEMPLATES[name][1])}
+    system, user = prompt(name, **values)
+    assert system is system_message(name) and system.content == TEMPLATES[name][0]
+    assert isinstance(user, HumanMessage) and all(v in user.content for v in values.values())
+    # the variable part never leaks into the block that is meant to be cached
+    assert not placeholders(system.content)
+    assert template_of([system, user]) == name
+
+
+def test_system_blocks_are_unique_so_calls_can_be_attributed():
+    assert len({system for system, _ in TEMPLATES.values()}) == len(TEMPLATES)
+
+
+def test_missing_values_fail_loudly():
+    with pytest.raises(KeyError):
+        prompt("story_title", topic="tides")
+
+
+def test_history_goes_after_the_block():
+    history = [HumanMessage(content="2 + 3?"), AIMessage(content="5")]
+    messages = with_history("calculator_assistant", history)
+    assert messages == [system_message("calculator_assistant"), *history]
+    assert template_of(messages) == "calculator_assistant"
+    assert template_of(history) is None and template_of([]) is None
+
+
+def test_meter_counts_the_shared_block_as_cached_from_the_second_call(monkeypatch):
+    monkeypatch.setattr(fake_llm, "PREFIX_CACHE_MIN", 1)
+    monkeypatch.setattr(fake_llm, "_prefixes", OrderedDict())
+    llm = FakeChatModel(latency_mean=0.0, tokens_per_second=1e9)
+    meter = prefix_cache_meter()
+    for name in ("Scope", "Risks"):
+        llm.invoke(prompt("report_section", name=name, description="what it covers"), {"callbacks": [meter]})
+    llm.invoke("no template", {"callbacks": [meter]})
+
+    stats = meter.stats()
+    block = fake_llm.estimate_tokens(TEMPLATES["report_section"][0])
+    assert stats["report_section"]["calls"] == 2 and stats["report_section"]["cached_tokens"] == block
+    assert stats["untemplated"]["calls"] == 1 and stats["untemplated"]["cached_tokens"] == 0
+    assert 0 < meter.cached_ratio() < stats["report_section"]["cached_ratio"] < 1
+    assert prefix_cache_meter().cached_ratio() == 0.0
@@ -0,0 +1,151 @@
+"""Rate limiter: token buckets, adaptive limits on 429s, retry classification and the retries a report section gets."""
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from workflows import orchestrator_worker as report
+from workflows import rate_limit
+from workflows.fake_llm import FakeChatModel
+from workflows.rate_limit import RateLimiter, TokenBucket, backoff, is_retryable, limiter_attempts, rate_limited
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class APIError(Exception):
+    def __init__(self, status, headers=None, code=None, type=None):
+        super().__init__(f"status {status}")
+        self.response = Response(status, headers)
+        self.code = code
+        self.type = type
+
+
+def test_bucket_holds_burst_seconds_of_budget_and_refills():
+    bucket = TokenBucket(per_minute=60, burst_s=10)
+    assert bucket.capacity == 10 and bucket.deficit(10, bucket.updated) == 0
+    bucket.take(10)
+    assert bucket.deficit(1, bucket.updated) == pytest.approx(1.0)
+    assert bucket.deficit(1, bucket.updated + 0.5) == pytest.approx(0.5)
+    # a request bigger than the bucket waits until the bucket is full, not forever
+    assert bucket.deficit(100, bucket.updated + 10) == 0
+    bucket.give(100)
+    assert bucket.level == bucket.capacity
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (APIError(429), True),
+    (APIError(408), True),
+    (APIError(503), True),
+    (APIError(400), False),
+    (APIError(401), False),
+    (APIError(429, code="insufficient_quota"), False),
+    (TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (ValueError("bad schema"), False),
+])
+def test_transient_failures_are_retried(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_backoff_follows_retry_after_and_caps_the_jitter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_MAX", 30)
+    assert backoff(0, APIError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert backoff(0, APIError(429, {"retry-after": "2"})) == 2.0
+    assert backoff(0, APIError(429, {"retry-after": "600"})) == 30
+    assert all(0 <= backoff(attempt) <= 30 for attempt in range(12))
+
+
+def test_rate_limit_response_halves_the_limit_once_per_cooldown(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RECOVER_EVERY", 3)
+    limiter = RateLimiter("test", rpm=600, tpm=100_000)
+    assert limiter.failed(APIError(429, {"retry-after": "1"}, type="requests"), attempt=0)
+    # the 429s of calls already in flight count as the same one
+    assert limiter.failed(APIError(429, type="requests"), attempt=0)
+    assert (limiter.rpm, limiter.tpm) == (300, 100_000)
+    assert limiter.paused_until > 0 and limiter.rate_limited == 2
+
+    for _ in range(3):
+        limiter.succeeded(100)
+    assert limiter.rpm == pytest.approx(330)
+
+
+def test_limits_never_drop_below_a_sixteenth(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_COOLDOWN_S", 0)
+    limiter = RateLimiter("test", rpm=160, tpm=16_000)
+    for _ in range(10):
+        limiter.failed(APIError(429), attempt=0)
+    assert (limiter.rpm, limiter.tpm) == (10, 1000)
+
+
+def test_given_up_errors_carry_the_attempts(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RETRIES", 2)
+    limiter = RateLimiter("test")
+    error = APIError(503)
+    assert limiter.failed(error, attempt=1) and limiter_attempts(error) == 0
+    assert not limiter.failed(error, attempt=2) and limiter_attempts(error) == 3
+    bad_request = APIError(400)
+    assert not limiter.failed(bad_request, attempt=0) and limiter_attempts(bad_request) == 1
+    assert limiter.stats()["retries"] == 1
+
+
+def flaky_model(failures, monkeypatch):
+    """A rate-limited fake model whose first `failures` calls get a 503."""
+    monkeypatch.setattr(rate_limit, "_limiters", {})
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_BACKOFF_BASE", 0.001)
+    calls = []
+
+    def script(messages, tools):
+        calls.append(messages)
+        if len(calls) <= failures:
+            raise APIError(503)
+        return AIMessage(content="ok")
+
+    model = rate_limited(FakeChatModel)(latency_mean=0.0, tokens_per_second=1e9, script=script)
+    return model, calls
+
+
+def test_model_calls_are_retried_by_the_limiter(monkeypatch):
+    model, calls = flaky_model(2, monkeypatch)
+    assert model.invoke("hi").content == "ok"
+    assert asyncio.run(model.ainvoke("again")).content == "ok"
+    assert len(calls) == 4
+    [stats] = rate_limit.rate_limit_stats().values()
+    assert stats["retries"] == 2 and stats["granted"] == 4
+
+
+def test_section_is_not_retried_again_after_the_limiter_gave_up(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RETRIES", 2)
+    monkeypatch.setattr(report, "WORKER_RETRIES", 2)
+    model, calls = flaky_model(100, monkeypatch)
+    monkeypatch.setattr(report, "get_llm", lambda node=None: model)
+    monkeypatch.setattr(report, "stored_section", lambda state, config, llm: None)
+    section = report.Section(name="Intro", description="what this is about")
+
+    result, error = asyncio.run(report.write_section({"section": section, "index": 0}, {}))
+    assert result is None and limiter_attempts(error) == 3
+    assert len(calls) == 3
+
+
+def test_section_timeouts_are_retried_by_the_worker(monkeypatch):
+    monkeypatch.setattr(report, "WORKER_RETRIES", 2)
+    monkeypatch.setattr(report, "WORKER_TIMEOUT", 0.05)
+    monkeypatch.setattr(report, "stored_section", lambda state, config, llm: None)
+    monkeypatch.setattr(report, "store_section", lambda *args: None)
+    monkeypatch.setattr(report, "get_llm", lambda node=None: FakeChatModel(latency_mean=0.0))
+    sleep, attempts = asyncio.sleep, []
+
+    async def slow_once(state, config, llm):
+        attempts.append(state["index"])
+        await sleep(1 if len(attempts) == 1 else 0)
+        return "text"
+
+    monkeypatch.setattr(report, "agenerate_section", slow_once)
+    monkeypatch.setattr(asyncio, "sleep", lambda seconds, *args: sleep(0, *args))
+    section = report.Section(name="Intro", description="what this is about")
+
+    result, error = asyncio.run(report.write_section({"section": section, "index": 0}, {}))
+    assert error is None and len(attempts) == 2
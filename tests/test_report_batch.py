@@ -0,0 +1,136 @@
+"""report_batch: topic input, the pool-wide slot limit, per-run report files, resume and the summary."""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from workflows import orchestrator_worker as report
+from workflows import rate_limit, report_batch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def slots(monkeypatch):
+    def use(n):
+        monkeypatch.setattr(report_batch, "_slots", threading.Semaphore(n))
+    return use
+
+
+def run_topics(app, items, concurrency=4):
+    async def run():
+        local = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(report_batch._run_topic(app, item, local) for item in items))
+    return asyncio.run(run())
+
+
+def test_topics_are_strings_or_objects(tmp_path):
+    path = tmp_path / "topics.jsonl"
+    path.write_text('"plain topic"\n\n{"topic": "with id", "run_id": "r-7"}\n{"topic": "no id"}\n')
+    topics = report_batch.read_topics(str(path))
+    assert [t["topic"] for t in topics] == ["plain topic", "with id", "no id"]
+    assert topics[1]["run_id"] == "r-7"
+    assert len({t["run_id"] for t in topics}) == 3
+
+
+def test_each_process_gets_an_equal_share_of_the_rate_limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_RPM", 600.0)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TPM", 90000.0)
+    monkeypatch.setattr(rate_limit, "RATE_LIMITS", {"gpt-4.1": {"rpm": 30}})
+    share = report_batch.limiter_share(3)
+    assert float(share["RATE_LIMIT_RPM"]) == 200
+    assert float(share["RATE_LIMIT_TPM"]) == 30000
+    assert json.loads(share["RATE_LIMITS"]) == {"gpt-4.1": {"rpm": 10}}
+
+
+class SlowGraph:
+    """Records how many runs are in flight; a topic named 'boom' fails."""
+
+    def __init__(self):
+        self.running = self.peak = 0
+
+    async def ainvoke(self, state, config):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.05)
+        self.running -= 1
+        if state["topic"] == "boom":
+            raise RuntimeError("model down")
+        return state
+
+
+def test_pool_slots_limit_reports_in_flight(slots):
+    slots(2)
+    graph = SlowGraph()
+    results = run_topics(graph, [{"topic": t, "run_id": f"r{i}"} for i, t in enumerate(["a", "b", "boom", "c", "d"])])
+    assert graph.peak == 2
+    assert [r["status"] for r in results] == ["done", "done", "failed", "done", "done"]
+    assert results[2]["error"] == "RuntimeError('model down')" and results[2]["output"] is None
+    assert report_batch._slots.acquire(blocking=False) and report_batch._slots.acquire(blocking=False)
+
+
+def test_topics_with_a_shared_prefix_get_their_own_reports(report_graph, slots):
+    slots(4)
+    prefix = "x" * 50
+    items = [{"topic": prefix + " first", "run_id": "one"}, {"topic": prefix + " second/half", "run_id": "two"}]
+    results = run_topics(report_graph, items)
+
+    outputs = [r["output"] for r in results]
+    assert [os.path.basename(o) for o in outputs] == ["one.txt", "two.txt"]
+    for item, output in zip(items, outputs):
+        with open(output, encoding="utf-8") as f:
+            assert f.readline().strip() == item["topic"]
+
+
+def test_paused_topic_is_finished_by_the_report_cli(report_graph, slots, monkeypatch):
+    slots(1)
+    generate, failures = report.agenerate_section, {0: 1}
+
+    async def failing_once(state, config, llm):
+        if failures.get(state["index"]):
+            failures[state["index"]] -= 1
+            raise RuntimeError("backend down")
+        return await generate(state, config, llm)
+
+    monkeypatch.setattr(report, "agenerate_section", failing_once)
+    [paused] = run_topics(report_graph, [{"topic": "resumable", "run_id": "r1"}])
+    assert paused["status"] == "paused" and paused["output"] is None
+
+    monkeypatch.setattr(sys, "argv", ["orchestrator_worker", "--resume", "r1", "--output", "r1.txt"])
+    report.main()
+    with open("r1.txt", encoding="utf-8") as f:
+        assert f.readline().strip() == "resumable"
+
+
+def test_summary_counts_outcomes_and_latency_of_finished_topics():
+    args = argparse.Namespace(topics="t.jsonl", processes=2, concurrency=1, max_in_flight=2)
+    results = [{"index": 2, "status": "done", "seconds": 3.0}, {"index": 0, "status": "done", "seconds": 1.0},
+               {"index": 1, "status": "failed", "seconds": 9.0}, {"index": 3, "status": "paused", "seconds": 5.0}]
+    summary = report_batch.summarize(args, 5, results, started=0.0)
+    assert summary["progress"] == {"total": 5, "finished": 4, "done": 2, "paused": 1, "failed": 1}
+    assert summary["latency_s"]["p50"] == 3.0 and summary["latency_s"]["max"] == 3.0
+    assert [t["index"] for t in summary["topics"]] == [0, 1, 2, 3]
+
+
+def test_batch_runs_topics_on_several_processes(tmp_path):
+    topics = tmp_path / "topics.jsonl"
+    topics.write_text("\n".join(json.dumps({"topic": f"{'same prefix ' * 5}{i}", "run_id": f"t{i}"})
+                                for i in range(3)))
+    env = {**os.environ, "LLM_BACKEND": "fake", "FAKE_LLM_LATENCY": "fixed:0", "FAKE_LLM_TOKENS_PER_SECOND": "1000000",
+           "PYTHONPATH": ROOT}
+    subprocess.run([sys.executable, "-m", "workflows.report_batch", str(topics), "--processes", "2",
+                    "--out-dir", str(tmp_path / "out")], cwd=tmp_path, env=env, check=True, capture_output=True,
+                   timeout=120)
+
+    with open(tmp_path / "out" / "summary.json", encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["progress"]["done"] == 3
+    assert {t["shard"] for t in summary["topics"]} == {0, 1}
+    outputs = [t["output"] for t in summary["topics"]]
+    assert [os.path.basename(o) for o in outputs] == ["t0.txt", "t1.txt", "t2.txt"]
+    assert all(os.path.exists(o) for o in outputs)
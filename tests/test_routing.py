@@ -0,0 +1,86 @@
+"""Routing batch mode on the fake model: one generator batch per route, and inputs the router failed on."""
+import asyncio
+import json
+
+import pytest
+
+from workflows import fast_router, routing
+
+
+@pytest.fixture
+def batch(fake_backend, monkeypatch):
+    monkeypatch.setattr(fast_router, "FAST_ROUTER", False)
+    getters = (routing.get_llm, routing.get_router, routing.get_fast_router)
+    for getter in getters:
+        getter.cache_clear()
+
+    def run(inputs, concurrency=4):
+        (fake_backend / "in.jsonl").write_text("\n".join(json.dumps({"input": text}) for text in inputs))
+        report = asyncio.run(routing.run_batch("in.jsonl", "out.jsonl", concurrency))
+        with open(fake_backend / "out.jsonl", encoding="utf-8") as f:
+            return report, sorted((json.loads(line) for line in f), key=lambda row: row["index"])
+
+    yield run
+    for getter in getters:
+        getter.cache_clear()
+
+
+def test_each_route_is_generated_with_one_batch_call(batch, monkeypatch):
+    generate, calls = routing.generate_batch, []
+
+    async def recording(decision, texts, concurrency):
+        calls.append((decision, list(texts), concurrency))
+        return await generate(decision, texts, concurrency)
+
+    monkeypatch.setattr(routing, "generate_batch", recording)
+    inputs = ["poem about the sea", "joke about cats", "poem about mom", "story about a door"]
+    report, rows = batch(inputs, concurrency=3)
+
+    assert [row["decision"] for row in rows] == ["poem", "joke", "poem", "story"]
+    assert all(row["output"] and "error" not in row for row in rows)
+    assert sorted(calls) == [("joke", ["joke about cats"], 3), ("poem", ["poem about the sea", "poem about mom"], 3),
+                             ("story", ["story about a door"], 3)]
+    assert report["inputs"] == 4 and report["router_errors"] == 0
+    assert {route: stats["count"] for route, stats in report["routes"].items()} == {"poem": 2, "joke": 1, "story": 1}
+
+
+def test_router_failures_are_error_rows_and_are_not_generated(batch, monkeypatch):
+    route = routing.get_router()
+
+    class FailingRouter:
+        async def abatch(self, messages, config=None, return_exceptions=False):
+            results = await route.abatch(messages, config=config, return_exceptions=return_exceptions)
+            return [RuntimeError("router down") if "dogs" in m[-1].content else r for m, r in zip(messages, results)]
+
+    monkeypatch.setattr(routing, "get_router", lambda: FailingRouter())
+    report, rows = batch(["poem about rain", "joke about dogs"])
+
+    assert rows[0]["decision"] == "poem" and rows[0]["output"]
+    assert rows[1] == {"index": 1, "input": "joke about dogs", "decision": None,
+                       "error": "RuntimeError('router down')"}
+    assert report["router_errors"] == 1
+    assert set(report["routes"]) == {"poem"}
+
+
+def test_generator_failures_are_counted_per_route(batch, monkeypatch):
+    async def failing(decision, texts, concurrency):
+        return [ValueError("too long") if "long" in text else routing.get_llm("generate").invoke(text)
+                for text in texts]
+
+    monkeypatch.setattr(routing, "generate_batch", failing)
+    report, rows = batch(["poem about a long road", "poem about spring"])
+
+    assert rows[0]["error"] == "ValueError('too long')" and "output" not in rows[0]
+    assert rows[1]["output"]
+    assert report["routes"]["poem"]["count"] == 2 and report["routes"]["poem"]["errors"] == 1
+
+
+def test_sampled_fast_answers_are_audited_by_the_router(batch, monkeypatch):
+    router = fast_router.FastRouter(audit_rate=1.0, log_path=None)
+    monkeypatch.setattr(routing, "get_fast_router", lambda: router)
+    report, rows = batch(["poem about the sea", "tell me a joke", "something about the sea"])
+
+    assert [row["decision"] for row in rows][:2] == ["poem", "joke"]
+    stats = report["fast_router"]
+    assert stats["fast_path_hits"] == 2 and stats["llm_fallbacks"] == 1
+    assert stats["audited"] == 2 and stats["audit_disagreement_rate"] == 0.0
@@ -0,0 +1,53 @@
+"""Report runs on the fake model: sections reused from the store, and a paused run resumed by its run ID."""
+import asyncio
+
+from workflows import orchestrator_worker as report
+
+
+def start(topic="pipelines"):
+    return {"topic": topic, "sections": [], "completed_sections": [], "section_runs": [], "final_report": ""}
+
+
+def run(graph, run_input, run_id):
+    return asyncio.run(graph.ainvoke(run_input, {"configurable": {"thread_id": run_id}}))
+
+
+def test_rerun_takes_every_section_from_the_store(report_graph):
+    first = run(report_graph, start(), "first")
+    second = run(report_graph, start(), "second")
+
+    assert report.report_summary(first)["generated"] == len(first["sections"]) > 0
+    summary = report.report_summary(second)
+    assert summary["generated"] == 0
+    assert summary["reused_from_store"] == len(second["sections"])
+    assert second["completed_sections"] == first["completed_sections"]
+
+
+def test_failed_section_pauses_the_run_and_resume_writes_only_it(report_graph, monkeypatch):
+    generate, written = report.agenerate_section, []
+    failures = {1: 1}   # section index -> attempts that still fail
+
+    async def failing_once(state, config, llm):
+        written.append(state["index"])
+        if failures.get(state["index"]):
+            failures[state["index"]] -= 1
+            raise RuntimeError("backend down")
+        return await generate(state, config, llm)
+
+    monkeypatch.setattr(report, "agenerate_section", failing_once)
+    paused = run(report_graph, start(), "run-1")
+    assert [i.value["index"] for i in paused["__interrupt__"]] == [1]
+    sections = len(paused["sections"])
+
+    config = {"configurable": {"thread_id": "run-1"}}
+    restored = report.restored_sections(report_graph, config)
+    assert sorted(r["index"] for r in restored) == [i for i in range(sections) if i != 1]
+    written.clear()
+    done = run(report_graph, None, "run-1")
+
+    assert written == [1]
+    assert "__interrupt__" not in done
+    assert len(done["completed_sections"]) == sections
+    summary = report.report_summary(done, restored)
+    assert summary["generated"] == 1
+    assert summary["restored_from_checkpoint"] == sections - 1
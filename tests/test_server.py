@@ -0,0 +1,159 @@
+"""GraphService: admission limits, coalescing of identical requests, 429s and the bounded replay buffer."""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from workflows import server
+from workflows.server import Admission, GraphService, QueueFull, Run, RunRequest
+
+
+class GatedGraph:
+    """Emits one update per run once `gate` is set; records the runs it was asked for."""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.runs = []
+
+    async def astream(self, payload, config, stream_mode):
+        self.runs.append(payload)
+        await self.gate.wait()
+        yield "updates", {"write": {"output": f"done {len(self.runs)}"}}
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    graph = GatedGraph()
+    monkeypatch.setattr(server, "get_graph", lambda name: graph)
+    monkeypatch.setattr(server, "SERVER_OUTPUT_DIR", str(tmp_path / "runs"))
+
+    def make(max_running=1, max_queue=1, timeout=5):
+        service = GraphService(Admission(max_running, max_queue, timeout))
+        service.graph = graph
+        monkeypatch.setattr(server, "service", service)
+        return service
+    return make
+
+
+def request(text="poem about mom"):
+    return RunRequest(input={"input": text})
+
+
+def test_admission_rejects_beyond_running_plus_queue():
+    admission = Admission(max_running=2, max_queue=1)
+    for _ in range(3):
+        admission.reserve()
+    with pytest.raises(QueueFull):
+        admission.reserve()
+    assert admission.stats()["rejected"] == 1 and admission.stats()["queued"] == 3
+
+
+def test_runs_beyond_the_slots_wait_and_then_run(service):
+    async def run():
+        svc = service(max_running=1, max_queue=2)
+        first, _ = svc.attach("routing", request("a"))
+        second, _ = svc.attach("routing", request("b"))
+        await asyncio.sleep(0.05)
+        assert svc.admission.stats()["running"] == 1 and svc.admission.stats()["queued"] == 1
+        assert len(svc.graph.runs) == 1
+        svc.graph.gate.set()
+        results = await asyncio.gather(server.collect(first, False), server.collect(second, False))
+        return svc, results
+
+    svc, results = asyncio.run(run())
+    assert [status for status, _ in results] == [200, 200]
+    assert len(svc.graph.runs) == 2
+    assert svc.admission.stats()["admitted"] == 2 and svc.admission.stats()["running"] == 0
+
+
+def test_queue_timeout_ends_the_run_with_503(service):
+    async def run():
+        svc = service(max_running=1, max_queue=1, timeout=0.05)
+        first, _ = svc.attach("routing", request("a"))
+        second, _ = svc.attach("routing", request("b"))
+        status, body = await server.collect(second, False)
+        svc.graph.gate.set()
+        await server.collect(first, False)
+        return svc, status, body
+
+    svc, status, body = asyncio.run(run())
+    assert status == 503 and "timed out" in body["message"]
+    assert svc.admission.stats()["timed_out"] == 1 and svc.admission.stats()["queued"] == 0
+
+
+def test_identical_requests_share_one_run(service):
+    async def run():
+        svc = service()
+        first, coalesced_first = svc.attach("routing", request())
+        second, coalesced_second = svc.attach("routing", request())
+        other, _ = svc.attach("routing", request("joke about cats"))
+        assert (second is first, coalesced_first, coalesced_second, other is first) == (True, False, True, False)
+        svc.graph.gate.set()
+        return svc, await asyncio.gather(server.collect(first, False), server.collect(second, True),
+                                         server.collect(other, False))
+
+    svc, results = asyncio.run(run())
+    assert len(svc.graph.runs) == 2
+    assert results[0][1]["state"] == results[1][1]["state"] == {"output": "done 1"}
+    assert results[1][1]["coalesced"] is True
+    assert svc.coalesced == 1 and svc.in_flight == {}
+
+
+def test_full_queue_is_a_429_with_retry_after(service):
+    async def run():
+        svc = service(max_running=1, max_queue=0)
+        first, _ = svc.attach("routing", request("a"))
+        with pytest.raises(HTTPException) as rejected:
+            server._attach("routing", request("b"))
+        # an identical request joins the running one instead of being turned away
+        joined, coalesced = server._attach("routing", request("a"))
+        svc.graph.gate.set()
+        await asyncio.gather(server.collect(first, False), server.collect(joined, coalesced))
+        return svc, rejected.value
+
+    svc, rejected = asyncio.run(run())
+    assert rejected.status_code == 429 and rejected.headers == {"Retry-After": "1"}
+    assert svc.admission.stats()["rejected"] == 1
+
+
+def test_runs_write_their_files_under_the_output_dir(fake_backend, monkeypatch):
+    from workflows import routing
+    monkeypatch.setattr(server, "SERVER_OUTPUT_DIR", str(fake_backend / "runs"))
+    routing.build_graph.cache_clear()
+
+    async def run():
+        svc = GraphService(Admission())
+        monkeypatch.setattr(server, "service", svc)
+        run, _ = svc.attach("routing", request())
+        events = [event async for event in run.follow()]
+        await server.collect(run, False)
+        return run, events
+
+    run, events = asyncio.run(run())
+    routing.build_graph.cache_clear()
+    output = events[0][1]["output"]
+    assert events[0][0] == "metadata" and events[-1][0] == "end"
+    assert os.path.dirname(output) == str(fake_backend / "runs")
+    with open(output, encoding="utf-8") as f:
+        assert f.readline().strip() == "poem about mom"
+    assert not any(name.endswith(".txt") for name in os.listdir(fake_backend))
+    # the run has ended and its only client is gone
+    assert len(run.events) == 0
+
+
+def test_late_joiners_replay_only_the_latest_events(monkeypatch):
+    monkeypatch.setattr(server, "SERVER_REPLAY_EVENTS", 3)
+
+    async def run():
+        run = Run("key", "routing", {}, {})
+        for i in range(5):
+            run.emit("token", {"content": str(i)})
+        run.finish()
+        return run, [event async for event in run.follow()]
+
+    run, events = asyncio.run(run())
+    assert events == [("dropped", {"events": 2}), ("token", {"content": "2"}),
+                      ("token", {"content": "3"}), ("token", {"content": "4"})]
+    run.release_events()
+    assert len(run.events) == 0 and run.emitted == 5
@@ -0,0 +1,142 @@
+"""ToolResultCache: coalescing of identical requests, including callers that give up, and the size of the file."""
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from workflows.tool_cache import ToolResultCache
+
+
+class SlowSearch:
+    def __init__(self, seconds=0.2, error=None):
+        self.seconds = seconds
+        self.error = error
+        self.calls = 0
+
+    async def afetch(self):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        if self.error:
+            raise self.error
+        return f"result {self.calls}"
+
+    def fetch(self):
+        self.calls += 1
+        time.sleep(self.seconds)
+        return f"result {self.calls}"
+
+
+def test_identical_async_calls_share_one_request():
+    cache, search = ToolResultCache(path=None), SlowSearch()
+
+    async def run():
+        return await asyncio.gather(*(cache.acall("search", {"query": "LangGraph "}, 60, search.afetch)
+                                      for _ in range(5)))
+
+    assert asyncio.run(run()) == ["result 1"] * 5
+    assert search.calls == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_leader_timeout_does_not_leave_the_key_in_flight():
+    cache, search = ToolResultCache(path=None), SlowSearch()
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.acall("search", {"query": "q"}, 60, search.afetch), 0.05)
+        # the request goes on without the caller that started it
+        follower = await cache.acall("search", {"query": "q"}, 60, search.afetch)
+        await asyncio.sleep(0)
+        return follower
+
+    assert asyncio.run(run()) == "result 1"
+    assert search.calls == 1
+    assert cache._inflight == {}
+    assert cache.get(next(iter(cache._memory)))[1] == "result 1"
+
+
+def test_follower_timeout_does_not_cancel_the_shared_request():
+    cache, search = ToolResultCache(path=None), SlowSearch()
+
+    async def run():
+        leader = asyncio.ensure_future(cache.acall("search", {"query": "q"}, 60, search.afetch))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.acall("search", {"query": "q"}, 60, search.afetch), 0.05)
+        return await leader
+
+    assert asyncio.run(run()) == "result 1"
+    assert cache._inflight == {}
+
+    async def later():
+        return await cache.acall("search", {"query": "q"}, 60, search.afetch)
+
+    assert asyncio.run(later()) == "result 1"
+    assert search.calls == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache, search = ToolResultCache(path=None), SlowSearch(seconds=0.05, error=ValueError("backend down"))
+
+    async def run():
+        return await asyncio.gather(*(cache.acall("search", {"query": "q"}, 60, search.afetch) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert cache._inflight == {}
+    search.error = None
+    assert asyncio.run(cache.acall("search", {"query": "q"}, 60, search.afetch)) == "result 2"
+
+
+def test_sync_callers_coalesce_across_threads():
+    cache, search = ToolResultCache(path=None), SlowSearch(seconds=0.1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.call("search", {"query": "q"}, 60, search.fetch)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["result 1"] * 4
+    assert search.calls == 1
+
+
+def test_results_are_shared_through_sqlite(tmp_path):
+    path = str(tmp_path / "tools.sqlite")
+    search = SlowSearch(seconds=0)
+    ToolResultCache(path=path).call("search", {"query": "Q"}, 60, search.fetch)
+    assert ToolResultCache(path=path).call("search", {"query": " q "}, 60, search.fetch) == "result 1"
+    assert search.calls == 1
+
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT tool FROM tool_cache ORDER BY expires").fetchall()
+
+
+def test_expired_rows_are_deleted_from_disk(tmp_path, monkeypatch):
+    path = str(tmp_path / "tools.sqlite")
+    cache = ToolResultCache(path=path)
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    cache.put("old", "arxiv", "stale", ttl=10)
+    cache.put("long", "wikipedia", "kept", ttl=100)
+    clock[0] += 50
+    # an expired result is not served from disk either
+    assert ToolResultCache(path=path).get("old") == (False, None)
+
+    cache.put("new", "tavily", "fresh", ttl=10)
+    assert rows(path) == [("tavily",), ("wikipedia",)]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_keeps_at_most_max_entries(tmp_path):
+    path = str(tmp_path / "tools.sqlite")
+    cache = ToolResultCache(path=path, max_entries=3)
+    for i in range(5):
+        cache.put(f"k{i}", f"tool{i}", i, ttl=100 + i)
+    assert rows(path) == [("tool2",), ("tool3",), ("tool4",)]
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,120 @@
+"""NodeTracer spans on the fake model, the span bound, the exports and trace_config with a callback manager."""
+import json
+import operator
+from typing import Annotated
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManager
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from workflows import tracing
+from workflows.fake_llm import FakeChatModel
+from workflows.tracing import NodeTracer, trace_config
+
+
+class State(TypedDict):
+    topic: str
+    parts: Annotated[list, operator.add]
+
+
+def graph():
+    llm = FakeChatModel(latency_mean=0.0, tokens_per_second=1e9, completion_tokens=5)
+
+    def plan(state):
+        return {"parts": ["plan"]}
+
+    def write(name):
+        def node(state):
+            return {"parts": [llm.invoke(f"{name} about {state['topic']}").content]}
+        return node
+
+    builder = StateGraph(State)
+    builder.add_node("plan", plan)
+    builder.add_node("intro", write("intro"))
+    builder.add_node("body", write("body"))
+    builder.add_edge(START, "plan")
+    builder.add_edge("plan", "intro")
+    builder.add_edge("plan", "body")
+    builder.add_edge("intro", END)
+    builder.add_edge("body", END)
+    return builder.compile()
+
+
+def test_every_node_gets_a_span_with_its_model_calls():
+    tracer = NodeTracer()
+    graph().invoke({"topic": "tides", "parts": []}, {"callbacks": [tracer]})
+
+    spans = {span["node"]: span for span in tracer.spans}
+    assert sorted(spans) == ["body", "intro", "plan"]
+    assert spans["plan"]["step"] == 1 and spans["intro"]["step"] == spans["body"]["step"] == 2
+    assert spans["plan"]["model_calls"] == [] and spans["plan"]["started_by"] is None
+    for name in ("intro", "body"):
+        assert len(spans[name]["model_calls"]) == 1
+        assert spans[name]["completion_tokens"] > 0 and spans[name]["prompt_tokens"] > 0
+        assert spans[name]["state_out_bytes"] > 0 and spans[name]["error"] is None
+
+
+def test_only_the_latest_spans_are_kept_but_metrics_count_all():
+    tracer = NodeTracer(max_spans=2)
+    for _ in range(3):
+        graph().invoke({"topic": "tides", "parts": []}, {"callbacks": [tracer]})
+
+    assert len(tracer.spans) == 2
+    intro = next(span for span in tracer.spans if span["node"] == "intro")
+    prometheus = tracer.to_prometheus()
+    assert 'langgraph_node_duration_seconds_count{node="plan"} 3' in prometheus
+    assert 'langgraph_node_model_calls_total{node="body"} 3' in prometheus
+    assert f'langgraph_node_completion_tokens_total{{node="intro"}} {3 * intro["completion_tokens"]}' in prometheus
+
+
+def test_export_writes_jsonl_prometheus_and_chrome_trace(tmp_path):
+    tracer = NodeTracer()
+    graph().invoke({"topic": "tides", "parts": []}, {"callbacks": [tracer]})
+    prefix = tracer.export(str(tmp_path / "traces" / "run"))
+
+    with open(prefix + ".jsonl") as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(r["node"] for r in rows) == ["body", "intro", "plan"]
+    with open(prefix + ".trace.json") as f:
+        events = json.load(f)["traceEvents"]
+    assert sorted(e["name"] for e in events) == ["body", "intro", "model", "model", "plan"]
+    with open(prefix + ".prom") as f:
+        assert "# TYPE langgraph_node_duration_seconds histogram" in f.read()
+
+
+class Recorder(BaseCallbackHandler):
+    def __init__(self):
+        self.chains = 0
+
+    def on_chain_start(self, *args, **kwargs):
+        self.chains += 1
+
+
+@pytest.fixture
+def shared_tracer(monkeypatch):
+    tracer = NodeTracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    return tracer
+
+
+def test_trace_config_adds_the_tracer_to_a_list_or_a_manager(shared_tracer):
+    recorder = Recorder()
+    assert trace_config({"callbacks": [recorder]})["callbacks"] == [recorder, shared_tracer]
+
+    manager = CallbackManager([recorder])
+    config = trace_config({"callbacks": manager, "tags": ["x"]})
+    assert config["callbacks"] is not manager and manager.handlers == [recorder]
+    assert config["callbacks"].handlers == [recorder, shared_tracer]
+    assert config["tags"] == ["x"]
+
+    graph().invoke({"topic": "tides", "parts": []}, config)
+    assert recorder.chains > 0
+    assert sorted(span["node"] for span in shared_tracer.spans) == ["body", "intro", "plan"]
+
+
+def test_trace_config_is_a_no_op_without_tracing(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", False)
+    assert trace_config({"callbacks": [Recorder]}) == {"callbacks": [Recorder]}
+    assert trace_config(None) == {}
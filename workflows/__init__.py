@@ -0,0 +1,74 @@
+"""The workflow graphs as an importable package.
+
+Importing the package (or any single workflow module) does not load
+langgraph, create a model client or compile anything; `get_graph(name)`
+builds the requested graph on first use and returns the same compiled graph
+on every later call.
+
+    from workflows import get_graph
+    app = get_graph("routing")
+    app.invoke({"input": "poem about mom"})
+
+The modules import each other relatively (`from .models import chat_model`),
+so there is one copy of each module, its caches and registries per process.
+They run as modules from the repository root: `python -m workflows.routing`.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+from functools import lru_cache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# graph name -> module name (in this package) or a file path relative to the repository root
+GRAPHS = {
+    "promptChaining": "promptChaining",
+    "routing": "routing",
+    "parallelization": "parallelization",
+    "orchestrator_worker": "orchestrator_worker",
+    "hitl": "HITL/hitl.py",
+    "react_agent": "langgraph basics/ReAct_agent.py",
+    "chatbot": "langgraph basics/chatbot.py",
+    "chatbot_with_multiple_tools": "langgraph basics/chatbot_with_multiple_tools.py",
+    "tool_langgraph": "langgraph basics/tool_langgraph.py",
+}
+
+# a module loaded from a file path is visible in sys.modules before it has run,
+# so concurrent first uses (e.g. server requests) must wait for the one loading it
+_load_lock = threading.RLock()
+
+
+@lru_cache(maxsize=None)
+def _load_module(name):
+    target = GRAPHS[name]
+    if not target.endswith(".py"):
+        return importlib.import_module(f".{target}", __name__)
+    path = os.path.join(ROOT, target)
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_module(name):
+    """Import the module behind a graph name without building anything."""
+    with _load_lock:
+        return _load_module(name)
+
+
+def get_graph(name):
+    """The compiled graph `name`, built on first use and cached for the process."""
+    module = load_module(name)
+    with _load_lock:
+        return module.build_graph()
+
+
+def list_graphs():
+    return sorted(GRAPHS)
@@ -0,0 +1,198 @@
+"""Tool-call approvals: a rule engine that auto-approves safe calls, and an async queue for the rest.
+
+`ApprovalPolicy` decides per proposed tool call whether a human has to look
+at it. A rule names a tool (or `*`) and optional constraints on its
+arguments (`min`, `max`, `not_in`, `in`); a call is auto-approved when a rule
+for its tool holds for every constrained argument. Rules come from
+`HITL_POLICY` (a JSON file or JSON text) or `DEFAULT_RULES`, which approve
+the calculator tools on operands within +-1e6 (and never a division by 0).
+
+`ApprovalQueue` holds the turns that still need a human, for any number of
+paused threads at once. Operators take them with `await queue.wait()` or
+list them with `pending()`, and `await queue.resolve(id, decision)` resumes
+the thread through the `resume(approval, decision)` coroutine the queue was
+built with. `stats()` reports pending approvals, the age of the oldest one,
+and the wait latency (p50/p95/max) of resolved ones.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+
+CALCULATOR_BOUNDS = {"min": -1_000_000, "max": 1_000_000}
+DEFAULT_RULES = [
+    {"tool": "add", "args": {"a": CALCULATOR_BOUNDS, "b": CALCULATOR_BOUNDS}},
+    {"tool": "subtract", "args": {"a": CALCULATOR_BOUNDS, "b": CALCULATOR_BOUNDS}},
+    {"tool": "multiply", "args": {"a": CALCULATOR_BOUNDS, "b": CALCULATOR_BOUNDS}},
+    {"tool": "divide", "args": {"a": CALCULATOR_BOUNDS, "b": {**CALCULATOR_BOUNDS, "not_in": [0]}}},
+]
+
+
+def _holds(value, constraint):
+    if "in" in constraint and value not in constraint["in"]:
+        return False
+    if "not_in" in constraint and value in constraint["not_in"]:
+        return False
+    if "min" in constraint or "max" in constraint:
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        if value < constraint.get("min", value) or value > constraint.get("max", value):
+            return False
+    return True
+
+
+class ApprovalPolicy:
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = list(rules)
+        self._lock = threading.Lock()
+        self.auto_approved = 0
+        self.reviewed = 0
+
+    @classmethod
+    def from_env(cls):
+        source = os.getenv("HITL_POLICY")
+        if not source:
+            return cls()
+        if os.path.exists(source):
+            with open(source, encoding="utf-8") as f:
+                return cls(json.load(f))
+        return cls(json.loads(source))
+
+    def review_reason(self, tool_call):
+        """None if `tool_call` is auto-approved, else why a human has to see it."""
+        rules = [r for r in self.rules if r["tool"] in (tool_call["name"], "*")]
+        if not rules:
+            return f"no rule for tool '{tool_call['name']}'"
+        args = tool_call.get("args") or {}
+        for rule in rules:
+            if all(_holds(args.get(name), constraint) for name, constraint in rule.get("args", {}).items()):
+                return None
+        return f"arguments {args} are outside the auto-approved range"
+
+    def split(self, tool_calls):
+        """(auto-approved calls, [(call, reason)] needing review)."""
+        approved, review = [], []
+        for call in tool_calls:
+            reason = self.review_reason(call)
+            if reason is None:
+                approved.append(call)
+            else:
+                review.append((call, reason))
+        return approved, review
+
+    def record(self, auto_approved, reviewed):
+        # called once a turn is decided: a node that interrupted runs again from the top on resume
+        with self._lock:
+            self.auto_approved += auto_approved
+            self.reviewed += reviewed
+
+    def stats(self):
+        with self._lock:
+            return {"auto_approved_calls": self.auto_approved, "reviewed_calls": self.reviewed}
+
+
+_policy = None
+
+
+def get_policy():
+    global _policy
+    if _policy is None:
+        _policy = ApprovalPolicy.from_env()
+    return _policy
+
+
+class Approval:
+    def __init__(self, approval_id, thread_id, request, graph=None):
+        self.id = approval_id
+        self.thread_id = thread_id
+        self.request = request        # the interrupt payload
+        self.graph = graph
+        self.created = time.time()
+
+    def as_dict(self):
+        return {"id": self.id, "thread_id": self.thread_id, "graph": self.graph, "request": self.request,
+                "waiting_s": round(time.time() - self.created, 3)}
+
+
+class ApprovalQueue:
+    def __init__(self, resume):
+        self.resume = resume          # async (approval, decision) -> result
+        self._pending = {}            # approval id -> Approval
+        self._ready = None            # asyncio.Queue of approval ids, created on the running loop
+        self._ids = itertools.count(1)
+        self.wait_ms = []
+        self.approved = 0
+        self.rejected = 0
+
+    def _queue(self):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+        return self._ready
+
+    def add(self, thread_id, request, graph=None):
+        """Park a thread's interrupt until someone decides on it; a thread has at most one pending turn."""
+        self.discard(thread_id)
+        approval = Approval(str(next(self._ids)), thread_id, request, graph)
+        self._pending[approval.id] = approval
+        self._queue().put_nowait(approval.id)
+        return approval
+
+    def pending(self):
+        return [a.as_dict() for a in sorted(self._pending.values(), key=lambda a: a.created)]
+
+    async def wait(self, timeout=None):
+        """The oldest approval nobody has taken yet."""
+        while True:
+            approval_id = await asyncio.wait_for(self._queue().get(), timeout)
+            if approval_id in self._pending:
+                return self._pending[approval_id]
+
+    def _close(self, waited_ms, decision):
+        self.wait_ms.append(waited_ms)
+        del self.wait_ms[:-1000]
+        if (decision or {}).get("proceed"):
+            self.approved += 1
+        else:
+            self.rejected += 1
+
+    def discard(self, thread_id, decision=None):
+        """Drop a thread's pending approval that was answered some other way (e.g. resumed directly)."""
+        for approval in [a for a in self._pending.values() if a.thread_id == thread_id]:
+            del self._pending[approval.id]
+            if decision is not None:
+                self._close((time.time() - approval.created) * 1000, decision)
+
+    async def resolve(self, approval_id, decision):
+        """Resume the thread with `decision`; returns what `resume` returns.
+
+        If resuming fails (e.g. the server has no free slot) the approval is
+        pending again, so it can be answered once more.
+        """
+        approval = self._pending.pop(approval_id, None)
+        if approval is None:
+            raise KeyError(f"no pending approval {approval_id}")
+        waited_ms = (time.time() - approval.created) * 1000
+        try:
+            result = await self.resume(approval, decision)
+        except BaseException:
+            self._pending[approval.id] = approval
+            self._queue().put_nowait(approval.id)
+            raise
+        self._close(waited_ms, decision)
+        return result
+
+    def stats(self):
+        waits = sorted(self.wait_ms)
+        oldest = min((a.created for a in self._pending.values()), default=None)
+        return {
+            "pending": len(self._pending),
+            "oldest_pending_s": round(time.time() - oldest, 3) if oldest is not None else None,
+            "approved": self.approved,
+            "rejected": self.rejected,
+            "wait_ms_p50": round(waits[(len(waits) - 1) // 2], 1) if waits else None,
+            "wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 1) if waits else None,
+            "wait_ms_max": round(waits[-1], 1) if waits else None,
+            **get_policy().stats(),
+        }
@@ -0,0 +1,134 @@
+"""Content-addressed store for large tool results, so agent threads keep only references.
+
+A search result of a few KB sits in the `messages` of a thread forever: it is
+copied into the checkpoints and sent to the model again on every later turn.
+`offload(message)` moves the content of a large `ToolMessage`
+(`BLOB_THRESHOLD_CHARS`) into a SQLite file keyed by its SHA-256, and returns
+a message whose content is a preview of `BLOB_PREVIEW_CHARS` characters plus
+a note, with the reference in `artifact` (which is never sent to the model).
+Identical results, from any thread, are stored once.
+
+Nodes that need the full text ask for it: `expand(messages)` loads the
+results of the latest tool turn (what the model has to read now) and leaves
+older ones as previews; `expand(messages, latest_only=False)` loads all of
+them. A blob not read or written for `BLOB_STORE_MAX_AGE` seconds is dropped;
+its messages then keep their preview.
+
+`BLOB_STORE=0` turns it off; the file is `BLOB_STORE_PATH`.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+BLOB_STORE_ENABLED = os.getenv("BLOB_STORE", "1") == "1"
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", ".blobs.sqlite")
+BLOB_THRESHOLD_CHARS = int(os.getenv("BLOB_THRESHOLD_CHARS", "1500"))
+BLOB_PREVIEW_CHARS = int(os.getenv("BLOB_PREVIEW_CHARS", "300"))
+BLOB_STORE_MAX_AGE = float(os.getenv("BLOB_STORE_MAX_AGE", str(30 * 24 * 3600)))  # seconds
+
+
+def blob_ref(message):
+    """The blob reference of an offloaded message, or None."""
+    artifact = getattr(message, "artifact", None)
+    return artifact.get("blob") if isinstance(artifact, dict) else None
+
+
+class BlobStore:
+    def __init__(self, path=BLOB_STORE_PATH, threshold=BLOB_THRESHOLD_CHARS, preview=BLOB_PREVIEW_CHARS,
+                 max_age=BLOB_STORE_MAX_AGE):
+        self.path = path
+        self.threshold = threshold
+        self.preview = preview
+        self.max_age = max_age
+        self.offloaded = 0
+        self.chars_offloaded = 0
+        self.loads = 0
+        self.missing = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "digest TEXT PRIMARY KEY, content TEXT NOT NULL, chars INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, content):
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            # an existing blob only gets its access time refreshed
+            self._conn.execute(
+                "INSERT INTO blobs (digest, content, chars, accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET accessed = excluded.accessed",
+                (digest, content, len(content), now),
+            )
+            self._conn.execute("DELETE FROM blobs WHERE accessed < ?", (now - self.max_age,))
+            self._conn.commit()
+        return digest
+
+    def get(self, digest):
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                self.missing += 1
+                return None
+            self._conn.execute("UPDATE blobs SET accessed = ? WHERE digest = ?", (time.time(), digest))
+            self._conn.commit()
+            self.loads += 1
+        return row[0]
+
+    def offload(self, message):
+        """`message` with large string content replaced by a preview and a blob reference."""
+        content = message.content
+        if blob_ref(message) or not isinstance(content, str) or len(content) <= self.threshold:
+            return message
+        digest = self.put(content)
+        with self._lock:
+            self.offloaded += 1
+            self.chars_offloaded += len(content) - self.preview
+        note = (f"\n[... {len(content) - self.preview} more characters; the full result is kept "
+                f"as blob {digest[:12]}]")
+        return message.model_copy(update={"content": content[:self.preview] + note,
+                                          "artifact": {"blob": digest, "chars": len(content)}})
+
+    def load(self, message):
+        """`message` with its full content back, if it was offloaded and the blob still exists."""
+        digest = blob_ref(message)
+        content = self.get(digest) if digest else None
+        if content is None:
+            return message
+        return message.model_copy(update={"content": content})
+
+    def expand(self, messages, latest_only=True):
+        """`messages` with offloaded results loaded: only the trailing tool turn's, or all of them."""
+        start = 0
+        if latest_only:
+            start = len(messages)
+            while start > 0 and getattr(messages[start - 1], "type", None) == "tool":
+                start -= 1
+        return list(messages[:start]) + [self.load(m) if blob_ref(m) else m for m in messages[start:]]
+
+    def stats(self):
+        with self._lock:
+            blobs, chars = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(chars), 0) FROM blobs").fetchone()
+        return {"offloaded": self.offloaded, "chars_offloaded": self.chars_offloaded, "loads": self.loads,
+                "missing": self.missing, "blobs": blobs, "stored_chars": chars}
+
+
+_store = None
+
+
+def get_blob_store():
+    """The shared store, or None when `BLOB_STORE=0`."""
+    global _store
+    if _store is None and BLOB_STORE_ENABLED:
+        _store = BlobStore()
+    return _store
+
+
+def expand(messages, latest_only=True):
+    """`BlobStore.expand` on the shared store; `messages` unchanged when it is off."""
+    store = get_blob_store()
+    return store.expand(messages, latest_only) if store is not None else list(messages)
@@ -0,0 +1,344 @@
+"""File-backed LangGraph checkpointer that stores per-step deltas.
+
+`MemorySaver` keeps every checkpoint of every thread in RAM and forgets them
+on restart. `DeltaSqliteSaver` keeps them in one SQLite file instead, and only
+writes what changed at each step:
+
+* like the in-memory saver, only channels whose version changed are written;
+* for list channels that only grew (e.g. `messages` with `add_messages`) just
+  the appended items are stored, chained to the previous version;
+* every `snapshot_every` deltas a full snapshot is written, so restoring a
+  channel never reads more than that many rows.
+
+Channel versions are `<counter>.<random>` strings, as in LangGraph's own
+savers: a fork or `update_state` from an older checkpoint gets new versions,
+so it never overwrites the blobs of the branch it forked from. (Integer
+versions of older databases are read as `<counter>.0000000000000000`.) The
+async methods run the SQLite work in a thread, off the event loop.
+
+`compact(thread_id, keep_last)` drops old checkpoints and every blob the kept
+ones no longer need; the thread's next list value is written as a full
+snapshot.
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    kind TEXT NOT NULL,              -- 'full', 'append' or 'empty'
+    base_version TEXT,               -- for 'append': the version the items are appended to
+    type TEXT,
+    data BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+_LEGACY_SUFFIX = "." + "0" * 16
+
+
+def _upgrade_versions(checkpoint):
+    """`checkpoint` with the integer versions of older databases as strings, so they compare with new ones."""
+    def upgrade(versions):
+        return {c: f"{v:032}{_LEGACY_SUFFIX}" if isinstance(v, int) else v for c, v in versions.items()}
+    return {**checkpoint, "channel_versions": upgrade(checkpoint["channel_versions"]),
+            "versions_seen": {node: upgrade(seen) for node, seen in checkpoint["versions_seen"].items()}}
+
+
+def _stored_version(version):
+    """Key of a version in the blobs table: integer versions were stored as plain numbers."""
+    version = str(version)
+    return str(int(version[:-len(_LEGACY_SUFFIX)])) if version.endswith(_LEGACY_SUFFIX) else version
+
+
+def _is_prefix(prefix, value):
+    return len(prefix) <= len(value) and all(a is b or a == b for a, b in zip(prefix, value))
+
+
+class DeltaSqliteSaver(BaseCheckpointSaver):
+    def __init__(self, path=CHECKPOINT_DB, snapshot_every=20, cached_threads=128, *, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.cached_threads = cached_threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        # (thread_id, ns, channel) -> (version, value, chain depth) of the last list written,
+        # kept for a bounded number of recent channels to build the next delta against
+        self._last = OrderedDict()
+
+    # --- channel values ---
+
+    def _remember(self, key, version, value, depth):
+        self._last[key] = (version, value, depth)
+        self._last.move_to_end(key)
+        while len(self._last) > self.cached_threads:
+            self._last.popitem(last=False)
+
+    def _put_blob(self, thread_id, ns, channel, version, values):
+        key = (thread_id, ns, channel)
+        if channel not in values:
+            row = ("empty", None, None, None)
+            self._last.pop(key, None)
+        else:
+            value = values[channel]
+            last = self._last.get(key)
+            if (isinstance(value, list) and last is not None and isinstance(last[1], list)
+                    and last[2] < self.snapshot_every and _is_prefix(last[1], value)):
+                type_, data = self.serde.dumps_typed(value[len(last[1]):])
+                row = ("append", _stored_version(last[0]), type_, data)
+                depth = last[2] + 1
+            else:
+                type_, data = self.serde.dumps_typed(value)
+                row = ("full", None, type_, data)
+                depth = 0
+            if isinstance(value, list):
+                self._remember(key, version, list(value), depth)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, ns, channel, _stored_version(version), *row),
+        )
+
+    def _load_blob(self, thread_id, ns, channel, version):
+        suffixes = []
+        version = _stored_version(version)
+        while True:
+            row = self._conn.execute(
+                "SELECT kind, base_version, type, data FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, version),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                return None, False
+            kind, base_version, type_, data = row
+            value = self.serde.loads_typed((type_, data))
+            if kind == "full":
+                break
+            suffixes.append(value)
+            version = base_version
+        for suffix in reversed(suffixes):
+            value = value + suffix
+        return value, True
+
+    def _load_values(self, thread_id, ns, versions):
+        values = {}
+        for channel, version in versions.items():
+            value, found = self._load_blob(thread_id, ns, channel, version)
+            if found:
+                values[channel] = value
+        return values
+
+    # --- BaseCheckpointSaver ---
+
+    def get_next_version(self, current, channel):
+        counter = 0 if current is None else current if isinstance(current, int) else int(current.split(".")[0])
+        return f"{counter + 1:032}.{random.random():016}"
+
+    def _tuple(self, thread_id, ns, row):
+        checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint = _upgrade_versions(self.serde.loads_typed((type_, data)))
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": self._load_values(thread_id, ns, checkpoint["channel_versions"])},
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        query = ("SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                 "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(query + " AND checkpoint_id = ?", (thread_id, ns, checkpoint_id)).fetchone()
+            else:
+                row = self._conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, ns)).fetchone()
+            return self._tuple(thread_id, ns, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for thread_id, ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                item = self._tuple(thread_id, ns, row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        type_, data = self.serde.dumps_typed(stored)
+        metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            for channel, version in new_versions.items():
+                self._put_blob(thread_id, ns, channel, version, values)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, data, metadata_type, metadata_data),
+            )
+            self._conn.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # special channels (errors, interrupts) replace earlier writes, regular ones are written once
+        verb = "INSERT OR REPLACE" if all(c in WRITES_IDX_MAP for c, _ in writes) else "INSERT OR IGNORE"
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            rows.append((thread_id, ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, data, task_path))
+        with self._lock:
+            self._conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+            for key in [k for k in self._last if k[0] == thread_id]:
+                del self._last[key]
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # --- maintenance ---
+
+    def compact(self, thread_id, keep_last=10):
+        """Drop all but the newest `keep_last` checkpoints of a thread and the blobs they no longer reference."""
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id FROM checkpoints WHERE thread_id = ? "
+                "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?", (thread_id, keep_last),
+            ).fetchall()
+            for ns, checkpoint_id in old:
+                for table in ("checkpoints", "writes"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        (thread_id, ns, checkpoint_id),
+                    )
+            # every blob reachable from a kept checkpoint, following delta chains down to their snapshot
+            needed = set()
+            for ns, type_, data in self._conn.execute(
+                "SELECT checkpoint_ns, type, checkpoint FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            ).fetchall():
+                for channel, version in self.serde.loads_typed((type_, data))["channel_versions"].items():
+                    version = _stored_version(version)
+                    while version is not None and (ns, channel, version) not in needed:
+                        needed.add((ns, channel, version))
+                        row = self._conn.execute(
+                            "SELECT base_version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                            "AND channel = ? AND version = ?", (thread_id, ns, channel, version),
+                        ).fetchone()
+                        version = row[0] if row else None
+            stale = [
+                (thread_id, *key) for key in self._conn.execute(
+                    "SELECT checkpoint_ns, channel, version FROM blobs WHERE thread_id = ?", (thread_id,)
+                ).fetchall() if tuple(key) not in needed
+            ]
+            self._conn.executemany(
+                "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?", stale
+            )
+            self._conn.commit()
+            # the next delta of this thread may have been built on a blob removed above
+            for key in [k for k in self._last if k[0] == thread_id]:
+                del self._last[key]
+        return {"checkpoints_removed": len(old), "blobs_removed": len(stale)}
@@ -0,0 +1,133 @@
+"""Tool node that runs all tool calls of a model turn concurrently.
+
+Drop-in replacement for LangGraph's `ToolNode` when a model asks for several
+tools at once (e.g. arxiv, wikipedia and tavily together): every call runs as
+its own task with a per-tool timeout and a per-tool concurrency limit, so one
+slow search backend no longer holds up the others. A call that times out or
+raises comes back as an error `ToolMessage` the model can react to, and the
+latency of every call is recorded per tool. Tools get the whole tool call and
+the node's config, like under `ToolNode`, so their runs show up under the
+node in callbacks and traces. `offload` (e.g.
+`BlobStore.offload`) is applied to every successful result before it goes
+into the state.
+"""
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool, tool as as_tool
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))          # seconds per call
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))     # in-flight calls per tool
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    # sync graphs run their tool calls on one long-lived loop: asyncio.run would
+    # wait for a timed-out blocking tool to finish before returning
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="tool-calls", daemon=True).start()
+    return _loop
+
+
+def _message(output, call):
+    # invoked with a tool call, a tool returns a ToolMessage; plain results are wrapped like one
+    if isinstance(output, ToolMessage):
+        return output
+    content = output if isinstance(output, str) else json.dumps(output, default=str)
+    return ToolMessage(content=content, tool_call_id=call["id"], name=call["name"])
+
+
+class ConcurrentToolNode:
+    """`limits` maps a tool name to `{"timeout": seconds, "max_concurrency": n}`."""
+
+    def __init__(self, tools, limits=None, name="tools", offload=None):
+        self.tools = {t.name: t for t in (t if isinstance(t, BaseTool) else as_tool(t) for t in tools)}
+        self.limits = limits or {}
+        self.name = name
+        self.offload = offload
+        self.latency = defaultdict(list)   # tool name -> seconds of its latest 1000 calls
+        self.calls = defaultdict(int)
+        self.total_seconds = defaultdict(float)
+        self.errors = defaultdict(int)
+        self._semaphores = weakref.WeakKeyDictionary()   # event loop -> {tool name: semaphore}
+
+    def _semaphore(self, tool_name):
+        per_loop = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if tool_name not in per_loop:
+            per_loop[tool_name] = asyncio.Semaphore(self.limits.get(tool_name, {}).get("max_concurrency", TOOL_CONCURRENCY))
+        return per_loop[tool_name]
+
+    def _error(self, call, **details):
+        self.errors[call["name"]] += 1
+        return ToolMessage(
+            content=json.dumps({"error": details.pop("error"), "tool": call["name"], **details}),
+            tool_call_id=call["id"],
+            name=call["name"],
+            status="error",
+        )
+
+    async def _call(self, call, config=None):
+        name = call["name"]
+        started = time.perf_counter()
+        tool = self.tools.get(name)
+        if tool is None:
+            return self._error(call, error="unknown_tool", message=f"No tool named {name!r}. Available: {sorted(self.tools)}")
+        timeout = self.limits.get(name, {}).get("timeout", TOOL_TIMEOUT)
+        queued = 0.0
+        try:
+            async with self._semaphore(name):
+                queued = time.perf_counter() - started
+                tool_call = {"type": "tool_call", "id": call["id"], "name": name, "args": call["args"]}
+                output = await asyncio.wait_for(tool.ainvoke(tool_call, config), timeout)
+            message = _message(output, call)
+            if self.offload is not None:
+                message = self.offload(message)
+        except asyncio.TimeoutError:
+            message = self._error(call, error="timeout", timeout_seconds=timeout,
+                                  message="The tool did not answer in time. Try another tool or answer without it.")
+        except Exception as e:
+            message = self._error(call, error=type(e).__name__, message=str(e))
+        elapsed = time.perf_counter() - started
+        self.calls[name] += 1
+        self.total_seconds[name] += elapsed
+        self.latency[name].append(elapsed)
+        del self.latency[name][:-1000]
+        message.response_metadata = {"latency_ms": round(elapsed * 1000, 1), "queue_ms": round(queued * 1000, 1)}
+        return message
+
+    async def ainvoke_state(self, state, config=None):
+        calls = state["messages"][-1].tool_calls
+        return {"messages": list(await asyncio.gather(*(self._call(c, config) for c in calls)))}
+
+    def invoke_state(self, state, config=None):
+        return asyncio.run_coroutine_threadsafe(self.ainvoke_state(state, config), _background_loop()).result()
+
+    def as_node(self):
+        """A runnable to pass to `add_node`; works with both `invoke` and `ainvoke` graphs."""
+        return RunnableLambda(self.invoke_state, afunc=self.ainvoke_state, name=self.name)
+
+    def stats(self):
+        return {
+            name: {
+                "calls": self.calls[name],
+                "errors": self.errors[name],
+                "p50_ms": round(statistics.median(seconds) * 1000, 1),
+                "max_ms": round(max(seconds) * 1000, 1),
+                "total_s": round(self.total_seconds[name], 3),
+            }
+            for name, seconds in self.latency.items()
+        }
@@ -0,0 +1,324 @@
+"""Deterministic local chat model for running and benchmarking the graphs offline.
+
+`FakeChatModel` behaves like a chat model from the graphs' point of view:
+plain calls return text, `bind_tools` / `with_structured_output` return tool
+calls whose arguments are generated from the schema (`Route`, `Sections`,
+`Revision`, ...), and agents get tool calls for the tools named in the user's
+message. Latency is drawn from a configurable distribution for the time to
+first token, plus `completion_tokens / tokens_per_second` for the rest.
+
+Everything is seeded from the prompt, so the same run produces the same
+answers and timings. Select it with `LLM_BACKEND=fake`; tune it with
+`FAKE_LLM_LATENCY` (`fixed:0.3`, `uniform:0.2:0.6` or `lognormal:0.4:0.5`),
+`FAKE_LLM_TOKENS_PER_SECOND`, `FAKE_LLM_COMPLETION_TOKENS` and `FAKE_LLM_SEED`.
+Smaller models answer faster: `FAKE_LLM_MODEL_SPEED` (`model:factor,...`,
+default `MODEL_SPEED`) divides the time to first token and multiplies the
+token rate per model. Like the real API, a tool call whose arguments do not
+fit in `max_tokens` comes back cut off (`invalid_tool_calls`,
+`finish_reason="length"`).
+
+Prompt prefixes are cached like a provider does: the longest run of leading
+messages already sent to the same model is reported as cached input
+(`input_token_details.cache_read`) once it is at least
+`FAKE_LLM_PREFIX_CACHE_MIN` tokens (default 1024, OpenAI's minimum).
+
+Every call is appended to `CALL_LOG` with its start/end time and token counts.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+CALL_LOG = []
+_log_lock = threading.Lock()
+
+PREFIX_CACHE_MIN = int(os.getenv("FAKE_LLM_PREFIX_CACHE_MIN", "1024"))
+PREFIX_CACHE_SIZE = 10000
+_prefixes = OrderedDict()    # digest of (model, leading messages) -> None, least recently used first
+
+# relative speed per model, roughly as the hosted models compare
+MODEL_SPEED = {"gpt-4.1-nano": 2.0, "gpt-4.1-mini": 1.0, "gpt-4.1": 0.6, "gpt-5-nano": 1.5}
+
+WORDS = ("the", "a", "report", "story", "future", "engineer", "model", "market", "night", "door", "village",
+         "software", "growth", "risk", "team", "light", "quiet", "sudden", "careful", "bright", "old", "new")
+
+
+def reset_call_log():
+    with _log_lock:
+        CALL_LOG.clear()
+
+
+def cached_prefix_tokens(model_name, messages, token_counts):
+    """Tokens of the longest message prefix sent to `model_name` before (0 below the minimum); remembers this one."""
+    digest = hashlib.sha256(model_name.encode())
+    cached = total = 0
+    hit = True
+    with _log_lock:
+        for message, tokens in zip(messages, token_counts):
+            digest.update(f"{message.type}\0{_message_text(message)}\0".encode())
+            key = digest.hexdigest()
+            total += tokens
+            hit = hit and key in _prefixes
+            if hit:
+                cached = total
+            _prefixes[key] = None
+            _prefixes.move_to_end(key)
+        while len(_prefixes) > PREFIX_CACHE_SIZE:
+            _prefixes.popitem(last=False)
+    return cached if cached >= PREFIX_CACHE_MIN else 0
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _message_text(message):
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    for call in getattr(message, "tool_calls", None) or []:
+        text += json.dumps(call.get("args", {}))
+    for call in getattr(message, "invalid_tool_calls", None) or []:
+        text += call.get("args") or ""
+    return text
+
+
+class FakeChatModel(BaseChatModel):
+    model_name: str = "fake-model"
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    latency_distribution: str = "fixed"      # fixed | uniform | lognormal
+    latency_mean: float = 0.2                # seconds to first token
+    latency_spread: float = 0.0              # uniform: upper bound, lognormal: sigma
+    tokens_per_second: float = 200.0
+    completion_tokens: int = 120
+    seed: int = 0
+    # script(messages, tools) -> str | AIMessage | None; None falls back to the default behaviour
+    script: Optional[Callable[..., Any]] = None
+    # schema or tool name -> args dict, or callable(messages) -> args dict
+    structured: dict = {}
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        distribution, *params = os.getenv("FAKE_LLM_LATENCY", "fixed:0.2").split(":")
+        settings = {
+            "latency_distribution": distribution,
+            "latency_mean": float(params[0]) if params else 0.2,
+            "latency_spread": float(params[1]) if len(params) > 1 else 0.0,
+            "tokens_per_second": float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "200")),
+            "completion_tokens": int(os.getenv("FAKE_LLM_COMPLETION_TOKENS", "120")),
+            "seed": int(os.getenv("FAKE_LLM_SEED", "0")),
+        }
+        settings.update(kwargs)
+        speeds = dict(MODEL_SPEED)
+        for entry in filter(None, os.getenv("FAKE_LLM_MODEL_SPEED", "").split(",")):
+            name, factor = entry.rsplit(":", 1)
+            speeds[name.strip()] = float(factor)
+        speed = speeds.get(settings.get("model_name"), 1.0)
+        settings["latency_mean"] /= speed
+        settings["latency_spread"] /= speed
+        settings["tokens_per_second"] *= speed
+        return cls(**settings)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], tool_choice=tool_choice, **kwargs)
+
+    # --- timing ---
+
+    def _rng(self, messages):
+        digest = hashlib.sha256(f"{self.seed}\0{self.model_name}\0".encode() +
+                                "\0".join(_message_text(m) for m in messages).encode()).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def _first_token_seconds(self, rng):
+        if self.latency_distribution == "uniform":
+            return rng.uniform(self.latency_mean, max(self.latency_mean, self.latency_spread))
+        if self.latency_distribution == "lognormal":
+            sigma = self.latency_spread or 0.5
+            return rng.lognormvariate(math.log(self.latency_mean) - sigma ** 2 / 2, sigma)
+        return self.latency_mean
+
+    def _token_budget(self):
+        return min(self.completion_tokens, self.max_tokens) if self.max_tokens else self.completion_tokens
+
+    # --- responses ---
+
+    def _respond(self, messages, rng, tools=None, tool_choice=None):
+        if self.script is not None:
+            scripted = self.script(messages, tools or [])
+            if isinstance(scripted, str):
+                return AIMessage(content=scripted)
+            if scripted is not None:
+                return scripted
+        last = messages[-1] if messages else HumanMessage(content="")
+        if tools and tool_choice not in (None, "auto", "none"):
+            function = tools[0]["function"]
+            return self._tool_message([(function["name"], self._args(function, messages, rng))], rng)
+        if tools and tool_choice != "none" and isinstance(last, HumanMessage):
+            text = last.content.lower() if isinstance(last.content, str) else ""
+            requested = [t["function"] for t in tools if t["function"]["name"].lower() in text]
+            if requested:
+                return self._tool_message([(f["name"], self._args(f, messages, rng)) for f in requested], rng)
+        return AIMessage(content=self._text(rng, self._token_budget()))
+
+    def _tool_message(self, calls, rng):
+        return AIMessage(content="", tool_calls=[
+            {"name": name, "args": args, "id": f"call_{rng.getrandbits(48):012x}", "type": "tool_call"} for name, args in calls
+        ])
+
+    def _text(self, rng, tokens):
+        words = [rng.choice(WORDS) for _ in range(tokens)]
+        sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+        return " ".join(sentences)
+
+    def _args(self, function, messages, rng):
+        scripted = self.structured.get(function["name"])
+        if callable(scripted):
+            return scripted(messages)
+        if scripted is not None:
+            return scripted
+        parameters = function.get("parameters", {})
+        prompt = _message_text(messages[-1]).lower() if messages else ""
+        return self._value(parameters, parameters.get("$defs", {}), rng, prompt, function["name"])
+
+    def _value(self, schema, defs, rng, prompt, name):
+        if "$ref" in schema:
+            return self._value(defs[schema["$ref"].split("/")[-1]], defs, rng, prompt, name)
+        if "anyOf" in schema:
+            return self._value(schema["anyOf"][0], defs, rng, prompt, name)
+        if "enum" in schema:
+            # prefer the option the prompt mentions most (e.g. "poem about mom" -> poem)
+            return max(schema["enum"], key=lambda option: (prompt.count(str(option).lower()), rng.random()))
+        kind = schema.get("type")
+        if kind == "object":
+            return {key: self._value(sub, defs, rng, prompt, key) for key, sub in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [self._value(schema.get("items", {}), defs, rng, prompt, name) for _ in range(rng.randint(3, 6))]
+        if kind == "boolean":
+            return False
+        if kind == "integer":
+            return rng.randint(1, 9)
+        if kind == "number":
+            return round(rng.uniform(1, 9), 2)
+        if name == "name":
+            return self._text(rng, 3).rstrip(".")
+        if name in ("query", "input"):
+            return prompt[:80] or "query"
+        return self._text(rng, 20 if name == "description" else self._token_budget())
+
+    # --- BaseChatModel ---
+
+    def _record(self, started, messages, message):
+        with _log_lock:
+            CALL_LOG.append({
+                "model": self.model_name,
+                "start": started,
+                "end": time.perf_counter(),
+                "prompt_tokens": message.usage_metadata["input_tokens"],
+                "completion_tokens": message.usage_metadata["output_tokens"],
+                "cached_tokens": message.usage_metadata["input_token_details"]["cache_read"],
+            })
+
+    def _prepare(self, messages, kwargs):
+        rng = self._rng(messages)
+        message = self._respond(messages, rng, kwargs.get("tools"), kwargs.get("tool_choice"))
+        finish_reason = "stop"
+        if self.max_tokens and message.tool_calls and estimate_tokens(_message_text(message)) > self.max_tokens:
+            message = self._truncated(message)
+            finish_reason = "length"
+        token_counts = [estimate_tokens(_message_text(m)) for m in messages]
+        prompt_tokens = sum(token_counts)
+        message.usage_metadata = {"input_tokens": prompt_tokens, "output_tokens": estimate_tokens(_message_text(message)),
+                                  "total_tokens": prompt_tokens + estimate_tokens(_message_text(message)),
+                                  "input_token_details": {
+                                      "cache_read": cached_prefix_tokens(self.model_name, messages, token_counts)}}
+        message.response_metadata = {"model_name": self.model_name, "finish_reason": finish_reason}
+        return rng, message
+
+    def _truncated(self, message):
+        """The tool calls cut off at `max_tokens`, as unparseable arguments."""
+        budget = self.max_tokens * 4
+        invalid = []
+        for call in message.tool_calls:
+            args = json.dumps(call["args"])[:max(budget, 0)]
+            budget -= len(args)
+            invalid.append({"name": call["name"], "args": args, "id": call["id"], "error": None,
+                            "type": "invalid_tool_call"})
+        return AIMessage(content="", invalid_tool_calls=invalid)
+
+    def _pieces(self, message):
+        """Split a response into (delay, chunk) pairs at the configured token rate."""
+        per_token = 1 / self.tokens_per_second
+        if message.tool_calls or message.invalid_tool_calls:
+            pieces = []
+            for index, call in enumerate(message.tool_calls or message.invalid_tool_calls):
+                args = call["args"] if isinstance(call["args"], str) else json.dumps(call["args"])
+                for i in range(0, len(args), 16):
+                    first = i == 0
+                    pieces.append((per_token * 4, AIMessageChunk(content="", tool_call_chunks=[{
+                        "name": call["name"] if first else None, "args": args[i:i + 16],
+                        "id": call["id"] if first else None, "index": index, "type": "tool_call_chunk",
+                    }])))
+            return pieces
+        words = message.content.split(" ")
+        return [(per_token, AIMessageChunk(content=w if i == 0 else " " + w)) for i, w in enumerate(words)]
+
+    def simulate(self, messages, tools=None, tool_choice=None):
+        """(seconds to first token, [(delay, chunk)], message) of a call, without waiting.
+
+        For replaying the fake model over the wire (see fake_openai_server.py)."""
+        rng, message = self._prepare(messages, {"tools": tools, "tool_choice": tool_choice})
+        return self._first_token_seconds(rng), self._pieces(message), message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.perf_counter()
+        rng, message = self._prepare(messages, kwargs)
+        time.sleep(self._first_token_seconds(rng) + sum(d for d, _ in self._pieces(message)))
+        self._record(started, messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.perf_counter()
+        rng, message = self._prepare(messages, kwargs)
+        await asyncio.sleep(self._first_token_seconds(rng) + sum(d for d, _ in self._pieces(message)))
+        self._record(started, messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.perf_counter()
+        rng, message = self._prepare(messages, kwargs)
+        time.sleep(self._first_token_seconds(rng))
+        for delay, chunk in self._pieces(message):
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata,
+                                                         response_metadata=message.response_metadata))
+        self._record(started, messages, message)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.perf_counter()
+        rng, message = self._prepare(messages, kwargs)
+        await asyncio.sleep(self._first_token_seconds(rng))
+        for delay, chunk in self._pieces(message):
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=chunk)
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=message.usage_metadata,
+                                                         response_metadata=message.response_metadata))
+        self._record(started, messages, message)
@@ -0,0 +1,239 @@
+"""Local stand-in for the OpenAI chat completions API, answered by `FakeChatModel`.
+
+Lets the real `ChatOpenAI` client, and the shared connection pools in
+http_pool.py, be exercised end to end without an API key:
+
+    python -m workflows.fake_openai_server --port 8808 --handshake-delay 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=test python -m workflows.routing
+
+It speaks HTTP/1.1 with keep-alive, serves `POST /v1/chat/completions`
+(plain and streamed, with tools, `tool_choice` and `response_format`
+json_schema) and `GET /stats`, which reports how many connections were
+accepted and how many requests they carried. `--handshake-delay` stalls every
+new connection, like a TLS handshake to a remote endpoint would. `--rpm` and
+`--tpm` enforce provider-style limits (with one second of burst): requests
+over them get 429 with `retry-after-ms`, like the real API. Latency and
+token rate follow the `FAKE_LLM_*` settings of fake_llm.py.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.messages import convert_to_messages
+
+from .fake_llm import FakeChatModel
+from .rate_limit import TokenBucket
+
+
+@lru_cache(maxsize=None)
+def fake_model(name):
+    return FakeChatModel.from_env(model_name=name)
+
+
+def _tools_for(body):
+    """The request's tools and tool choice in the form FakeChatModel expects."""
+    tools, choice = body.get("tools") or [], body.get("tool_choice")
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        spec = response_format["json_schema"]
+        return [{"type": "function", "function": {"name": spec["name"], "parameters": spec.get("schema", {})}}], "required"
+    if isinstance(choice, dict):
+        # a named function goes first: FakeChatModel calls the first tool when a call is forced
+        name = choice["function"]["name"]
+        tools = sorted(tools, key=lambda t: t["function"]["name"] != name)
+        choice = "required"
+    return tools, choice
+
+
+def _arguments(call):
+    # a call cut off at max_tokens keeps its partial JSON text
+    return call["args"] if isinstance(call["args"], str) else json.dumps(call["args"])
+
+
+def _wire_tool_calls(message):
+    return [{"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": _arguments(call)}}
+            for call in message.tool_calls or message.invalid_tool_calls]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     # keep connections open between requests
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+            return
+        self.server.count("requests")
+        model = fake_model(body.get("model", "fake-model"))
+        cap = body.get("max_completion_tokens") or body.get("max_tokens")
+        if cap:
+            model = model.model_copy(update={"max_tokens": cap})
+        tools, choice = _tools_for(body)
+        first_token, pieces, message = model.simulate(convert_to_messages(body["messages"]), tools, choice)
+        wait = self.server.admit(message.usage_metadata["total_tokens"])
+        if wait:
+            self.server.count("rate_limited")
+            body = json.dumps({"error": {"message": "Rate limit reached, retry later", "type": "requests",
+                                         "code": "rate_limit_exceeded"}}).encode()
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("retry-after-ms", str(int(wait * 1000) + 1))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if body.get("response_format", {}).get("type") == "json_schema":
+            # structured output comes back as JSON content, not as a tool call
+            call = (message.tool_calls or message.invalid_tool_calls)[0]
+            message.content, message.tool_calls, message.invalid_tool_calls = _arguments(call), [], []
+            pieces = [(sum(d for d, _ in pieces), None)]
+        usage = {"prompt_tokens": message.usage_metadata["input_tokens"],
+                 "completion_tokens": message.usage_metadata["output_tokens"],
+                 "total_tokens": message.usage_metadata["total_tokens"],
+                 "prompt_tokens_details": {"cached_tokens": message.usage_metadata["input_token_details"]["cache_read"]}}
+        completion = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": model.model_name}
+        finish_reason = ("length" if message.response_metadata.get("finish_reason") == "length"
+                         else "tool_calls" if message.tool_calls or message.invalid_tool_calls else "stop")
+        time.sleep(first_token)
+        if body.get("stream"):
+            self._stream(completion, pieces, message, finish_reason,
+                         usage if (body.get("stream_options") or {}).get("include_usage") else None)
+            return
+        time.sleep(sum(d for d, _ in pieces))
+        reply = {"role": "assistant", "content": message.content or None}
+        if message.tool_calls or message.invalid_tool_calls:
+            reply["tool_calls"] = _wire_tool_calls(message)
+        self._send_json(200, {**completion, "object": "chat.completion", "usage": usage,
+                              "choices": [{"index": 0, "message": reply, "finish_reason": finish_reason}]})
+
+    # --- server-sent events over a chunked response ---
+
+    def _event(self, payload):
+        data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, completion, pieces, message, finish_reason, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk = {**completion, "object": "chat.completion.chunk"}
+
+        def event(delta, finish=None):
+            self._event({**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]})
+
+        event({"role": "assistant", "content": ""})
+        if message.tool_calls or message.invalid_tool_calls:
+            wire = _wire_tool_calls(message)
+            for delay, piece in pieces:
+                time.sleep(delay)
+                part = piece.tool_call_chunks[0]
+                delta = {"index": part["index"], "function": {"arguments": part["args"]}}
+                if part["id"]:
+                    delta.update(id=part["id"], type="function")
+                    delta["function"]["name"] = wire[part["index"]]["function"]["name"]
+                event({"tool_calls": [delta]})
+        elif pieces and pieces[0][1] is None:
+            time.sleep(pieces[0][0])
+            event({"content": message.content})
+        else:
+            for delay, piece in pieces:
+                time.sleep(delay)
+                event({"content": piece.content})
+        event({}, finish_reason)
+        if usage is not None:
+            self._event({**chunk, "choices": [], "usage": usage})
+        self._event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128     # the default backlog of 5 drops bursts of concurrent connects
+
+    def __init__(self, address, handshake_delay=0.0, rpm=None, tpm=None):
+        super().__init__(address, Handler)
+        self.handshake_delay = handshake_delay
+        self._lock = threading.Lock()
+        self.counters = {"connections": 0, "requests": 0, "rate_limited": 0}
+        self.buckets = [(TokenBucket(limit, burst_s=1), per_call) for limit, per_call in ((rpm, False), (tpm, True))
+                        if limit]
+
+    def admit(self, tokens):
+        """0 if the request fits the limits (and is charged), else seconds until it would."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max((bucket.deficit(tokens if per_token else 1, now) for bucket, per_token in self.buckets),
+                       default=0.0)
+            if wait == 0:
+                for bucket, per_token in self.buckets:
+                    bucket.take(tokens if per_token else 1)
+            return wait
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_server(port=0, handshake_delay=0.0, rpm=None, tpm=None):
+    """Serve on a background thread; returns the server (see `base_url`, `stats()`, `shutdown()`)."""
+    server = FakeOpenAIServer(("127.0.0.1", port), handshake_delay, rpm, tpm)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--handshake-delay", type=float, default=0.0, help="seconds every new connection stalls")
+    parser.add_argument("--rpm", type=float, help="requests per minute before answering 429")
+    parser.add_argument("--tpm", type=float, help="tokens per minute before answering 429")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(("127.0.0.1", args.port), args.handshake_delay, args.rpm, args.tpm)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Local pre-router that answers obvious routing decisions without a model call.
+
+Keyword rules catch inputs that literally ask for a poem, joke or story. A
+small bag-of-words naive Bayes classifier, trained from the decisions the LLM
+router made before (logged as JSONL), covers the rest. Only when neither is
+confident enough does the caller fall back to the `Route` LLM router.
+
+`stats()` keeps two disagreement rates apart. The fallback rate compares the
+classifier's low-confidence guesses with the LLM, so it only covers the hard
+inputs. The audit rate sends a random `FAST_ROUTER_AUDIT_RATE` share of the
+fast answers to the LLM as well, which estimates how often the fast path
+itself is wrong.
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+from collections import Counter, defaultdict
+
+FAST_ROUTER = os.getenv("FAST_ROUTER", "1") == "1"
+FAST_ROUTER_THRESHOLD = float(os.getenv("FAST_ROUTER_THRESHOLD", "0.9"))
+FAST_ROUTER_AUDIT_RATE = float(os.getenv("FAST_ROUTER_AUDIT_RATE", "0.02"))   # share of fast answers double-checked by the LLM
+ROUTER_LOG = os.getenv("ROUTER_LOG", "router_decisions.jsonl")
+
+KEYWORD_RULES = {
+    "poem": re.compile(r"\b(poem|poems|poetry|verse|haiku|sonnet|limerick|rhyme)\b", re.I),
+    "joke": re.compile(r"\b(joke|jokes|funny|pun|puns|one-liner|make me laugh)\b", re.I),
+    "story": re.compile(r"\b(story|stories|tale|fable|narrative|short fiction)\b", re.I),
+}
+
+
+def tokenize(text):
+    words = re.findall(r"[a-z']+", text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over unigrams and bigrams, updatable one example at a time."""
+
+    def __init__(self, min_examples=20):
+        self.min_examples = min_examples
+        self.doc_counts = Counter()
+        self.word_counts = defaultdict(Counter)
+        self.total_words = Counter()
+        self.vocab = set()
+
+    @property
+    def examples(self):
+        return sum(self.doc_counts.values())
+
+    def learn(self, text, label):
+        tokens = tokenize(text)
+        self.doc_counts[label] += 1
+        self.word_counts[label].update(tokens)
+        self.total_words[label] += len(tokens)
+        self.vocab.update(tokens)
+
+    def predict(self, text):
+        if self.examples < self.min_examples:
+            return None, 0.0
+        tokens = tokenize(text)
+        vocab_size = len(self.vocab) + 1
+        scores = {}
+        for label, docs in self.doc_counts.items():
+            score = math.log(docs / self.examples)
+            denominator = self.total_words[label] + vocab_size
+            for token in tokens:
+                score += math.log((self.word_counts[label][token] + 1) / denominator)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        probability = 1 / sum(math.exp(s - top) for s in scores.values())
+        return best, probability
+
+
+class FastRouter:
+    def __init__(self, threshold=FAST_ROUTER_THRESHOLD, audit_rate=FAST_ROUTER_AUDIT_RATE, log_path=ROUTER_LOG):
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.log_path = log_path
+        self.model = NaiveBayes()
+        self.calls = 0
+        self.fast_hits = 0
+        self.llm_fallbacks = 0
+        self.guesses_compared = 0        # low-confidence guesses checked against the LLM's fallback answer
+        self.guess_disagreements = 0
+        self.audited = 0                 # fast answers sampled for a second opinion from the LLM
+        self.audit_disagreements = 0
+        # graphs route from several threads; the classifier's counters and the log are shared
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_log(cls, log_path=ROUTER_LOG, **kwargs):
+        """Build a router and train its classifier on previously logged LLM decisions."""
+        router = cls(log_path=log_path, **kwargs)
+        if log_path and os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        router.model.learn(row["input"], row["decision"])
+        return router
+
+    def predict(self, text):
+        """Return `(label, confidence)`; label is None when the fast path has no opinion."""
+        matched = [label for label, pattern in KEYWORD_RULES.items() if pattern.search(text)]
+        if len(matched) == 1:
+            return matched[0], 1.0
+        with self._lock:
+            label, confidence = self.model.predict(text)
+        if len(matched) > 1 and label not in matched:
+            return label, 0.0  # keywords point elsewhere, let the LLM decide
+        return label, confidence
+
+    def try_route(self, text):
+        """Count a routing request and answer it locally if confident.
+
+        Returns `(decision, guess)`; decision is None when the LLM has to decide.
+        """
+        label, confidence = self.predict(text)
+        fast = confidence >= self.threshold
+        with self._lock:
+            self.calls += 1
+            self.fast_hits += fast
+        return (label, label) if fast else (None, label)
+
+    def learn(self, text, decision, guess=None):
+        """Record an LLM decision: count disagreement with our guess, then train on it."""
+        with self._lock:
+            self.llm_fallbacks += 1
+            if guess is not None:
+                self.guesses_compared += 1
+                self.guess_disagreements += guess != decision
+            self.model.learn(text, decision)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"input": text, "decision": decision}) + "\n")
+
+    def should_audit(self):
+        """Whether this fast answer is one of the sampled ones the LLM also answers."""
+        return self.audit_rate > 0 and random.random() < self.audit_rate
+
+    def audit(self, decision, llm_decision):
+        """Record the LLM's answer for a sampled fast answer."""
+        with self._lock:
+            self.audited += 1
+            self.audit_disagreements += decision != llm_decision
+
+    def route(self, text, llm_route):
+        """Route `text` locally when confident, otherwise with `llm_route(text)`."""
+        decision, guess = self.try_route(text)
+        if decision is not None:
+            if self.should_audit():
+                self.audit(decision, llm_route(text))
+            return decision
+        decision = llm_route(text)
+        self.learn(text, decision, guess=guess)
+        return decision
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "fast_path_hits": self.fast_hits,
+                "fast_path_hit_rate": self.fast_hits / self.calls if self.calls else 0.0,
+                "llm_fallbacks": self.llm_fallbacks,
+                "fallback_guesses_compared": self.guesses_compared,
+                "fallback_disagreement_rate":
+                    self.guess_disagreements / self.guesses_compared if self.guesses_compared else 0.0,
+                "audited": self.audited,
+                "audit_disagreement_rate": self.audit_disagreements / self.audited if self.audited else 0.0,
+                "training_examples": self.model.examples,
+            }
@@ -0,0 +1,269 @@
+"""Read/write sets, critical path and a rewired schedule for plain-edge graphs.
+
+Each node's source is parsed once: `state["key"]` and `state.get("key")`
+are reads, keys of the dict literals it returns are writes. Keys missing
+from the state schema are reported (or rejected with `strict=True`), and a
+node that only returns what it read (`{"k": state["k"]}`) is flagged as a
+pass-through. A node that hands the whole state to another function, or
+returns something other than a dict literal, is treated as reading / writing
+every key.
+
+From the read/write sets `GraphAnalysis.plan()` derives the edges the data
+actually needs: every node runs after the nodes that write the keys it reads,
+and pass-through nodes are dropped. `rewire(builder)` builds that graph, so
+independent nodes (e.g. the story's title and its final text) run in the same
+step. Critical paths of the declared and the planned graph are weighted by
+node durations from a trace (see tracing.py) or, without one, by whether a
+node's source calls a model.
+
+    python -m workflows.parallelization --plan [--durations traces/run.jsonl]
+"""
+import ast
+import inspect
+import json
+import textwrap
+import warnings
+from collections import defaultdict
+
+START, END = "__start__", "__end__"
+ALL = "*"     # an opaque read or write: any key
+
+MODEL_CALLS = {"invoke", "ainvoke", "stream", "astream", "batch", "abatch", "stream_text"}
+
+
+class NodeAccess:
+    def __init__(self, reads=(), writes=(), passthrough=False, model_calls=0):
+        self.reads = set(reads)
+        self.writes = set(writes)
+        self.passthrough = passthrough
+        self.model_calls = model_calls
+
+    def __repr__(self):
+        return f"NodeAccess(reads={sorted(self.reads)}, writes={sorted(self.writes)}, model_calls={self.model_calls})"
+
+
+class _AccessVisitor(ast.NodeVisitor):
+    def __init__(self, state):
+        self.state = state
+        self.reads, self.writes = set(), set()
+        self.copies = []          # (written key, key the value was read from or None)
+        self.model_calls = 0
+
+    def _state_key(self, node):
+        """'key' for `state["key"]` / `state.get("key", ...)`, else None."""
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == self.state \
+                and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+            return node.slice.value
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "get" \
+                and isinstance(node.func.value, ast.Name) and node.func.value.id == self.state \
+                and node.args and isinstance(node.args[0], ast.Constant):
+            return node.args[0].value
+        return None
+
+    def visit_FunctionDef(self, node):
+        pass      # nested functions are not part of this node
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_FunctionDef
+
+    def visit_Subscript(self, node):
+        key = self._state_key(node)
+        if key is not None:
+            self.reads.add(key)
+            return
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        key = self._state_key(node)
+        if key is not None:
+            self.reads.add(key)
+            return
+        name = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", None)
+        self.model_calls += name in MODEL_CALLS
+        if any(isinstance(a, ast.Name) and a.id == self.state for a in node.args + [k.value for k in node.keywords]):
+            self.reads.add(ALL)     # the whole state is handed to someone else
+        self.generic_visit(node)
+
+    def visit_Return(self, node):
+        if node.value is None or (isinstance(node.value, ast.Constant) and node.value.value is None):
+            return
+        if isinstance(node.value, ast.Dict) and all(isinstance(k, ast.Constant) for k in node.value.keys):
+            for key, value in zip(node.value.keys, node.value.values):
+                self.writes.add(key.value)
+                self.copies.append((key.value, self._state_key(value)))
+        else:
+            self.writes.add(ALL)
+        self.generic_visit(node)
+
+
+def _function(node_spec):
+    runnable = getattr(node_spec, "runnable", node_spec)
+    fn = getattr(runnable, "func", None) or getattr(runnable, "afunc", None) or runnable
+    return inspect.unwrap(fn)
+
+
+def node_access(fn):
+    """Read/write sets of a node function, from its source."""
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(fn)))
+    except (OSError, TypeError, SyntaxError):
+        return NodeAccess({ALL}, {ALL})     # no source (a prebuilt runnable, ...): assume it touches everything
+    definition = tree.body[0]
+    if not isinstance(definition, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return NodeAccess({ALL}, {ALL})
+    args = definition.args.posonlyargs + definition.args.args
+    if not args:
+        return NodeAccess()
+    visitor = _AccessVisitor(args[0].arg)
+    for statement in definition.body:
+        visitor.visit(statement)
+    passthrough = bool(visitor.copies) and all(written == read for written, read in visitor.copies)
+    return NodeAccess(visitor.reads, visitor.writes, passthrough, visitor.model_calls)
+
+
+def schema_keys(schema):
+    if hasattr(schema, "model_fields"):
+        return set(schema.model_fields)
+    keys = set()
+    for cls in reversed(getattr(schema, "__mro__", [schema])):
+        keys.update(getattr(cls, "__annotations__", {}))
+    return keys
+
+
+def load_durations(path):
+    """Mean duration in ms per node from a tracing.py JSONL export."""
+    samples = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                samples[row["node"]].append(row["duration_ms"])
+    return {node: sum(values) / len(values) for node, values in samples.items()}
+
+
+def _topological(nodes, preds):
+    order, done = [], set()
+    remaining = list(nodes)
+    while remaining:
+        ready = [n for n in remaining if preds.get(n, set()) - {START} <= done]
+        if not ready:
+            raise ValueError(f"cycle between {remaining}")
+        for n in ready:
+            order.append(n)
+            done.add(n)
+            remaining.remove(n)
+    return order
+
+
+def critical_path(preds, weights):
+    """(length, nodes) of the heaviest START-to-END chain."""
+    best = {}
+    for node in _topological(list(preds), preds):
+        before = max((best[p] for p in preds[node] if p in best), default=(0, []), key=lambda b: b[0])
+        best[node] = (before[0] + weights.get(node, 0), before[1] + [node])
+    return max(best.values(), key=lambda b: b[0], default=(0, []))
+
+
+class GraphAnalysis:
+    def __init__(self, builder, durations=None, strict=False):
+        self.builder = builder
+        self.keys = schema_keys(builder.state_schema)
+        self.nodes = {name: node_access(_function(spec)) for name, spec in builder.nodes.items()}
+        self.durations = durations
+        self.warnings = []
+        for name, access in self.nodes.items():
+            for kind, keys in (("reads", access.reads), ("writes", access.writes)):
+                for key in sorted(keys - self.keys - {ALL}):
+                    self.warnings.append(f"{name} {kind} unknown key '{key}'")
+            if access.passthrough:
+                self.warnings.append(f"{name} only passes through {sorted(access.writes)}")
+        if builder.branches:
+            self.warnings.append("conditional edges are not analyzed; only plain edges are planned")
+        unknown = [w for w in self.warnings if "unknown key" in w]
+        if unknown and strict:
+            raise ValueError("; ".join(unknown))
+        for warning in unknown:
+            warnings.warn(warning, stacklevel=2)
+
+    @property
+    def weights(self):
+        if self.durations:
+            return {name: self.durations.get(name, 0.0) for name in self.nodes}
+        # call sites in alternative branches (stream or invoke) are one round trip
+        return {name: int(access.model_calls > 0) for name, access in self.nodes.items()}
+
+    def declared(self):
+        """node -> predecessors, as the graph was built."""
+        preds = {name: set() for name in self.nodes}
+        for start, end in self.builder.edges:
+            if end != END:
+                preds[end].add(start)
+        for starts, end in self.builder.waiting_edges:
+            if end != END:
+                preds[end].update(starts)
+        return preds
+
+    def plan(self):
+        """node -> predecessors needed by the data alone; pass-through nodes are left out."""
+        declared = self.declared()
+        order = _topological(list(declared), declared)
+        kept = [n for n in order if not self.nodes[n].passthrough]
+        preds = {}
+        for i, node in enumerate(kept):
+            reads = self.nodes[node].reads
+            earlier = kept[:i]
+            preds[node] = {w for w in earlier
+                           if ALL in reads or ALL in self.nodes[w].writes or reads & self.nodes[w].writes}
+        # keep only the direct dependencies
+        for node, before in preds.items():
+            implied = set().union(*(self._ancestors(p, preds) for p in before)) if before else set()
+            preds[node] = (before - implied) or {START}
+        return preds
+
+    def _ancestors(self, node, preds):
+        seen, stack = set(), list(preds.get(node, ()))
+        while stack:
+            n = stack.pop()
+            if n not in seen and n != START:
+                seen.add(n)
+                stack.extend(preds.get(n, ()))
+        return seen
+
+    def report(self):
+        unit = "ms" if self.durations else "model round trips"
+        lines = ["node reads / writes:"]
+        for name, access in self.nodes.items():
+            lines.append(f"  {name:24s} reads {sorted(access.reads)} writes {sorted(access.writes)}"
+                         f" ({access.model_calls} model call sites{', pass-through' if access.passthrough else ''})")
+        lines += [f"warning: {w}" for w in self.warnings]
+        for title, preds in (("declared", self.declared()), ("planned", self.plan())):
+            length, path = critical_path(preds, self.weights)
+            lines.append(f"{title} critical path ({length:g} {unit}): {' -> '.join(path)}")
+            for node, before in preds.items():
+                lines.append(f"  {' + '.join(sorted(before)) or START} -> {node}")
+        return "\n".join(lines)
+
+
+def analyze(builder, durations=None, strict=False):
+    """GraphAnalysis of an uncompiled StateGraph."""
+    return GraphAnalysis(builder, durations, strict)
+
+
+def rewire(builder, analysis=None):
+    """A new StateGraph with the same nodes, wired by `analysis.plan()`."""
+    from langgraph.graph import StateGraph
+    if builder.branches:
+        raise ValueError("rewire only handles graphs with plain edges")
+    analysis = analysis or analyze(builder)
+    preds = analysis.plan()
+    graph = StateGraph(builder.state_schema, input_schema=builder.input_schema, output_schema=builder.output_schema)
+    for name in preds:
+        spec = builder.nodes[name]
+        graph.add_node(name, _function(spec), input_schema=spec.input_schema, metadata=spec.metadata,
+                       retry_policy=spec.retry_policy)
+    has_successor = set().union(*preds.values())
+    for node, before in preds.items():
+        # a list of sources waits for all of them before running the node once
+        graph.add_edge(sorted(before) if len(before) > 1 else next(iter(before)), node)
+        if node not in has_successor:
+            graph.add_edge(node, END)
+    return graph
@@ -0,0 +1,103 @@
+"""Token-budgeted history window with a rolling summary for chat agents.
+
+Instead of sending the whole `add_messages` history on every turn, the agent
+sends a summary of the older turns plus the most recent turns that fit the
+thread's token budget. A turn is a human message and everything that follows
+it up to the next one, so tool calls always stay next to their tool results.
+Older turns are folded into the summary incrementally: each fold only feeds
+the previous summary and the newly dropped turns to the summarizer.
+"""
+import os
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from . import prompts
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+# after a fold the window is trimmed to this share of the budget, so the next
+# few turns fit without summarizing again
+HISTORY_KEEP_RATIO = float(os.getenv("HISTORY_KEEP_RATIO", "0.6"))
+
+
+def estimate_tokens(message):
+    """Rough token count (~4 characters per token) of a message, including tool call arguments."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    chars = len(content) + sum(len(str(call.get("args", ""))) for call in getattr(message, "tool_calls", None) or [])
+    return chars // 4 + 4
+
+
+def split_turns(messages):
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def transcript(messages):
+    lines = []
+    for m in messages:
+        line = f"{m.type}: {m.content}"
+        for call in getattr(m, "tool_calls", None) or []:
+            line += f"\n  [called {call['name']} with {call['args']}]"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class HistoryManager:
+    def __init__(self, summarizer, token_budget=HISTORY_TOKEN_BUDGET, keep_ratio=HISTORY_KEEP_RATIO):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.keep_ratio = keep_ratio
+        self.turns = 0
+        self.tokens_saved = 0
+        self.folds = 0
+
+    def _window_start(self, messages, start, budget):
+        """Index of the oldest message after `start` such that whole turns up to the end fit `budget`."""
+        turns = split_turns(messages[start:])
+        index, used = len(messages), 0
+        for i, turn in enumerate(reversed(turns)):
+            cost = sum(estimate_tokens(m) for m in turn)
+            if i > 0 and used + cost > budget:
+                break
+            used += cost
+            index -= len(turn)
+        return index
+
+    def _fold(self, summary, messages):
+        self.folds += 1
+        return self.summarizer.invoke(prompts.prompt("history_summary", summary=summary or "(empty)",
+                                                     transcript=transcript(messages))).content
+
+    def prepare(self, state, config=None):
+        """Build the prompt for this turn.
+
+        Returns `(prompt_messages, state_updates)`; the updates carry the new
+        `summary`, `summarized_upto` and this turn's `tokens_saved`.
+        """
+        budget = (config or {}).get("configurable", {}).get("history_token_budget", self.token_budget)
+        messages = state["messages"]
+        summary = state.get("summary", "")
+        start = min(state.get("summarized_upto", 0), len(messages))
+
+        if sum(estimate_tokens(m) for m in messages[start:]) > budget:
+            cut = self._window_start(messages, start, int(budget * self.keep_ratio))
+            if cut > start:
+                summary = self._fold(summary, messages[start:cut])
+                start = cut
+
+        prompt = ([SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")] if summary else []) + messages[start:]
+        saved = sum(estimate_tokens(m) for m in messages) - sum(estimate_tokens(m) for m in prompt)
+        self.turns += 1
+        self.tokens_saved += saved
+        return prompt, {"summary": summary, "summarized_upto": start, "tokens_saved": saved}
+
+    def stats(self):
+        return {
+            "turns": self.turns,
+            "folds": self.folds,
+            "tokens_saved": self.tokens_saved,
+            "tokens_saved_per_turn": self.tokens_saved / self.turns if self.turns else 0.0,
+        }
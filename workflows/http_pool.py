@@ -0,0 +1,266 @@
+"""Shared keep-alive HTTP connection pools, one per model endpoint (base URL).
+
+Every OpenAI client created by `models.chat_model` talks through the
+`Endpoint` of its base URL: one sync pool, and one async pool per event loop
+(connections belong to the loop that opened them), so graphs in the same
+process reuse warm connections instead of paying the TCP/TLS handshake on
+every request.
+
+Limits come from `HTTP_MAX_CONNECTIONS`, `HTTP_MAX_KEEPALIVE`,
+`HTTP_KEEPALIVE_EXPIRY` and `HTTP_TIMEOUT`, overridable per endpoint with
+`HTTP_POOL_LIMITS` (JSON: `{"<base url>": {"max_connections": 8}}`) or
+`configure_endpoint()`. `pool_stats()` reports requests, connections opened,
+connection-setup time, time spent waiting for a free connection and peak
+utilization per endpoint, from httpcore's trace extension.
+"""
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import weakref
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))     # per endpoint
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))         # idle connections kept open per endpoint
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))  # seconds an idle connection is kept
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+ENDPOINT_LIMITS = json.loads(os.getenv("HTTP_POOL_LIMITS", "{}"))
+
+_lock = threading.Lock()
+_endpoints = {}   # base url -> Endpoint
+
+
+class Endpoint:
+    """Connection pools and their metrics for one base URL."""
+
+    def __init__(self, base_url, max_connections=HTTP_MAX_CONNECTIONS, max_keepalive=HTTP_MAX_KEEPALIVE,
+                 keepalive_expiry=HTTP_KEEPALIVE_EXPIRY, timeout=HTTP_TIMEOUT):
+        self.base_url = base_url
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self._sync_transport = httpx.HTTPTransport(limits=self.limits)
+        self._async_transports = weakref.WeakKeyDictionary()   # event loop -> transport
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.connections_opened = 0
+        self.connect_ms = []     # latest 1000 connection setups
+        self.wait_ms = []        # latest 1000 waits for a free connection
+        self._client = None
+        self._async_client = None
+
+    # --- clients handed to ChatOpenAI ---
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.Client(transport=_SyncTransport(self), timeout=self.timeout)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            # connections belong to the loop that opened them, so the transport picks a pool per loop
+            self._async_client = httpx.AsyncClient(transport=_AsyncTransport(self), timeout=self.timeout)
+        return self._async_client
+
+    def async_transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._async_transports.get(loop)
+            if transport is None:
+                transport = self._async_transports[loop] = httpx.AsyncHTTPTransport(limits=self.limits)
+            return transport
+
+    # --- metrics, fed by httpcore's trace extension ---
+
+    def _sent(self, waited_ms, connected_ms):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.wait_ms.append(max(0.0, waited_ms))
+            del self.wait_ms[:-1000]
+            if connected_ms is not None:
+                self.connections_opened += 1
+                self.connect_ms.append(connected_ms)
+                del self.connect_ms[:-1000]
+
+    def _done(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            connect_ms, wait_ms = list(self.connect_ms), sorted(self.wait_ms)
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_connections": self.limits.max_connections,
+                "peak_utilization": round(self.peak_in_flight / self.limits.max_connections, 3),
+                "connections_opened": self.connections_opened,
+                "connect_ms_p50": round(statistics.median(connect_ms), 2) if connect_ms else None,
+                "connect_ms_max": round(max(connect_ms), 2) if connect_ms else None,
+                "wait_ms_p95": round(wait_ms[int(0.95 * (len(wait_ms) - 1))], 2) if wait_ms else None,
+            }
+
+    def close(self):
+        """Close both clients and every pool; an async pool is closed on the event loop that owns it."""
+        if self._client is not None:
+            self._client.close()
+        self._sync_transport.close()
+        with self._lock:
+            transports = list(self._async_transports.items())
+            self._async_transports.clear()
+        for loop, transport in transports:
+            _run_on(loop, transport.aclose())
+        if self._async_client is not None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                asyncio.run(self._async_client.aclose())
+            else:
+                _run_on(loop, self._async_client.aclose())
+
+
+def _run_on(loop, coro):
+    """Run `coro` on `loop`: right away if the loop is idle, as a task if it is running, not at all if it is closed."""
+    if loop.is_closed():
+        coro.close()
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(coro, loop)
+    else:
+        loop.run_until_complete(coro)
+
+
+class _RequestTrace:
+    """httpcore trace callback for one request: connection setup time, wait for a connection, in-flight count.
+
+    The request counts as in flight from sending its headers until `done()`, which the transports call
+    when the response is closed or the request fails, so a failed request never stays counted.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.connect = None
+        self.connected_ms = 0.0
+        self._lock = threading.Lock()
+        self._sent = False
+
+    def __call__(self, event, info):
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            self.connect = now
+        elif event in ("connection.connect_tcp.complete", "connection.start_tls.complete") and self.connect:
+            self.connected_ms = (now - self.connect) * 1000
+        elif event in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+            with self._lock:
+                if self._sent:
+                    return
+                self._sent = True
+            waited = (now - self.start) * 1000 - self.connected_ms
+            self.endpoint._sent(waited, self.connected_ms if self.connect else None)
+
+    async def atrace(self, event, info):
+        self(event, info)
+
+    def done(self):
+        with self._lock:
+            sent, self._sent = self._sent, False
+        if sent:
+            self.endpoint._done()
+
+
+class _TracedStream(httpx.SyncByteStream):
+    def __init__(self, stream, trace):
+        self._stream = stream
+        self._trace = trace
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._trace.done()
+
+
+class _AsyncTracedStream(httpx.AsyncByteStream):
+    def __init__(self, stream, trace):
+        self._stream = stream
+        self._trace = trace
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._trace.done()
+
+
+class _SyncTransport(httpx.BaseTransport):
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def handle_request(self, request):
+        trace = request.extensions["trace"] = _RequestTrace(self.endpoint)
+        with self.endpoint._lock:
+            self.endpoint.requests += 1
+        try:
+            response = self.endpoint._sync_transport.handle_request(request)
+        except BaseException:
+            trace.done()
+            raise
+        response.stream = _TracedStream(response.stream, trace)
+        return response
+
+
+class _AsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    async def handle_async_request(self, request):
+        trace = _RequestTrace(self.endpoint)
+        request.extensions["trace"] = trace.atrace
+        with self.endpoint._lock:
+            self.endpoint.requests += 1
+        try:
+            response = await self.endpoint.async_transport().handle_async_request(request)
+        except BaseException:
+            trace.done()
+            raise
+        response.stream = _AsyncTracedStream(response.stream, trace)
+        return response
+
+
+def configure_endpoint(base_url, **limits):
+    """Set pool limits (max_connections, max_keepalive, keepalive_expiry, timeout) for an endpoint before first use."""
+    base_url = base_url.rstrip("/")
+    with _lock:
+        if base_url in _endpoints:
+            raise RuntimeError(f"{base_url} is already in use; configure it before the first model is created")
+        ENDPOINT_LIMITS[base_url] = limits
+
+
+def get_endpoint(base_url):
+    base_url = base_url.rstrip("/")
+    with _lock:
+        if base_url not in _endpoints:
+            _endpoints[base_url] = Endpoint(base_url, **ENDPOINT_LIMITS.get(base_url, {}))
+        return _endpoints[base_url]
+
+
+def pool_stats():
+    with _lock:
+        endpoints = dict(_endpoints)
+    return {url: endpoint.stats() for url, endpoint in endpoints.items()}
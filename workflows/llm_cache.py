@@ -0,0 +1,175 @@
+"""Persistent, content-addressed cache in front of the chat model calls.
+
+Every workflow can wrap its model with `cached(llm)`; repeated prompts
+(same model, same parameters, same normalized messages) are answered from a
+SQLite file instead of going back to the provider. A caller that finds an
+answer unusable (e.g. structured output that does not validate) drops it
+again with `forget(keys)`, using the keys `track_keys()` collected.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE", str(7 * 24 * 3600)))  # seconds
+
+_tracked = contextvars.ContextVar("llm_cache_tracked", default=None)   # keys read or written, see track_keys
+
+
+def _normalize(value):
+    # collapse whitespace inside message contents so cosmetic prompt edits still hit
+    if isinstance(value, dict):
+        return {k: " ".join(v.split()) if k == "content" and isinstance(v, str) else _normalize(v)
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    try:
+        prompt = json.dumps(_normalize(json.loads(prompt)), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        prompt = " ".join(prompt.split())
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """LLM cache stored in one SQLite file with size- and age-based eviction."""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_age=LLM_CACHE_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def lookup(self, prompt, llm_string):
+        key = cache_key(prompt, llm_string)
+        _track(key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return [ChatGeneration(message=m) for m in messages_from_dict(json.loads(row[0]))]
+
+    def update(self, prompt, llm_string, return_val):
+        messages = [g.message for g in return_val if isinstance(g, ChatGeneration)]
+        if len(messages) != len(return_val):
+            return  # plain completions are not produced by our chat models
+        key = cache_key(prompt, llm_string)
+        _track(key)
+        value = json.dumps([message_to_dict(m) for m in messages])
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        expired = self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.max_age,)).rowcount
+        overflow = self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + overflow
+
+    def discard(self, keys):
+        with self._lock:
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = SQLiteLLMCache()
+    return _cache
+
+
+def _track(key):
+    keys = _tracked.get()
+    if keys is not None:
+        keys.append(key)
+
+
+@contextmanager
+def track_keys():
+    """Collect the cache keys the model calls inside this block look up or store."""
+    keys = []
+    token = _tracked.set(keys)
+    try:
+        yield keys
+    finally:
+        _tracked.reset(token)
+
+
+def forget(keys):
+    """Drop the answers stored under `keys` (from `track_keys`), so the next call asks the model again."""
+    if _cache is not None and keys:
+        _cache.discard(keys)
+
+
+def cached(model, allow_nonzero_temperature=False):
+    """Return a copy of `model` that reads and writes the shared disk cache.
+
+    Models sampling with a nonzero temperature are returned untouched unless
+    the node opts in with `allow_nonzero_temperature=True`.
+    """
+    if not LLM_CACHE_ENABLED:
+        return model
+    if getattr(model, "temperature", None) and not allow_nonzero_temperature:
+        return model
+    return model.model_copy(update={"cache": get_cache()})
+
+
+def cache_stats():
+    return get_cache().stats() if _cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0, "evictions": 0, "entries": 0}
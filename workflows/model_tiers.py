@@ -0,0 +1,193 @@
+"""Per-node model tiers: small models for the trivial calls, larger ones for long-form text.
+
+The config names the tiers (a model each), the order to escalate in, the
+list price of every model, and for each node (`<module>.<node>`) its tier
+and an output-token cap. It comes from `MODEL_TIERS_CONFIG` (a JSON file or
+JSON text) or `DEFAULT_CONFIG`, which sends the yes/no conflict check, the
+router and the title to `gpt-4.1-nano` with caps of a few tokens, and keeps
+the long-form nodes on `gpt-4.1-mini`.
+
+- `node_model(node, model, **settings)` is the chat model of a node: its
+  tier's model with its cap, or `model` if the node is not in the config.
+- `structured_model(node, schema, model, **settings)` is
+  `with_structured_output(schema)` on the node's tier that retries on the
+  next tier up when the output does not parse or validate (e.g. it was cut
+  off by the cap). The cap only applies to the node's own tier, and a
+  rejected answer is dropped from the LLM cache again.
+- `call_cost(model, prompt_tokens, completion_tokens)` prices a call;
+  `tier_stats()` counts structured calls and escalations per node.
+
+`MODEL_TIERS=0` gives every node the model its module asks for, i.e. the
+single-model baseline (`run_benchmarks.py --tiers-baseline` compares both).
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+
+MODEL_TIERS_ENABLED = os.getenv("MODEL_TIERS", "1") == "1"
+
+DEFAULT_CONFIG = {
+    "tiers": {"small": "gpt-4.1-nano", "medium": "gpt-4.1-mini", "large": "gpt-4.1"},
+    "escalation": ["small", "medium", "large"],
+    # USD per 1M (input, output) tokens
+    "prices": {
+        "gpt-4.1-nano": [0.10, 0.40],
+        "gpt-4.1-mini": [0.40, 1.60],
+        "gpt-4.1": [2.00, 8.00],
+        "gpt-5-nano": [0.05, 0.40],
+    },
+    "nodes": {
+        "promptChaining.generate_story": {"tier": "small", "max_tokens": 300},
+        "promptChaining.check_conflict": {"tier": "small", "max_tokens": 5},
+        "promptChaining.improve_story": {"tier": "medium", "max_tokens": 1500},
+        "promptChaining.critique_and_revise": {"tier": "medium", "max_tokens": 2000},
+        "promptChaining.finalize_story": {"tier": "medium", "max_tokens": 2500},
+        "routing.decide_router": {"tier": "small", "max_tokens": 20},
+        "routing.generate": {"tier": "medium", "max_tokens": 1500},
+        "parallelization.title_generator": {"tier": "small", "max_tokens": 24},
+        "parallelization.generate_story_premise": {"tier": "small", "max_tokens": 300},
+        "parallelization.generate_story_setting": {"tier": "small", "max_tokens": 300},
+        "parallelization.generate_charachters": {"tier": "small", "max_tokens": 400},
+        "parallelization.finalize_story": {"tier": "medium", "max_tokens": 2500},
+        "orchestrator_worker.orchestrator": {"tier": "small", "max_tokens": 800},
+        "orchestrator_worker.llm_call": {"tier": "medium", "max_tokens": 2000},
+    },
+}
+
+
+def load_config():
+    source = os.getenv("MODEL_TIERS_CONFIG")
+    if not source:
+        return DEFAULT_CONFIG
+    if os.path.exists(source):
+        with open(source, encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(source)
+
+
+_config = None
+_lock = threading.Lock()
+_structured_calls = defaultdict(int)
+_escalations = defaultdict(int)
+
+
+def get_config():
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+
+def node_tiers(node):
+    """[(tier, model, max_tokens)] to try for `node`, its own tier first; [] if it is not tiered."""
+    config = get_config()
+    entry = config["nodes"].get(node) if MODEL_TIERS_ENABLED and node else None
+    if entry is None:
+        return []
+    ladder = config.get("escalation") or [entry["tier"]]
+    higher = ladder[ladder.index(entry["tier"]) + 1:] if entry["tier"] in ladder else []
+    return [(entry["tier"], config["tiers"][entry["tier"]], entry.get("max_tokens"))] + [
+        (tier, config["tiers"][tier], None) for tier in higher]
+
+
+def _models(node, model, settings):
+    from .models import chat_model
+    tiers = node_tiers(node)
+    if not tiers:
+        return [(None, chat_model(model=model, **settings))]
+    return [(tier, chat_model(model=name, **settings, **({"max_tokens": cap} if cap else {})))
+            for tier, name, cap in tiers]
+
+
+def invalid_output(error):
+    """Whether `error` means the model answered, but not with a valid instance of the schema."""
+    from langchain_core.exceptions import OutputParserException
+    from pydantic import ValidationError
+    # the OpenAI client raises these for an answer cut off by max_tokens or filtered
+    return isinstance(error, (OutputParserException, ValidationError)) or type(error).__name__ in (
+        "LengthFinishReasonError", "ContentFilterFinishReasonError")
+
+
+def node_model(node, model="gpt-4.1-mini", **settings):
+    """The chat model for `node`: its tier's model and cap, or `model` with `settings` when untiered."""
+    return _models(node, model, settings)[0][1]
+
+
+def structured_model(node, schema, model="gpt-4.1-mini", wrap=None, **settings):
+    """Structured output for `node` that escalates a tier whenever the output fails to validate.
+
+    `wrap(chat_model)` is applied to each tier's model first (e.g. `cached`).
+    """
+    from langchain_core.exceptions import OutputParserException
+    from langchain_core.runnables import RunnableLambda
+    from .llm_cache import forget, track_keys
+    ladder = [(tier, (wrap(llm) if wrap else llm).with_structured_output(schema, include_raw=True))
+              for tier, llm in _models(node, model, settings)]
+
+    def accept(tier, result, last, keys):
+        failed = result is None or result["parsed"] is None
+        record_structured_call(node, escalated=failed and not last)
+        if not failed:
+            return result["parsed"]
+        # a cached answer that failed would fail, and escalate, on every later run too
+        forget(keys)
+        if last:
+            error = result["parsing_error"] if result is not None else None
+            raise error or OutputParserException(f"{node}: no valid {schema.__name__} from tier {tier}")
+        return None
+
+    def invoke(value, config=None):
+        for i, (tier, runnable) in enumerate(ladder):
+            last = i == len(ladder) - 1
+            with track_keys() as keys:
+                try:
+                    result = runnable.invoke(value, config)
+                except Exception as e:
+                    if last or not invalid_output(e):
+                        raise
+                    result = None
+            parsed = accept(tier, result, last, keys)
+            if parsed is not None:
+                return parsed
+
+    async def ainvoke(value, config=None):
+        for i, (tier, runnable) in enumerate(ladder):
+            last = i == len(ladder) - 1
+            with track_keys() as keys:
+                try:
+                    result = await runnable.ainvoke(value, config)
+                except Exception as e:
+                    if last or not invalid_output(e):
+                        raise
+                    result = None
+            parsed = accept(tier, result, last, keys)
+            if parsed is not None:
+                return parsed
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=f"{node or schema.__name__}_structured")
+
+
+def record_structured_call(node, escalated=False):
+    """Count a structured call of `node`; `escalated` if its output was rejected and asked of a larger tier."""
+    with _lock:
+        _structured_calls[node] += 1
+        if escalated:
+            _escalations[node] += 1
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    """List price in USD of a call (0 for a model without a price)."""
+    input_price, output_price = get_config().get("prices", {}).get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+def tier_stats():
+    with _lock:
+        calls, escalations = dict(_structured_calls), dict(_escalations)
+    return {
+        "enabled": MODEL_TIERS_ENABLED,
+        "structured_calls": calls,
+        "escalations": escalations,
+        "escalations_total": sum(escalations.values()),
+    }
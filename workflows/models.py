@@ -0,0 +1,66 @@
+"""Chat model registry shared by every graph in the process.
+
+`chat_model(model, **settings)` returns one client per (backend, model,
+settings), so all graphs asking for the same model share it instead of each
+module, or each call, building its own. OpenAI clients send their requests
+through the shared keep-alive connection pool of their endpoint (see
+http_pool.py); `pool_stats()` reports its utilization and connection-setup
+time.
+
+`LLM_BACKEND=openai` (default) returns `ChatOpenAI`; `LLM_BACKEND=fake`
+returns the deterministic local `FakeChatModel` (see fake_llm.py), so every
+graph can run and be benchmarked without an API key. Either way the class is
+wrapped by rate_limit.py, so every call shares the request / token budgets of
+its model and is retried on rate limits (`rate_limit_stats()`).
+"""
+import json
+import os
+import sys
+import threading
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+_lock = threading.Lock()
+_models = {}      # (backend, model, settings) -> chat model
+
+
+def _settings_key(settings):
+    return tuple(sorted((k, json.dumps(v, sort_keys=True, default=repr)) for k, v in settings.items()))
+
+
+def chat_model(model="gpt-4.1-mini", **kwargs):
+    """The process-wide chat model for `model` with these settings."""
+    model = kwargs.pop("model_name", model)
+    key = (LLM_BACKEND, model, _settings_key(kwargs))
+    with _lock:
+        if key in _models:
+            return _models[key]
+    from .rate_limit import RATE_LIMIT_ENABLED, rate_limited
+    wrap = rate_limited if RATE_LIMIT_ENABLED else (lambda cls: cls)
+    if LLM_BACKEND == "fake":
+        from .fake_llm import FakeChatModel
+        instance = wrap(FakeChatModel).from_env(model_name=model, **kwargs)
+    else:
+        from langchain_openai import ChatOpenAI
+        from .http_pool import get_endpoint
+        base_url = kwargs.pop("base_url", None) or os.getenv("OPENAI_BASE_URL") or DEFAULT_BASE_URL
+        endpoint = get_endpoint(base_url)
+        if RATE_LIMIT_ENABLED:
+            kwargs.setdefault("max_retries", 0)   # the limiter retries, so retries are throttled too
+        instance = wrap(ChatOpenAI)(model=model, base_url=base_url, http_client=endpoint.client,
+                                    http_async_client=endpoint.async_client, **kwargs)
+    with _lock:
+        return _models.setdefault(key, instance)
+
+
+def rate_limit_stats():
+    """Queue depth, throttle time and current limits per model (empty before the first call)."""
+    module = sys.modules.get(f"{__package__}.rate_limit")
+    return module.rate_limit_stats() if module is not None else {}
+
+
+def pool_stats():
+    """Connection pool metrics per endpoint (empty until an OpenAI model is created)."""
+    module = sys.modules.get(f"{__package__}.http_pool")
+    return module.pool_stats() if module is not None else {}
@@ -1,21 +1,49 @@
-from typing_extensions import TypedDict, Literal
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from fpdf import FPDF
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
+import json
 import os
 import re
+import time
+import asyncio
 import operator
-from langgraph.constants import Send
-from typing import Annotated
+import weakref
+from functools import lru_cache
+from typing import Annotated, TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.9)
+# the model client, langgraph and langchain are only imported once a graph is built or run
+@lru_cache(maxsize=None)
+def get_llm(node=None):
+    from dotenv import load_dotenv
+    from .model_tiers import node_model
+    load_dotenv()
+    # sections are written on the tier model_tiers.py gives `llm_call`
+    return node_model(node and f"orchestrator_worker.{node}", model="gpt-4.1-mini", temperature=0.9)
+
+# --- Async worker settings ---
+# ASYNC_WORKERS=1 runs every llm_call worker with ainvoke on one event loop, so a
+# report takes roughly as long as its slowest section instead of the sum of them.
+ASYNC_WORKERS = os.getenv("ASYNC_WORKERS", "1") == "1"
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))   # in-flight calls per model/endpoint
+WORKER_TIMEOUT = float(os.getenv("WORKER_TIMEOUT", "120"))        # seconds per attempt
+WORKER_RETRIES = int(os.getenv("WORKER_RETRIES", "2"))            # extra attempts per section (see write_section)
+
+# --- Resumable runs ---
+# `--run-id ID` checkpoints the run in CHECKPOINT_DB under thread ID. Each section is saved
+# as soon as its worker finishes, so after a crash, or a section that kept failing, `--resume ID`
+# runs only the sections that are missing; the plan and the finished sections are not redone.
+# Finished sections also go to the section store (section_store.py) and are reused by any later
+# run whose plan has a section with the same name and description.
+
+# --- Pipelined planning ---
+# PIPELINED_PLANNER=1 (async workers only) streams the plan and starts writing each section as soon
+# as the planner has moved on to the next one, so section 1 is written while sections 2..N are still
+# being planned. Each section still gets its llm_call worker through a Send, in plan order; the
+# worker just collects the section that was started for it, so the reducers see the same writes.
+PIPELINED_PLANNER = os.getenv("PIPELINED_PLANNER", "1") == "1"
+PLANNER_NODE = "orchestrator_worker.orchestrator"
 
 class Section(BaseModel):
     name:str = Field(..., description="Name of the section")
@@ -28,47 +56,280 @@ class State(TypedDict):
     topic: str
     sections: list[Section]
     completed_sections: Annotated[list, operator.add]
+    section_runs: Annotated[list, operator.add]
     final_report: str
+    prefetch: str          # key of the sections the pipelined planner already started
 
 class WorkerState(TypedDict):
     section: Section
+    index: int
     completed_sections: Annotated[list, operator.add] 
     random_value: Annotated[list, operator.add]
+    section_runs: Annotated[list, operator.add]
+    prefetch: str
+
 
+@lru_cache(maxsize=None)
+def get_planner():
+    from dotenv import load_dotenv
+    from .llm_cache import cached
+    from .model_tiers import structured_model
+    load_dotenv()
+    # rerunning a topic reuses its plan from the disk cache; a plan that does not validate
+    # (e.g. cut off by the small tier's cap) is asked again of the next tier up
+    return structured_model(PLANNER_NODE, Sections, model="gpt-4.1-mini", temperature=0.9,
+                            wrap=lambda llm: cached(llm, allow_nonzero_temperature=True))
 
-planner = llm.with_structured_output(Sections)
+def planner_messages(topic: str):
+    from .prompts import prompt
+    return prompt("report_plan", topic=topic)
 
 def orchestrator(state: State):
-    report_sections = planner.invoke([
-        SystemMessage(content="You are a document planner that breaks down a topic into sections for a detailed report creation"),
-        HumanMessage(content=f"Create a list of sections for a document about: '{state['topic']}'. "
-                     "Each section should have a name and a brief description of its content.")]
-    )
+    from .rate_limit import call_priority
+    # report generation is batch work: interactive graphs' calls go first when the model is throttled
+    with call_priority("batch"):
+        report_sections = get_planner().invoke(planner_messages(state["topic"]))
     print(f"report sections: {report_sections.sections}")
     return {"sections": report_sections.sections, "completed_sections": []}
 
-def llm_call(state: WorkerState):
+def plan_cache_key(llm, messages):
+    # streamed calls bypass the model's cache, so the streamed plan is cached under its own key
+    return json.dumps([m.content for m in messages]), f"streamed-plan\0{model_key(llm)}\0{llm.temperature}"
+
+async def astream_plan(topic: str):
+    """Yield the sections of a new plan one by one, each as soon as the planner has moved past it.
+
+    Raises OutputParserException when the plan is cut off or does not validate.
+    """
+    from langchain_core.exceptions import OutputParserException
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration
+    from langchain_core.utils.json import parse_partial_json
+    from .llm_cache import LLM_CACHE_ENABLED, get_cache
+    from pydantic import ValidationError
+    llm, messages = get_llm("orchestrator"), planner_messages(topic)
+    key = plan_cache_key(llm, messages)
+    hit = get_cache().lookup(*key) if LLM_CACHE_ENABLED else None
+    if hit:
+        for section in Sections.model_validate_json(hit[0].message.content).sections:
+            yield section
+        return
+    text, finish_reason, done = "", None, 0
+    try:
+        async for chunk in llm.bind_tools([Sections], tool_choice="Sections").astream(messages):
+            text += "".join(part.get("args") or "" for part in chunk.tool_call_chunks)
+            finish_reason = chunk.response_metadata.get("finish_reason") or finish_reason
+            partial = parse_partial_json(text) if text else None
+            started = partial.get("sections") or [] if isinstance(partial, dict) else []
+            # a section is complete once the next one has begun
+            while len(started) > done + 1:
+                yield Section.model_validate(started[done])
+                done += 1
+        if finish_reason == "length":
+            raise OutputParserException("the plan was cut off at max_tokens")
+        plan = Sections.model_validate_json(text)
+    except ValidationError as e:
+        raise OutputParserException(f"invalid plan: {e}") from e
+    if LLM_CACHE_ENABLED:
+        get_cache().update(*key, [ChatGeneration(message=AIMessage(content=plan.model_dump_json()))])
+    for section in plan.sections[done:]:
+        yield section
+
+_prefetched = {}   # prefetch key -> {section index: task writing that section}
+
+async def cancel(task):
+    task.cancel()
+    # wait for it to take its partial text back out of the sink
+    await asyncio.gather(task, return_exceptions=True)
+
+async def aorchestrator(state: State, config: "RunnableConfig"):
+    """Stream the plan and start writing each section while the rest is still being planned."""
+    import uuid
+    from langchain_core.exceptions import OutputParserException
+    from .model_tiers import record_structured_call
+    from .rate_limit import call_priority
+    token = uuid.uuid4().hex
+    tasks = _prefetched[token] = {}
+    sections = []
+
+    def dispatch(index, section):
+        tasks[index] = asyncio.create_task(prefetch_section({"section": section, "index": index}, config))
+
+    try:
+        with call_priority("batch"):
+            try:
+                async for section in astream_plan(state["topic"]):
+                    dispatch(len(sections), section)
+                    sections.append(section)
+                record_structured_call(PLANNER_NODE)
+            except OutputParserException:
+                record_structured_call(PLANNER_NODE, escalated=True)
+                # the escalating planner makes a whole new plan; sections it plans the same keep their writer
+                plan = (await get_planner().ainvoke(planner_messages(state["topic"]))).sections
+                for index, section in enumerate(plan):
+                    if index < len(sections) and sections[index] == section:
+                        continue
+                    if index in tasks:
+                        await cancel(tasks[index])
+                    dispatch(index, section)
+                for index in range(len(plan), len(sections)):
+                    await cancel(tasks.pop(index))
+                sections = plan
+    except BaseException:
+        for task in _prefetched.pop(token).values():
+            task.cancel()
+        raise
+    print(f"report sections: {sections}")
+    return {"sections": sections, "completed_sections": [], "prefetch": token}
+
+def section_messages(section: Section):
+    from .prompts import prompt
+    # the long writing guidelines are the same for every section and go first, so providers serve them
+    # from their prompt cache; only the section's name and description differ
+    return prompt("report_section", name=section.name, description=section.description)
+
+def generate_section(state: WorkerState, config: "RunnableConfig", llm):
+    """Generate one section; with a sink its tokens go to disk/stdout as they arrive."""
+    from .output_sink import get_sink, stream_text
+    sink = get_sink(config)
+    if sink is None:
+        return llm.invoke(section_messages(state["section"])).content
+    return stream_text(llm, section_messages(state["section"]), sink, index=state["index"])
+
+def section_result(state: WorkerState, content: str, seconds: float = 0.0, reused: bool = False):
+    # the state gets the full text in streaming mode too; the sink only made it visible earlier
+    run = {"index": state["index"], "name": state["section"].name, "seconds": round(seconds, 3), "reused": reused}
+    return {"completed_sections": [content], "random_value": [len(content)], "section_runs": [run]}
+
+def model_key(llm):
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", ""))
+
+def stored_section(state: WorkerState, config: "RunnableConfig", llm):
+    """The section from an earlier run, if the store has it; it still goes through the sink."""
+    from .output_sink import get_sink
+    from .section_store import get_section_store
+    store = get_section_store()
+    section = state["section"]
+    row = store.get(section.name, section.description, model_key(llm)) if store is not None else None
+    if row is None:
+        return None
+    content, seconds = row
+    sink = get_sink(config)
+    if sink is not None:
+        sink.append(state["index"], content)
+        sink.finish_section(state["index"])
+    return section_result(state, content, seconds, reused=True)
+
+def store_section(state: WorkerState, llm, content: str, seconds: float):
+    from .section_store import get_section_store
+    store = get_section_store()
+    if store is not None:
+        store.put(state["section"].name, state["section"].description, content, seconds, model_key(llm))
+
+def resumable(config: "RunnableConfig"):
+    return bool((config or {}).get("configurable", {}).get("thread_id"))
+
+def llm_call(state: WorkerState, config: "RunnableConfig"):
+    from .rate_limit import call_priority
     print(state)
-    response = llm.invoke([
-        SystemMessage(content=(
-            "You are a professional technical writer tasked with drafting a well-structured, "
-            "insightful, and cohesive section of a larger report. "
-            "Your goal is to write a complete section based on the given section name and description. "
-            "Follow these guidelines:\n\n"
-            "1. Write in a clear, formal, and informative tone suitable for professional or academic reports.\n"
-            "2. Begin the section with a concise introductory sentence that directly relates to the section name.\n"
-            "3. Develop the section with detailed, logically organized paragraphs — avoid bullet points unless explicitly relevant.\n"
-            "4. Maintain consistency of style and flow, as this section will later be merged into a multi-section report.\n"
-            "5. Avoid repeating the section name or meta-descriptions — write as though this is part of the final report.\n"
-            "6. Ensure factual accuracy and coherence based on the provided description."
-        )),
-        HumanMessage(content=f"Section name: '{state['section'].name}'\n"
-                             f"Section description: '{state['section'].description}'")
-    ])
-    return {"completed_sections": [response.content], "random_value": [len(response.content)]}
+    llm = get_llm("llm_call")
+    reused = stored_section(state, config, llm)
+    if reused is not None:
+        return reused
+    started = time.perf_counter()
+    with call_priority("batch"):
+        content = generate_section(state, config, llm)
+    seconds = time.perf_counter() - started
+    store_section(state, llm, content, seconds)
+    return section_result(state, content, seconds)
+
+_semaphores = weakref.WeakKeyDictionary()   # event loop -> {(model, endpoint): semaphore}
+
+def model_semaphore(model):
+    """One semaphore per (event loop, model, endpoint) so every worker hitting the same endpoint shares the limit."""
+    per_loop = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    key = (getattr(model, "model_name", None), str(getattr(model, "openai_api_base", None)))
+    if key not in per_loop:
+        per_loop[key] = asyncio.Semaphore(WORKER_CONCURRENCY)
+    return per_loop[key]
+
+async def agenerate_section(state: WorkerState, config: "RunnableConfig", llm):
+    from .output_sink import get_sink, astream_text
+    sink = get_sink(config)
+    if sink is None:
+        return (await llm.ainvoke(section_messages(state["section"]))).content
+    # a failed or timed-out attempt takes its partial text back out of the sink
+    return await astream_text(llm, section_messages(state["section"]), sink, index=state["index"])
+
+async def write_section(state: WorkerState, config: "RunnableConfig"):
+    """Write a section, or take it from the store, retrying failed attempts.
+
+    Only failures the rate limiter did not already retry get another attempt here: timeouts
+    of the attempt and streams that broke midway. Returns (section result, None), or
+    (None, last error) once every attempt failed.
+    """
+    from .rate_limit import call_priority, limiter_attempts
+    section = state["section"]
+    llm = get_llm("llm_call")
+    reused = stored_section(state, config, llm)
+    if reused is not None:
+        return reused, None
+    last_error = None
+    for attempt in range(WORKER_RETRIES + 1):
+        try:
+            async with model_semaphore(llm):
+                started = time.perf_counter()
+                with call_priority("batch"):
+                    content = await asyncio.wait_for(agenerate_section(state, config, llm), WORKER_TIMEOUT)
+            seconds = time.perf_counter() - started
+            store_section(state, llm, content, seconds)
+            return section_result(state, content, seconds), None
+        except Exception as e:
+            # only this section is retried, its siblings keep running
+            last_error = e
+            print(f"Section '{section.name}' attempt {attempt + 1} failed: {e!r}")
+            if limiter_attempts(e):
+                break   # the limiter gave up on it already
+            if attempt < WORKER_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+    return None, last_error
+
+def prefetch_section(state: WorkerState, config: "RunnableConfig"):
+    """`write_section` started by the planner, as a child run of its own named `llm_call`.
+
+    Its model calls then count for the worker node in traces and in the `messages` stream
+    instead of for the orchestrator, whose config the planner would otherwise lend them.
+    """
+    from langchain_core.runnables import RunnableLambda
+    metadata = {**(config or {}).get("metadata", {}), "langgraph_node": "llm_call", "section_index": state["index"]}
+    return RunnableLambda(write_section, name="llm_call").ainvoke(state, {**config, "run_name": "llm_call", "metadata": metadata})
+
+async def allm_call(state: WorkerState, config: "RunnableConfig"):
+    from .output_sink import get_sink
+    section = state["section"]
+    tasks = _prefetched.get(state.get("prefetch"))
+    pending = tasks.pop(state["index"], None) if tasks is not None else None
+    if tasks == {}:
+        del _prefetched[state["prefetch"]]
+    # the pipelined planner usually started this section already; a resumed run writes it here
+    result, last_error = await (pending if pending is not None else write_section(state, config))
+    if result is not None:
+        return result
+    if resumable(config):
+        # pause instead of writing a placeholder; unlike an exception this lets the sibling sections
+        # finish and reach the checkpoint, and `--resume` runs this worker (only) again
+        from langgraph.types import interrupt
+        interrupt({"section": section.name, "index": state["index"], "error": repr(last_error)})
+    content = f"[Section '{section.name}' could not be generated: {last_error!r}]"
+    sink = get_sink(config)
+    if sink is not None:
+        sink.append(state["index"], content)
+        sink.finish_section(state["index"])
+    return section_result(state, content)
 
 def assign_workers(state: State):
-    return [Send("llm_call",{"section":s}) for s in state["sections"]]
+    from langgraph.types import Send
+    return [Send("llm_call",{"section":s, "index":i, "prefetch":state.get("prefetch", "")}) for i, s in enumerate(state["sections"])]
 
 def synthesizer(state:State):
     print(f"State in synthesizer: {state}")
@@ -77,36 +338,129 @@ def synthesizer(state:State):
     # print(f"Report: {completed_report_section}")
     return {"final_report":completed_report_section}
 
-def report_writer_txt(state: State):
-    safe_title = state["topic"][:50]
-    with open(f"{safe_title}.txt", "w", encoding="utf-8") as f:
-        f.write(state["topic"] + "\n\n")
-        f.write(state["final_report"])
-
-    print(f"Story saved as {safe_title}.txt")
-orchestrator_worker_builder = StateGraph(State)
-orchestrator_worker_builder.add_node("orchestrator",orchestrator)
-orchestrator_worker_builder.add_node("llm_call",llm_call)
-orchestrator_worker_builder.add_node("synthesizer",synthesizer)
-orchestrator_worker_builder.add_node("report_writer_txt",report_writer_txt)
+def safe_filename(name: str):
+    """`name` with path separators and other characters that are unsafe in file names replaced."""
+    return re.sub(r"[^\w\- .]", "_", name).strip(" .") or "report"
 
-orchestrator_worker_builder.add_edge(START,"orchestrator")
-orchestrator_worker_builder.add_conditional_edges("orchestrator",assign_workers,["llm_call"])
-orchestrator_worker_builder.add_edge("llm_call","synthesizer")
-orchestrator_worker_builder.add_edge("synthesizer","report_writer_txt")
-orchestrator_worker_builder.add_edge("report_writer_txt",END)
+def report_path(topic: str, config: "RunnableConfig" = None):
+    """The run's report file: `configurable.output` if set, else the first 50 characters of the topic."""
+    return (config or {}).get("configurable", {}).get("output") or f"{safe_filename(topic[:50])}.txt"
 
-app = orchestrator_worker_builder.compile()
-initial_state = {
-    "topic": "AI bubble and future of software engineers",
-    "sections": [],           
-    "completed_sections": [], 
-    "final_report": ""        
-}
-result_state = app.invoke(initial_state)
+def report_writer_txt(state: State, config: "RunnableConfig"):
+    from .output_sink import get_sink
+    path = report_path(state["topic"], config)
+    sink = get_sink(config)
+    if sink is not None:
+        sink.close()
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(state["topic"] + "\n\n")
+            f.write(state["final_report"])
+    print(f"Story saved as {path}")
 
+@lru_cache(maxsize=None)
+def build_graph(checkpointed: bool = False):
+    """Compile the report graph once per process; `checkpointed` runs need a thread_id (the run ID)."""
+    from langgraph.graph import StateGraph, START, END
+    orchestrator_worker_builder = StateGraph(State)
+    orchestrator_worker_builder.add_node("orchestrator",aorchestrator if ASYNC_WORKERS and PIPELINED_PLANNER else orchestrator)
+    orchestrator_worker_builder.add_node("llm_call",allm_call if ASYNC_WORKERS else llm_call, input_schema=WorkerState)
+    orchestrator_worker_builder.add_node("synthesizer",synthesizer)
+    orchestrator_worker_builder.add_node("report_writer_txt",report_writer_txt)
 
+    orchestrator_worker_builder.add_edge(START,"orchestrator")
+    orchestrator_worker_builder.add_conditional_edges("orchestrator",assign_workers,["llm_call"])
+    orchestrator_worker_builder.add_edge("llm_call","synthesizer")
+    orchestrator_worker_builder.add_edge("synthesizer","report_writer_txt")
+    orchestrator_worker_builder.add_edge("report_writer_txt",END)
+    if checkpointed:
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+        from .checkpointer import DeltaSqliteSaver
+        # the plan (Section objects) is part of the checkpoint
+        serde = JsonPlusSerializer(allowed_msgpack_modules=[(Section.__module__, "Section")])
+        return orchestrator_worker_builder.compile(checkpointer=DeltaSqliteSaver(serde=serde))
+    return orchestrator_worker_builder.compile()
 
+def restored_sections(app, config):
+    """Section results a checkpointed run already has, from workers that finished before it stopped."""
+    snapshot = app.get_state(config)
+    return [run for task in snapshot.tasks if task.name == "llm_call" and task.result
+            for run in task.result.get("section_runs", [])]
 
+def report_summary(state, restored=()):
+    """Sections generated, reused from the store and restored from the checkpoint, and the time saved."""
+    restored_indexes = {r["index"] for r in restored}
+    runs = [r for r in state.get("section_runs", []) if r["index"] not in restored_indexes]
+    reused = [r for r in runs if r["reused"]]
+    return {
+        "sections": len(state.get("sections", [])),
+        "generated": len(runs) - len(reused),
+        "reused_from_store": len(reused),
+        "restored_from_checkpoint": len(restored),
+        "time_saved_s": round(sum(r["seconds"] for r in reused + list(restored)), 3),
+    }
 
+def main():
+    import argparse
+    import uuid
+    from .llm_cache import cache_stats
+    from .output_sink import make_sink
+    from .tracing import trace_config, export_traces
+    parser = argparse.ArgumentParser(description="Plan a report, write its sections in parallel and merge them.")
+    parser.add_argument("--topic", default="AI bubble and future of software engineers")
+    parser.add_argument("--run-id", help="checkpoint the run under this ID (default: a new one)")
+    parser.add_argument("--resume", metavar="RUN_ID", help="finish a stopped run, generating only its missing sections")
+    parser.add_argument("--output", help="report file (default: the first 50 characters of the topic + .txt); "
+                                         "pass the same one with --resume")
+    args = parser.parse_args()
+    run_id = args.resume or args.run_id or uuid.uuid4().hex[:12]
+    app = build_graph(checkpointed=True)
+    run_config = {"configurable": {"thread_id": run_id}}
+    if args.output:
+        run_config["configurable"]["output"] = args.output
+    restored = []
+    if args.resume:
+        snapshot = app.get_state(run_config)
+        if not snapshot.values:
+            raise SystemExit(f"no report run '{run_id}' in the checkpoint database")
+        if not snapshot.next:
+            print(f"run '{run_id}' is already complete")
+            return
+        restored = restored_sections(app, run_config)
+        # sections restored from the checkpoint never reach a new sink, so the file is written from the state
+        partial = report_path(snapshot.values["topic"], run_config) + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        run_input = None
+    else:
+        initial_state = {
+            "topic": args.topic,
+            "sections": [],
+            "completed_sections": [],
+            "section_runs": [],
+            "final_report": ""
+        }
+        # STREAM_OUTPUT=file,stdout: section tokens reach '<title>.txt.partial' and the terminal as they
+        # are generated, in section order
+        sink = make_sink(report_path(args.topic, run_config), header=initial_state["topic"] + "\n\n",
+                         separator="\n\n---\n\n")
+        if sink is not None:
+            run_config["configurable"]["sink"] = sink
+        run_input = initial_state
+    print(f"run id: {run_id} (resume with --resume {run_id})")
+    # TRACE=1 records the planner, every llm_call worker and the synthesizer
+    run_config = trace_config(run_config)
+    if ASYNC_WORKERS:
+        result_state = asyncio.run(app.ainvoke(run_input, config=run_config))
+    else:
+        result_state = app.invoke(run_input, config=run_config)
+    print(f"sections: {report_summary(result_state, restored)}")
+    if "__interrupt__" in result_state:
+        for failed in result_state["__interrupt__"]:
+            print(f"section '{failed.value['section']}' failed: {failed.value['error']}")
+        print(f"run paused, the finished sections are saved; finish it with --resume {run_id}")
+    print(f"LLM cache: {cache_stats()}")
+    export_traces()
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Token-by-token output of the report and story workflows.
+
+Generation nodes stream their model response into the run's sink
+(`configurable.sink`) as the tokens arrive, and still return the full text
+into the graph state.
+
+- `StreamingSink` appends text to `<path>.partial`, so a long report is
+  readable on disk while it is still being generated, and renames it into
+  place atomically once the run is done.
+- `StdoutSink` prints the text as it arrives.
+- `TeeSink` forwards to several sinks.
+
+Sections may finish in any order; they are still written in section order,
+and only sections that are ahead of the one currently being written are held
+in memory. `STREAM_OUTPUT` picks the sinks the scripts use: `file`, `stdout`
+or `file,stdout` (`1` means `file`). HTTP clients of server.py get the same
+tokens as `token` events.
+"""
+import os
+import shutil
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+_targets = os.getenv("STREAM_OUTPUT", "0").strip().lower()
+STREAM_OUTPUT = () if _targets in ("", "0") else ("file",) if _targets == "1" else tuple(
+    t.strip() for t in _targets.split(",") if t.strip())
+
+
+class OrderedSink(ABC):
+    """Writes sections in index order as their chunks arrive; subclasses say where to."""
+
+    def __init__(self, separator=""):
+        self.separator = separator
+        self.first_output = None  # perf_counter() of the first text written out
+        self._lock = threading.Lock()
+        self._head = 0           # section allowed to write straight through
+        self._head_started = False
+        self._pending = {}       # section index -> buffered chunks
+        self._finished = set()
+
+    @abstractmethod
+    def _emit(self, text):
+        """Write `text` out."""
+
+    def _flush(self):
+        pass
+
+    def _mark(self):
+        """Remember where the head section starts, for `restart_section`."""
+
+    def _rewind(self):
+        """Drop what the head section has written so far."""
+
+    def _write(self, text):
+        if not self._head_started:
+            self._mark()
+            if self._head > 0:
+                self._emit(self.separator)
+            self._head_started = True
+        if self.first_output is None:
+            self.first_output = time.perf_counter()
+        self._emit(text)
+
+    def append(self, index, text):
+        """Add a chunk of text to section `index`."""
+        if not text:
+            return
+        with self._lock:
+            if index == self._head:
+                self._write(text)
+                self._flush()
+            else:
+                self._pending.setdefault(index, []).append(text)
+
+    def restart_section(self, index):
+        """Forget the text of section `index` so far, e.g. before a retry."""
+        with self._lock:
+            if index in self._finished:
+                return
+            self._pending.pop(index, None)
+            if index == self._head and self._head_started:
+                self._rewind()
+                self._head_started = False
+
+    def finish_section(self, index):
+        """Mark section `index` complete and flush every section now unblocked."""
+        with self._lock:
+            self._finished.add(index)
+            while self._head in self._finished:
+                self._head += 1
+                self._head_started = False
+                for chunk in self._pending.pop(self._head, []):
+                    self._write(chunk)
+            self._flush()
+
+    def _drain(self):
+        for index in sorted(self._pending):
+            self._head, self._head_started = index, False
+            for chunk in self._pending.pop(index):
+                self._write(chunk)
+
+
+class StreamingSink(OrderedSink):
+    def __init__(self, path, header="", separator=""):
+        super().__init__(separator)
+        self.path = path
+        self.partial_path = f"{path}.partial"
+        self._file = open(self.partial_path, "w", encoding="utf-8")
+        self._file.write(header)
+        self._section_start = 0
+
+    def _emit(self, text):
+        self._file.write(text)
+
+    def _flush(self):
+        self._file.flush()
+
+    def _mark(self):
+        self._section_start = self._file.tell()
+
+    def _rewind(self):
+        self._file.seek(self._section_start)
+        self._file.truncate()
+
+    def close(self, path=None, header=""):
+        """Write out anything still buffered and atomically move the file to `path`."""
+        path = path or self.path
+        with self._lock:
+            self._drain()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        source = self.partial_path
+        if header:
+            # the header (e.g. a title) was only known at the end: prepend it by copying
+            source = f"{path}.header.partial"
+            with open(source, "w", encoding="utf-8") as out, open(self.partial_path, encoding="utf-8") as body:
+                out.write(header)
+                shutil.copyfileobj(body, out)
+                out.flush()
+                os.fsync(out.fileno())
+            os.remove(self.partial_path)
+        os.replace(source, path)
+        return path
+
+
+class StdoutSink(OrderedSink):
+    def __init__(self, stream=None, separator="\n\n"):
+        super().__init__(separator)
+        self.stream = stream or sys.stdout
+
+    def _emit(self, text):
+        self.stream.write(text)
+
+    def _flush(self):
+        self.stream.flush()
+
+    def _rewind(self):
+        # printed text cannot be taken back
+        self.stream.write("\n[retrying section]\n")
+
+    def close(self, path=None, header=""):
+        with self._lock:
+            self._drain()
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+class TeeSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    @property
+    def first_output(self):
+        return min((s.first_output for s in self.sinks if s.first_output is not None), default=None)
+
+    def append(self, index, text):
+        for sink in self.sinks:
+            sink.append(index, text)
+
+    def restart_section(self, index):
+        for sink in self.sinks:
+            sink.restart_section(index)
+
+    def finish_section(self, index):
+        for sink in self.sinks:
+            sink.finish_section(index)
+
+    def close(self, path=None, header=""):
+        results = [sink.close(path, header) for sink in self.sinks]
+        return next((r for r in results if r is not None), None)
+
+
+def make_sink(path, header="", separator="", targets=STREAM_OUTPUT):
+    """The sink for `targets` (default: `STREAM_OUTPUT`), or None when output is not streamed."""
+    sinks = []
+    if "file" in targets:
+        sinks.append(StreamingSink(path, header=header, separator=separator))
+    if "stdout" in targets:
+        sinks.append(StdoutSink(separator=separator or "\n\n"))
+    if not sinks:
+        return None
+    return sinks[0] if len(sinks) == 1 else TeeSink(*sinks)
+
+
+def get_sink(config):
+    """The sink a run was started with, if any (passed as `configurable.sink`)."""
+    return (config or {}).get("configurable", {}).get("sink")
+
+
+def stream_text(model, prompt, sink, index=0):
+    """Stream a model response into `sink` chunk by chunk and return the full text."""
+    parts = []
+    try:
+        for chunk in model.stream(prompt):
+            sink.append(index, chunk.content)
+            parts.append(chunk.content)
+    except BaseException:
+        sink.restart_section(index)
+        raise
+    sink.finish_section(index)
+    return "".join(parts)
+
+
+async def astream_text(model, prompt, sink, index=0):
+    """`stream_text` for async nodes. A failed attempt leaves none of its text in the sink."""
+    parts = []
+    try:
+        async for chunk in model.astream(prompt):
+            sink.append(index, chunk.content)
+            parts.append(chunk.content)
+    except BaseException:
+        sink.restart_section(index)
+        raise
+    sink.finish_section(index)
+    return "".join(parts)
@@ -1,19 +1,20 @@
 from typing_extensions import TypedDict
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from fpdf import FPDF
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from typing import TYPE_CHECKING
+from functools import lru_cache
 import os
 import re
 
-# Load environment
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.4)
+# Initialize LLM on first use (loads .env and builds the client)
+@lru_cache(maxsize=None)
+def get_llm(node=None):
+    from dotenv import load_dotenv
+    from .model_tiers import node_model
+    load_dotenv()
+    # title, premise, setting and characters run on the small tier (model_tiers.py)
+    return node_model(node and f"parallelization.{node}", model="gpt-4.1-mini", temperature=0.4)
 
 class State(TypedDict):
     topic: str
@@ -24,26 +25,35 @@ class State(TypedDict):
     story_title: str
 
 def title_generator(state: State):
-    msg = llm.invoke(f"Generate a catchy title for a story on the topic '{state['topic']}' story premise '{state['story_premise']}' and story setting '{state['story_setting']}' Return only the title, nothing else.")
+    from .prompts import prompt
+    msg = get_llm("title_generator").invoke(prompt("story_title", topic=state["topic"], premise=state["story_premise"],
+                                                   setting=state["story_setting"]))
     return {"story_title": msg.content}
 
 def generate_story_premise(state: State):
-    msg = llm.invoke(f"Write one story premise on the topic '{state['topic']}''.")
+    from .prompts import prompt
+    msg = get_llm("generate_story_premise").invoke(prompt("story_premise", topic=state["topic"]))
     return {"story_premise": msg.content}
 
 def generate_story_setting(state: State):
-    msg = llm.invoke(f"Generate an interesting setting for the story topic: '{state['topic']}'")
+    from .prompts import prompt
+    msg = get_llm("generate_story_setting").invoke(prompt("story_setting", topic=state["topic"]))
     return {"story_setting": msg.content}
 
 def generate_charachters(state: State):
-    msg = llm.invoke(f"Create main charachters for the story topic: '{state['topic']}'")
+    from .prompts import prompt
+    msg = get_llm("generate_charachters").invoke(prompt("story_characters", topic=state["topic"]))
     return {"charachters": msg.content}
 
-def finalize_story(state: State):
-    msg = llm.invoke(
-        f"Using the story premise: '{state['story_premise']}', setting: '{state['story_setting']}', "
-        f"and charachters: '{state['charachters']}', write a complete engaging story in hinglish."
-    )
+def finalize_story(state: State, config: "RunnableConfig"):
+    from .output_sink import get_sink, stream_text
+    from .prompts import prompt
+    messages = prompt("story_hinglish", premise=state["story_premise"], setting=state["story_setting"],
+                      characters=state["charachters"])
+    sink = get_sink(config)
+    if sink is not None:
+        return {"final_Story": stream_text(get_llm("finalize_story"), messages, sink)}
+    msg = get_llm("finalize_story").invoke(messages)
     return {"final_Story": msg.content}
 
 # ---- NEW MERGE NODE ----
@@ -52,38 +62,84 @@ def merge_story_elements(state: State):
     return {
         "story_premise": state.get("story_premise", ""),
         "story_setting": state.get("story_setting", ""),
-        "characters": state.get("characters", "")
+        "charachters": state.get("charachters", "")
     }
 
-def story_writer_txt(state: State):
+def story_writer_txt(state: State, config: "RunnableConfig"):
+    from .output_sink import get_sink
     safe_title = re.sub(r'[\\/*?:"<>|\n]', "", state["story_title"]).strip()
     if len(safe_title) > 100:
         safe_title = safe_title[:100]
-    with open(f"{safe_title}.txt", "w", encoding="utf-8") as f:
+    # a caller-chosen file (`configurable.output`, e.g. the server's per-run file) wins
+    path = (config or {}).get("configurable", {}).get("output") or f"{safe_title}.txt"
+    sink = get_sink(config)
+    if sink is not None:
+        # the story was streamed to disk already, the title is only known now
+        sink.close(path, header=state["story_title"] + "\n\n")
+        print(f"Story saved as {path}")
+        return
+    with open(path, "w", encoding="utf-8") as f:
         f.write(state["story_title"] + "\n\n")
         f.write(state["final_Story"])
 
-    print(f"Story saved as {safe_title}.txt")
-
-graph = StateGraph(State)
-graph.add_node("generate_story_premise", generate_story_premise)
-graph.add_node("generate_story_setting", generate_story_setting)
-graph.add_node("generate_charachters", generate_charachters)
-graph.add_node("merge_story_elements", merge_story_elements)
-graph.add_node("title_generator", title_generator)
-graph.add_node("finalize_story", finalize_story)
-graph.add_node("story_writer_txt", story_writer_txt)
-
-graph.add_edge(START, "generate_story_premise")
-graph.add_edge(START, "generate_story_setting")
-graph.add_edge(START, "generate_charachters")
-graph.add_edge("generate_story_premise", "merge_story_elements")
-graph.add_edge("generate_story_setting", "merge_story_elements")
-graph.add_edge("generate_charachters", "merge_story_elements")
-graph.add_edge("merge_story_elements", "finalize_story")
-graph.add_edge("finalize_story", "title_generator")
-graph.add_edge("title_generator", "story_writer_txt")
-graph.add_edge("story_writer_txt", END)
-
-app = graph.compile()
-app.invoke({"topic":"A comedy story about guest arrival"})
+    print(f"Story saved as {path}")
+
+# "planned" runs the graph wired by its data dependencies (graph_deps.py): the
+# title is generated next to the final story instead of after it, and the
+# pass-through merge node is skipped; "declared" runs the edges below as written
+STORY_SCHEDULE = os.getenv("STORY_SCHEDULE", "planned")
+
+def story_builder():
+    """The story graph as declared, not compiled."""
+    from langgraph.graph import StateGraph, START, END
+    graph = StateGraph(State)
+    graph.add_node("generate_story_premise", generate_story_premise)
+    graph.add_node("generate_story_setting", generate_story_setting)
+    graph.add_node("generate_charachters", generate_charachters)
+    graph.add_node("merge_story_elements", merge_story_elements)
+    graph.add_node("title_generator", title_generator)
+    graph.add_node("finalize_story", finalize_story)
+    graph.add_node("story_writer_txt", story_writer_txt)
+
+    graph.add_edge(START, "generate_story_premise")
+    graph.add_edge(START, "generate_story_setting")
+    graph.add_edge(START, "generate_charachters")
+    graph.add_edge("generate_story_premise", "merge_story_elements")
+    graph.add_edge("generate_story_setting", "merge_story_elements")
+    graph.add_edge("generate_charachters", "merge_story_elements")
+    graph.add_edge("merge_story_elements", "finalize_story")
+    graph.add_edge("finalize_story", "title_generator")
+    graph.add_edge("title_generator", "story_writer_txt")
+    graph.add_edge("story_writer_txt", END)
+    return graph
+
+@lru_cache(maxsize=None)
+def build_graph():
+    """Compile the story graph once per process."""
+    graph = story_builder()
+    if STORY_SCHEDULE == "planned":
+        from .graph_deps import rewire
+        graph = rewire(graph)
+    return graph.compile()
+
+def main():
+    import argparse
+    from .output_sink import make_sink
+    from .tracing import trace_config, export_traces
+    parser = argparse.ArgumentParser(description="Write a story from parallel premise, setting and characters calls.")
+    parser.add_argument("--plan", action="store_true", help="print read/write sets and critical paths instead of running")
+    parser.add_argument("--durations", help="node durations from a trace JSONL export, to weight the critical path")
+    args = parser.parse_args()
+    if args.plan:
+        from .graph_deps import analyze, load_durations
+        print(analyze(story_builder(), load_durations(args.durations) if args.durations else None).report())
+        return
+    topic = "A comedy story about guest arrival"
+    sink = make_sink(re.sub(r'[\\/*?:"<>|\n]', "", topic)[:100] + ".txt")
+    run_config = {"configurable": {"sink": sink}} if sink is not None else {}
+    # TRACE=1 records every node; the fan-out of step 1 shows up as parallel rows in the Chrome trace
+    build_graph().invoke({"topic": topic}, config=trace_config(run_config))
+    export_traces()
+
+if __name__ == "__main__":
+    main()
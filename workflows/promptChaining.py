@@ -1,17 +1,46 @@
 from typing_extensions import TypedDict
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from pydantic import BaseModel, Field
+from functools import lru_cache
+from typing import TYPE_CHECKING
 import os
+import re
+import difflib
 
-# Load environment
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.4)
+# Initialize LLM on first use (loads .env and builds the client)
+@lru_cache(maxsize=None)
+def get_llm(node=None):
+    from dotenv import load_dotenv
+    from .model_tiers import node_model
+    load_dotenv()
+    # the premise and the yes/no check run on the small tier, the rewrites on gpt-4.1-mini (model_tiers.py)
+    return node_model(node and f"promptChaining.{node}", model="gpt-4.1-mini", temperature=0.4)
+
+@lru_cache(maxsize=None)
+def get_conflict_llm():
+    from .llm_cache import cached
+    # the yes/no conflict check is re-asked for the same story on every rerun
+    return cached(get_llm("check_conflict"), allow_nonzero_temperature=True)
+
+# "single": one structured call per round returns the verdict and the revision
+# "legacy": check_conflict + improve_story, two calls per round
+REVISE_MODE = os.getenv("REVISE_MODE", "single")
+MAX_REVISION_ROUNDS = int(os.getenv("MAX_REVISION_ROUNDS", "3"))
+# stop once a revision is at least this similar (0..1) to the text it revised
+CONVERGENCE_SIMILARITY = float(os.getenv("CONVERGENCE_SIMILARITY", "0.95"))
+
+class Revision(BaseModel):
+    has_conflicts: bool = Field(..., description="Whether the story has any conflicts or plot holes")
+    revised_story: str = Field(..., description="The story with the conflicts and plot holes fixed, or the unchanged story if it had none")
+
+@lru_cache(maxsize=None)
+def get_reviser():
+    from dotenv import load_dotenv
+    from .model_tiers import structured_model
+    load_dotenv()
+    return structured_model("promptChaining.critique_and_revise", Revision, model="gpt-4.1-mini", temperature=0.4)
 
 # Define the state
 class State(TypedDict):
@@ -19,18 +48,38 @@ class State(TypedDict):
     story: str
     improved_story: str
     final_story: str
+    rounds: int
+    converged: bool
+
+def call_counter():
+    """A callback handler that counts chat model calls made during a run."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class CallCounter(BaseCallbackHandler):
+        def __init__(self):
+            self.calls = 0
+
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            self.calls += 1
+
+    return CallCounter()
+
+def similarity(a: str, b: str):
+    return difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
 
 # Node: generate story
 def generate_story(state: State):
-    msg = llm.invoke(f"Write one story premise on the topic '{state['topic']}'.")
-    return {"story": msg.content}
+    from .prompts import prompt
+    msg = get_llm("generate_story").invoke(prompt("story_premise", topic=state["topic"]))
+    return {"story": msg.content, "rounds": 0}
 
 # Conditional function (NOT a node)
 def check_conflict(state: State):
-    msg = llm.invoke(
-        f"Does the following story have any conflicts or plot holes? "
-        f"Story: {state['story']}. Answer with 'yes' or 'no'."
-    )
+    if state.get("rounds", 0) >= MAX_REVISION_ROUNDS:
+        return "Pass"
+    from .prompts import prompt
+    text = state.get("improved_story") or state["story"]
+    msg = get_conflict_llm().invoke(prompt("story_conflict_check", story=text))
     if "yes" in msg.content.lower():
         return "Fail"
     else:
@@ -38,40 +87,98 @@ def check_conflict(state: State):
 
 # Node: improve story
 def improve_story(state: State):
-    msg = llm.invoke(f"Improve the following story by fixing any conflicts or plot holes: {state['story']}")
-    return {"improved_story": msg.content}
+    from .prompts import prompt
+    text = state.get("improved_story") or state["story"]
+    msg = get_llm("improve_story").invoke(prompt("story_improve", story=text))
+    return {"improved_story": msg.content, "rounds": state.get("rounds", 0) + 1}
+
+# Node: critique and revise in one call
+def critique_and_revise(state: State):
+    from .prompts import prompt
+    text = state.get("improved_story") or state["story"]
+    result = get_reviser().invoke(prompt("story_revise", story=text))
+    rounds = state.get("rounds", 0) + 1
+    converged = (
+        not result.has_conflicts
+        or rounds >= MAX_REVISION_ROUNDS
+        or similarity(text, result.revised_story) >= CONVERGENCE_SIMILARITY
+    )
+    return {"improved_story": result.revised_story, "rounds": rounds, "converged": converged}
+
+def revision_done(state: State):
+    return "finalize_story" if state["converged"] else "critique_and_revise"
 
 # Node: finalize story
-def finalize_story(state: State):
-    text = state.get("improved_story", state["story"])
-    msg = llm.invoke(f"Make the following story more engaging and interesting: {text}")
+def finalize_story(state: State, config: "RunnableConfig"):
+    from .output_sink import get_sink, stream_text
+    from .prompts import prompt
+    text = state.get("improved_story") or state["story"]
+    messages = prompt("story_finalize", story=text)
+    sink = get_sink(config)
+    if sink is not None:
+        # the final story is the long one: its tokens reach the sink as they are generated
+        final_story = stream_text(get_llm("finalize_story"), messages, sink)
+        sink.close()
+        return {"final_story": final_story}
+    msg = get_llm("finalize_story").invoke(messages)
     return {"final_story": msg.content}
 
 # Build the graph
-graph = StateGraph(State)
+@lru_cache(maxsize=None)
+def build_graph():
+    """Compile the story chain once per process."""
+    from langgraph.graph import StateGraph, START, END
+    graph = StateGraph(State)
 
-graph.add_node("generate_story", generate_story)
-graph.add_node("improve_story", improve_story)
-graph.add_node("finalize_story", finalize_story)
+    graph.add_node("generate_story", generate_story)
+    graph.add_node("finalize_story", finalize_story)
 
-# Flow
-graph.add_edge(START, "generate_story")
+    # Flow
+    graph.add_edge(START, "generate_story")
 
-# Conditional branching and looping
-graph.add_conditional_edges(
-    "generate_story",  # after first story creation
-    check_conflict,
-    {"Pass": "finalize_story", "Fail": "improve_story"}
-)
+    if REVISE_MODE == "single":
+        graph.add_node("critique_and_revise", critique_and_revise)
+        graph.add_edge("generate_story", "critique_and_revise")
+        graph.add_conditional_edges(
+            "critique_and_revise",
+            revision_done,
+            {"finalize_story": "finalize_story", "critique_and_revise": "critique_and_revise"}
+        )
+    else:
+        graph.add_node("improve_story", improve_story)
+        # Conditional branching and looping
+        graph.add_conditional_edges(
+            "generate_story",  # after first story creation
+            check_conflict,
+            {"Pass": "finalize_story", "Fail": "improve_story"}
+        )
 
-graph.add_conditional_edges(
-    "improve_story",  # after improvement, recheck
-    check_conflict,
-    {"Pass": "finalize_story", "Fail": "improve_story"}  # loop back if still failing
-)
-graph.add_edge("finalize_story", END)
+        graph.add_conditional_edges(
+            "improve_story",  # after improvement, recheck
+            check_conflict,
+            {"Pass": "finalize_story", "Fail": "improve_story"}  # loop back if still failing, up to MAX_REVISION_ROUNDS
+        )
+    graph.add_edge("finalize_story", END)
+    return graph.compile()
 
-graph_builder = graph.compile() 
-for chunk in graph_builder.stream( {"topic": "A horror story about a nun"},stream="updates"):
-    print(chunk)
+def main():
+    from .llm_cache import cache_stats
+    from .output_sink import make_sink
+    from .tracing import trace_config, export_traces
+    counter = call_counter()
+    rounds = 0
+    topic = "A horror story about a nun"
+    run_config = {"callbacks": [counter]}
+    sink = make_sink(re.sub(r'[\\/*?:"<>|\n]', "", topic)[:100] + ".txt", header=topic + "\n\n")
+    if sink is not None:
+        run_config["configurable"] = {"sink": sink}
+    for chunk in build_graph().stream( {"topic": topic},stream_mode="updates", config=trace_config(run_config)):
+        print(chunk)
+        for update in chunk.values():
+            rounds = (update or {}).get("rounds", rounds)
+    print(f"Revision rounds: {rounds}, LLM calls: {counter.calls}")
+    print(f"LLM cache: {cache_stats()}")
+    export_traces()
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Prompt templates of the graphs, laid out for provider prompt caching.
+
+Providers reuse the longest prompt prefix they have recently seen (OpenAI does
+it automatically from 1024 prompt tokens on) and bill it at a discount, but
+only an exact prefix counts. So every template is a static system block,
+built once per process and sent as the same message by every call, followed
+by the variable part, always last:
+
+- `prompt(template, **values)` -> `[system block, user message]`;
+- `with_history(name, messages)` -> `[system block, *messages]`, for agents
+  whose variable part is the conversation (the block must never go after it).
+
+`prefix_cache_meter()` is a callback handler that sums the input tokens of
+every model call and the part the provider served from its prefix cache
+(usage `input_token_details.cache_read`), per template, so the cached-prefix
+ratio of each node can be measured; run_benchmarks.py reports it.
+"""
+import threading
+from functools import lru_cache
+
+# name -> (static system block, template of the variable part)
+TEMPLATES = {
+    "story_premise": (
+        "Write one story premise on the topic the user gives.",
+        "Topic: '{topic}'"),
+    "story_conflict_check": (
+        "Does the story the user gives have any conflicts or plot holes? Answer with 'yes' or 'no'.",
+        "Story: {story}"),
+    "story_improve": (
+        "Improve the story the user gives by fixing any conflicts or plot holes.",
+        "Story: {story}"),
+    "story_revise": (
+        "Check the story the user gives for conflicts or plot holes. If it has any, rewrite it with them fixed; "
+        "otherwise return it unchanged.",
+        "Story: {story}"),
+    "story_finalize": (
+        "Make the story the user gives more engaging and interesting.",
+        "Story: {story}"),
+    "story_setting": (
+        "Generate an interesting setting for the story topic the user gives.",
+        "Topic: '{topic}'"),
+    "story_characters": (
+        "Create main charachters for the story topic the user gives.",
+        "Topic: '{topic}'"),
+    "story_title": (
+        "Generate a catchy title for a story from its topic, premise and setting. Return only the title, nothing else.",
+        "Topic: '{topic}'\nPremise: '{premise}'\nSetting: '{setting}'"),
+    "story_hinglish": (
+        "Using the story premise, setting and charachters the user gives, write a complete engaging story in hinglish.",
+        "Premise: '{premise}'\nSetting: '{setting}'\nCharachters: '{characters}'"),
+    "route": (
+        "You are a router that decides whether to create a story, poem, or joke based on user input. "
+        "Respond with only one of the following options: story, poem, joke.",
+        "Input: '{input}'"),
+    "write_story": ("Write a short story about what the user gives.", "'{input}'"),
+    "write_poem": ("Write a poem about what the user gives.", "'{input}'"),
+    "write_joke": ("Tell a joke about what the user gives.", "'{input}'"),
+    "report_plan": (
+        "You are a document planner that breaks down a topic into sections for a detailed report creation. "
+        "Each section should have a name and a brief description of its content.",
+        "Create a list of sections for a document about: '{topic}'."),
+    "report_section": (
+        "You are a professional technical writer tasked with drafting a well-structured, "
+        "insightful, and cohesive section of a larger report. "
+        "Your goal is to write a complete section based on the given section name and description. "
+        "Follow these guidelines:\n\n"
+        "1. Write in a clear, formal, and informative tone suitable for professional or academic reports.\n"
+        "2. Begin the section with a concise introductory sentence that directly relates to the section name.\n"
+        "3. Develop the section with detailed, logically organized paragraphs — avoid bullet points unless explicitly relevant.\n"
+        "4. Maintain consistency of style and flow, as this section will later be merged into a multi-section report.\n"
+        "5. Avoid repeating the section name or meta-descriptions — write as though this is part of the final report.\n"
+        "6. Ensure factual accuracy and coherence based on the provided description.",
+        "Section name: '{name}'\nSection description: '{description}'"),
+    "calculator_assistant": (
+        "You are an AI assistant with access to the following mathematical tools: "
+        "add, multiply, subtract, divide. Use these tools to perform calculations as needed.",
+        None),
+    "history_summary": (
+        "You maintain a running summary of a conversation between a user and an AI assistant that uses tools. "
+        "Fold the new messages the user gives into the current summary and return the updated summary. Keep names, "
+        "numbers, decisions and tool findings that later questions may depend on; drop small talk.",
+        "Current summary:\n{summary}\n\nNew messages to fold into it:\n{transcript}"),
+}
+
+_TEMPLATE_OF_SYSTEM = {system: name for name, (system, _) in TEMPLATES.items()}
+
+
+@lru_cache(maxsize=None)
+def system_message(name):
+    """The static block of template `name`: one message object per process."""
+    from langchain_core.messages import SystemMessage
+    return SystemMessage(content=TEMPLATES[name][0])
+
+
+def prompt(template, /, **values):
+    """The messages of `template`: its static system block, then the user part filled with `values`."""
+    from langchain_core.messages import HumanMessage
+    return [system_message(template), HumanMessage(content=TEMPLATES[template][1].format(**values))]
+
+
+def with_history(name, messages):
+    """The static system block of template `name`, then the conversation."""
+    return [system_message(name), *messages]
+
+
+def template_of(messages):
+    """Name of the template a prompt was built from, or None."""
+    first = messages[0] if messages else None
+    return _TEMPLATE_OF_SYSTEM.get(first.content) if getattr(first, "type", None) == "system" else None
+
+
+def prefix_cache_meter():
+    """A callback handler that measures the cached share of the input tokens per template."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class PrefixCacheMeter(BaseCallbackHandler):
+        def __init__(self):
+            self._lock = threading.Lock()
+            self._labels = {}      # run id -> template (or node) of a call in flight
+            self._totals = {}      # label -> [calls, input tokens, cached tokens]
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+            label = template_of(messages[0]) or (metadata or {}).get("langgraph_node") or "untemplated"
+            with self._lock:
+                self._labels[run_id] = label
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            with self._lock:
+                label = self._labels.pop(run_id, None)
+            message = getattr(response.generations[0][0], "message", None) if response.generations else None
+            usage = getattr(message, "usage_metadata", None)
+            if label is None or not usage:
+                return
+            cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+            with self._lock:
+                totals = self._totals.setdefault(label, [0, 0, 0])
+                totals[0] += 1
+                totals[1] += usage["input_tokens"]
+                totals[2] += cached
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            with self._lock:
+                self._labels.pop(run_id, None)
+
+        def stats(self):
+            with self._lock:
+                totals = {label: list(t) for label, t in self._totals.items()}
+            return {label: {"calls": calls, "input_tokens": tokens, "cached_tokens": cached,
+                            "cached_ratio": round(cached / tokens, 3) if tokens else 0.0}
+                    for label, (calls, tokens, cached) in sorted(totals.items())}
+
+        def cached_ratio(self):
+            with self._lock:
+                tokens = sum(t[1] for t in self._totals.values())
+                cached = sum(t[2] for t in self._totals.values())
+            return round(cached / tokens, 3) if tokens else 0.0
+
+    return PrefixCacheMeter()
@@ -0,0 +1,481 @@
+"""Process-wide rate limiting and retries for model calls.
+
+Models from the registry (models.py) are built from `rate_limited(cls)`
+classes, so every call first takes a turn from the `RateLimiter` of its
+endpoint and model:
+
+- two token buckets, requests per minute (`RATE_LIMIT_RPM`) and tokens per
+  minute (`RATE_LIMIT_TPM`), refilled continuously and holding at most
+  `RATE_LIMIT_BURST_S` seconds worth. A call takes one request and its
+  estimated tokens (prompt characters / 4 plus `max_tokens`, or
+  `RATE_LIMIT_COMPLETION_ESTIMATE`); the usage the response reports settles
+  the difference. `RATE_LIMITS` sets limits per model as JSON:
+  `{"gpt-4.1-mini": {"rpm": 500, "tpm": 200000}}`.
+- waiting calls go by priority, then arrival: `interactive` (HITL, ReAct)
+  before `normal` before `batch` (report workers). Nodes pick theirs with
+  `with call_priority("batch"):`.
+- a rate-limit response (429) empties the bucket it names (requests or
+  tokens, both if it does not say), halves its limit and holds every call
+  until its `Retry-After`. The 429s of calls that were already in flight
+  (within `RATE_LIMIT_COOLDOWN_S`) count as the same one, and a limit never
+  drops below 1/16 of the configured one. Each `RATE_LIMIT_RECOVER_EVERY`
+  successful calls in a row give back 10%, up to the configured limits.
+- calls that failed for a transient reason (429, 408, 409, 5xx, timeouts,
+  dropped connections) are retried up to `RATE_LIMIT_RETRIES` times, after
+  `Retry-After` or a full-jitter exponential backoff. The client's own
+  retries are turned off (`max_retries=0`) so that retries are also
+  throttled. The error a call finally raises carries `limiter_attempts(error)`,
+  so callers with retries of their own can leave those errors alone.
+
+`rate_limit_stats()` reports queue depth per priority, time spent throttled,
+rate-limit responses, retries and the current limits. `RATE_LIMIT=0` builds
+the models without the limiter.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT", "1") == "1"
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "500"))
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", "200000"))
+RATE_LIMITS = json.loads(os.getenv("RATE_LIMITS", "{}"))                 # model -> {"rpm": ..., "tpm": ...}
+RATE_LIMIT_BURST_S = float(os.getenv("RATE_LIMIT_BURST_S", "10"))       # bucket size, in seconds of budget
+RATE_LIMIT_COMPLETION_ESTIMATE = int(os.getenv("RATE_LIMIT_COMPLETION_ESTIMATE", "512"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "5"))
+RATE_LIMIT_BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "0.5"))   # seconds
+RATE_LIMIT_BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "30"))
+RATE_LIMIT_RECOVER_EVERY = int(os.getenv("RATE_LIMIT_RECOVER_EVERY", "20"))
+RATE_LIMIT_COOLDOWN_S = float(os.getenv("RATE_LIMIT_COOLDOWN_S", "2"))     # 429s this close count as one
+
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+_priority = contextvars.ContextVar("call_priority", default="normal")
+_in_call = contextvars.ContextVar("rate_limited_call", default=False)
+
+
+@contextmanager
+def call_priority(name):
+    """Model calls made inside this block wait in line as `name` (interactive, normal or batch)."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority '{name}', expected one of {sorted(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst_s=RATE_LIMIT_BURST_S):
+        self.burst_s = burst_s
+        self.set_rate(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute):
+        self.per_second = per_minute / 60
+        self.capacity = max(1.0, self.per_second * self.burst_s)
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def deficit(self, amount, now):
+        """Seconds until `amount` can be taken. A request bigger than the bucket goes once it is full."""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.per_second)
+
+    def take(self, amount):
+        self.level -= amount      # may go below zero: the next callers pay the debt
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+def _status(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_rate_limit(error):
+    return _status(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error):
+    if getattr(error, "code", None) == "insufficient_quota":
+        return False      # a 429 that waiting will not fix
+    status = _status(error)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+        "APITimeoutError", "APIConnectionError", "RateLimitError")
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, if it said so."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def limiter_attempts(error):
+    """How many attempts the limiter made before giving up on `error` (0 if the error did not come from it)."""
+    return getattr(error, "limiter_attempts", 0)
+
+
+def backoff(attempt, error=None):
+    """Retry-After when the provider sent one, else full-jitter exponential backoff."""
+    hinted = retry_after(error) if error is not None else None
+    if hinted is not None:
+        return min(hinted, RATE_LIMIT_BACKOFF_MAX)
+    return random.uniform(0, min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt))
+
+
+class _Ticket:
+    __slots__ = ("order", "tokens", "wake")
+
+    def __init__(self, order, tokens, wake):
+        self.order = order
+        self.tokens = tokens
+        self.wake = wake
+
+    def __lt__(self, other):
+        return self.order < other.order
+
+
+class RateLimiter:
+    """Request and token budgets for one endpoint + model, shared by every thread and event loop."""
+
+    def __init__(self, name, rpm=RATE_LIMIT_RPM, tpm=RATE_LIMIT_TPM):
+        self.name = name
+        self.max_rpm, self.max_tpm = rpm, tpm
+        self.rpm, self.tpm = rpm, tpm
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self._decreased = float("-inf")
+        self._lock = threading.Lock()
+        self._waiting = []        # heap of tickets, by (priority, arrival)
+        self._arrivals = itertools.count()
+        self._streak = 0
+        self.granted = 0
+        self.throttled = 0
+        self.throttled_s = 0.0
+        self.max_wait_s = 0.0
+        self.rate_limited = 0
+        self.retries = 0
+        self.tokens_estimated = 0
+        self.tokens_used = 0
+
+    # --- admission ---
+
+    def _enqueue(self, tokens, wake):
+        ticket = _Ticket((PRIORITIES[_priority.get()], next(self._arrivals)), tokens, wake)
+        with self._lock:
+            heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _try(self, ticket):
+        """0 when `ticket` got its budget, else seconds to wait (None: until woken as the new head)."""
+        with self._lock:
+            if self._waiting[0] is not ticket:
+                return None
+            now = time.monotonic()
+            wait = max(self.paused_until - now, self.requests.deficit(1, now), self.tokens.deficit(ticket.tokens, now))
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.tokens.take(ticket.tokens)
+            heapq.heappop(self._waiting)
+            head = self._waiting[0] if self._waiting else None
+        if head is not None:
+            head.wake()
+        return 0
+
+    def _leave(self, ticket):
+        with self._lock:
+            if ticket not in self._waiting:
+                return
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            head = self._waiting[0] if self._waiting else None
+        if head is not None:
+            head.wake()
+
+    def _granted(self, ticket, started):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.granted += 1
+            self.tokens_estimated += ticket.tokens
+            if waited > 0.001:
+                self.throttled += 1
+                self.throttled_s += waited
+                self.max_wait_s = max(self.max_wait_s, waited)
+        return waited
+
+    def acquire(self, tokens):
+        """Block until a request and `tokens` tokens are available; returns the seconds waited."""
+        started = time.monotonic()
+        event = threading.Event()
+        ticket = self._enqueue(tokens, event.set)
+        granted = False
+        try:
+            while True:
+                wait = self._try(ticket)
+                if wait == 0:
+                    granted = True
+                    return self._granted(ticket, started)
+                event.wait(wait if wait is not None else 1.0)
+                event.clear()
+        finally:
+            if not granted:
+                self._leave(ticket)
+
+    async def aacquire(self, tokens):
+        """`acquire` for coroutines: waits without blocking the event loop."""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        ticket = self._enqueue(tokens, lambda: loop.call_soon_threadsafe(event.set))
+        granted = False
+        try:
+            while True:
+                wait = self._try(ticket)
+                if wait == 0:
+                    granted = True
+                    return self._granted(ticket, started)
+                try:
+                    await asyncio.wait_for(event.wait(), wait if wait is not None else 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            if not granted:
+                self._leave(ticket)
+
+    # --- feedback ---
+
+    def succeeded(self, estimated, used=None):
+        with self._lock:
+            if used is not None:
+                self.tokens.give(estimated - used)
+                self.tokens_used += used
+            self._streak += 1
+            if self._streak >= RATE_LIMIT_RECOVER_EVERY and (self.rpm < self.max_rpm or self.tpm < self.max_tpm):
+                self._streak = 0
+                self._set_limits(min(self.max_rpm, self.rpm * 1.1), min(self.max_tpm, self.tpm * 1.1))
+
+    def failed(self, error, attempt):
+        """Record a failed call; True if it should be retried (after `backoff(attempt, error)`)."""
+        with self._lock:
+            self._streak = 0
+            if is_rate_limit(error):
+                self.rate_limited += 1
+                now = time.monotonic()
+                hold = retry_after(error)
+                if hold:
+                    self.paused_until = max(self.paused_until, now + hold)
+                if now - self._decreased > RATE_LIMIT_COOLDOWN_S:
+                    self._decreased = now
+                    kind = getattr(error, "type", None)      # OpenAI says "requests" or "tokens"
+                    rpm, tpm = self.rpm, self.tpm
+                    if kind != "tokens":
+                        rpm = max(self.max_rpm / 16, rpm / 2)
+                        self.requests.level = min(self.requests.level, 0)
+                    if kind != "requests":
+                        tpm = max(self.max_tpm / 16, tpm / 2)
+                        self.tokens.level = min(self.tokens.level, 0)
+                    self._set_limits(rpm, tpm)
+            retry = attempt < RATE_LIMIT_RETRIES and is_retryable(error)
+            self.retries += retry
+        if not retry:
+            error.limiter_attempts = attempt + 1
+        return retry
+
+    def _set_limits(self, rpm, tpm):
+        self.rpm, self.tpm = rpm, tpm
+        self.requests.set_rate(rpm)
+        self.tokens.set_rate(tpm)
+
+    def stats(self):
+        with self._lock:
+            queued = {name: 0 for name in PRIORITIES}
+            names = {level: name for name, level in PRIORITIES.items()}
+            for ticket in self._waiting:
+                queued[names[ticket.order[0]]] += 1
+            return {
+                "queued": queued,
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "throttled_s": round(self.throttled_s, 3),
+                "max_wait_s": round(self.max_wait_s, 3),
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "rpm": round(self.rpm, 1), "max_rpm": self.max_rpm,
+                "tpm": round(self.tpm), "max_tpm": self.max_tpm,
+                "tokens_estimated": self.tokens_estimated,
+                "tokens_used": self.tokens_used,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_limiter(endpoint, model, rpm=None, tpm=None):
+    """Set the limits of an endpoint + model before its first call (e.g. in a benchmark)."""
+    with _limiters_lock:
+        if (endpoint, model) in _limiters:
+            raise RuntimeError(f"{model}@{endpoint} is already in use; configure it before the first call")
+        _limiters[(endpoint, model)] = RateLimiter(f"{model}@{endpoint}", rpm or RATE_LIMIT_RPM, tpm or RATE_LIMIT_TPM)
+
+
+def get_limiter(endpoint, model):
+    key = (endpoint, model)
+    with _limiters_lock:
+        if key not in _limiters:
+            limits = RATE_LIMITS.get(model, {})
+            _limiters[key] = RateLimiter(f"{model}@{endpoint}", limits.get("rpm", RATE_LIMIT_RPM),
+                                         limits.get("tpm", RATE_LIMIT_TPM))
+        return _limiters[key]
+
+
+def rate_limit_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def estimate_tokens(messages, max_tokens=None):
+    chars = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        chars += len(content) + sum(len(json.dumps(c.get("args", {}))) for c in getattr(message, "tool_calls", None) or [])
+    return chars // 4 + (max_tokens or RATE_LIMIT_COMPLETION_ESTIMATE)
+
+
+def _usage(message):
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class RateLimited:
+    """Chat model mixin: calls wait for the limiter of their endpoint + model and retry transient failures."""
+
+    def _rate_limiter(self):
+        endpoint = str(getattr(self, "openai_api_base", None) or self._llm_type)
+        return get_limiter(endpoint, getattr(self, "model_name", None) or "default")
+
+    def _estimate(self, messages, kwargs):
+        return estimate_tokens(messages, kwargs.get("max_tokens") or getattr(self, "max_tokens", None))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _in_call.get():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        limiter, estimate = self._rate_limiter(), self._estimate(messages, kwargs)
+        for attempt in itertools.count():
+            limiter.acquire(estimate)
+            token = _in_call.set(True)      # e.g. ChatOpenAI(streaming=True) generates through _stream
+            try:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                if not limiter.failed(e, attempt):
+                    raise
+                time.sleep(backoff(attempt, e))
+                continue
+            finally:
+                _in_call.reset(token)
+            limiter.succeeded(estimate, _usage(result.generations[0].message) if result.generations else None)
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _in_call.get():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        limiter, estimate = self._rate_limiter(), self._estimate(messages, kwargs)
+        for attempt in itertools.count():
+            await limiter.aacquire(estimate)
+            token = _in_call.set(True)
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                if not limiter.failed(e, attempt):
+                    raise
+                await asyncio.sleep(backoff(attempt, e))
+                continue
+            finally:
+                _in_call.reset(token)
+            limiter.succeeded(estimate, _usage(result.generations[0].message) if result.generations else None)
+            return result
+
+    # a stream is only retried while nothing has been yielded from it
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if _in_call.get():
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        limiter, estimate = self._rate_limiter(), self._estimate(messages, kwargs)
+        for attempt in itertools.count():
+            limiter.acquire(estimate)
+            stream = super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            try:
+                first = next(stream)
+                break
+            except StopIteration:
+                limiter.succeeded(estimate)
+                return
+            except Exception as e:
+                if not limiter.failed(e, attempt):
+                    raise
+                time.sleep(backoff(attempt, e))
+        used = _usage(first.message)
+        yield first
+        for chunk in stream:
+            used = _usage(chunk.message) or used
+            yield chunk
+        limiter.succeeded(estimate, used)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if _in_call.get():
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        limiter, estimate = self._rate_limiter(), self._estimate(messages, kwargs)
+        for attempt in itertools.count():
+            await limiter.aacquire(estimate)
+            stream = super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            try:
+                first = await stream.__anext__()
+                break
+            except StopAsyncIteration:
+                limiter.succeeded(estimate)
+                return
+            except Exception as e:
+                if not limiter.failed(e, attempt):
+                    raise
+                await asyncio.sleep(backoff(attempt, e))
+        used = _usage(first.message)
+        yield first
+        async for chunk in stream:
+            used = _usage(chunk.message) or used
+            yield chunk
+        limiter.succeeded(estimate, used)
+
+
+@lru_cache(maxsize=None)
+def rate_limited(cls):
+    """`cls` with every call going through the process-wide limiter."""
+    return type(f"RateLimited{cls.__name__}", (RateLimited, cls), {})
@@ -0,0 +1,209 @@
+"""Generate reports for a JSONL list of topics on a pool of processes.
+
+    python -m workflows.report_batch topics.jsonl --processes 4 --concurrency 2 --max-in-flight 6
+
+Every line of the input is a topic: a JSON string, or an object with a
+`topic` (and optionally a `run_id`). Topics are dealt round-robin into one
+shard per process. Each shard runs in a fresh process that compiles the
+report graph (orchestrator_worker.py) once and works through its topics on
+one event loop, `--concurrency` at a time. A shard keeps everything it writes
+in `<out-dir>/shard-NN/`: the reports (`<run_id>.txt`), its checkpoint
+database (`CHECKPOINT_DB`), its caches and a `worker.log` of its output. So
+no two processes or topics write to the same file, and a paused topic can be
+finished by running
+`python -m workflows.orchestrator_worker --resume RUN_ID --output RUN_ID.txt`
+in that directory (with the repository root on `PYTHONPATH`).
+
+Limits across the whole pool:
+
+- `--max-in-flight`: at most this many reports are being generated at once,
+  over all processes (a semaphore shared by the pool);
+- the rate limiter (rate_limit.py) is per process, so every process gets
+  `1/--processes` of `RATE_LIMIT_RPM`, `RATE_LIMIT_TPM` and `RATE_LIMITS`,
+  and the pool as a whole stays within the account's limits.
+
+Throughput grows with the processes until the pool reaches those limits;
+from then on, more processes only mean more waiting in the limiter.
+`<out-dir>/summary.json` is rewritten as topics finish. It holds the
+progress, the per-topic latency percentiles, the throughput, and the
+outcome of each topic.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+_slots = None       # semaphore shared by the pool: reports in flight
+_events = None      # queue of finished topics, read by the parent
+
+
+def _init_worker(slots, events, env):
+    global _slots, _events
+    _slots, _events = slots, events
+    os.environ.update(env)
+
+
+def limiter_share(processes):
+    """Rate limiter settings giving each of `processes` processes an equal part of the budget."""
+    from .rate_limit import RATE_LIMIT_RPM, RATE_LIMIT_TPM, RATE_LIMITS
+    return {
+        "RATE_LIMIT_RPM": str(RATE_LIMIT_RPM / processes),
+        "RATE_LIMIT_TPM": str(RATE_LIMIT_TPM / processes),
+        "RATE_LIMITS": json.dumps({model: {k: v / processes for k, v in limits.items()}
+                                   for model, limits in RATE_LIMITS.items()}),
+    }
+
+
+def read_topics(path):
+    topics = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {"topic": entry}
+            topics.append({"topic": entry["topic"], "run_id": entry.get("run_id") or uuid.uuid4().hex[:12]})
+    return topics
+
+
+async def _run_topic(app, item, local):
+    from .orchestrator_worker import report_path, safe_filename
+    # reports are named by run ID: topics may share their first 50 characters or contain a '/'
+    config = {"configurable": {"thread_id": item["run_id"], "output": f"{safe_filename(item['run_id'])}.txt"}}
+    async with local:
+        # a blocking acquire, off the event loop
+        await asyncio.to_thread(_slots.acquire)
+        try:
+            started = time.perf_counter()
+            state = {"topic": item["topic"], "sections": [], "completed_sections": [], "section_runs": [],
+                     "final_report": ""}
+            result = await app.ainvoke(state, config=config)
+            status = "paused" if "__interrupt__" in result else "done"
+            error = None
+        except Exception as e:
+            status, error = "failed", repr(e)
+        finally:
+            _slots.release()
+    return {**item, "status": status, "error": error, "seconds": round(time.perf_counter() - started, 3),
+            "output": os.path.abspath(report_path(item["topic"], config)) if status == "done" else None}
+
+
+def run_shard(shard, items, out_dir, concurrency):
+    """Run one shard's topics in this process; returns their results."""
+    shard_dir = os.path.join(out_dir, f"shard-{shard:02d}")
+    os.makedirs(shard_dir, exist_ok=True)
+    os.chdir(shard_dir)
+    os.environ["CHECKPOINT_DB"] = os.path.join(shard_dir, "checkpoints.sqlite")
+    log = open("worker.log", "a", encoding="utf-8", buffering=1)
+    sys.stdout = sys.stderr = log
+    from .orchestrator_worker import build_graph
+    app = build_graph(checkpointed=True)
+
+    async def run_all():
+        local = asyncio.Semaphore(concurrency)
+
+        async def one(item):
+            result = {**await _run_topic(app, item, local), "shard": shard}
+            _events.put(result)
+            return result
+
+        return await asyncio.gather(*(one(item) for item in items))
+
+    try:
+        return asyncio.run(run_all())
+    finally:
+        log.close()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+
+
+def summarize(args, total, results, started):
+    elapsed = time.perf_counter() - started
+    finished = [r for r in results if r["status"] == "done"]
+    latencies = [r["seconds"] for r in finished]
+    return {
+        "input": args.topics,
+        "processes": args.processes,
+        "concurrency_per_process": args.concurrency,
+        "max_in_flight": args.max_in_flight,
+        "progress": {"total": total, "finished": len(results), "done": len(finished),
+                     "paused": sum(r["status"] == "paused" for r in results),
+                     "failed": sum(r["status"] == "failed" for r in results)},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_min": round(60 * len(finished) / elapsed, 2) if elapsed else 0.0,
+        "latency_s": {"p50": percentile(latencies, 0.5), "p90": percentile(latencies, 0.9),
+                      "p99": percentile(latencies, 0.99), "max": max(latencies, default=None)},
+        "topics": sorted(results, key=lambda r: r["index"]),
+    }
+
+
+def write_summary(path, summary):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("topics", help="JSONL file, one topic per line")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=2, help="reports at once per process")
+    parser.add_argument("--max-in-flight", type=int, help="reports at once over all processes "
+                                                          "(default: processes x concurrency)")
+    parser.add_argument("--out-dir", default="report_batch")
+    args = parser.parse_args()
+    args.max_in_flight = args.max_in_flight or args.processes * args.concurrency
+
+    topics = read_topics(args.topics)
+    for index, item in enumerate(topics):
+        item["index"] = index
+    out_dir = os.path.abspath(args.out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    summary_path = os.path.join(out_dir, "summary.json")
+    shards = [topics[i::args.processes] for i in range(args.processes)]
+    shards = [(i, items) for i, items in enumerate(shards) if items]
+
+    # fresh processes (no forked threads or connections), one per shard
+    context = multiprocessing.get_context("spawn")
+    slots, events = context.Semaphore(args.max_in_flight), context.Queue()
+    results = []
+    started = time.perf_counter()
+
+    def collect():
+        while (result := events.get()) is not None:
+            results.append(result)
+            write_summary(summary_path, summarize(args, len(topics), results, started))
+            print(f"[{len(results)}/{len(topics)}] {result['status']:6s} {result['seconds']:7.1f}s "
+                  f"shard {result['shard']:02d}  {result['topic'][:60]}")
+
+    collector = threading.Thread(target=collect, daemon=True)
+    collector.start()
+    try:
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=context, max_tasks_per_child=1,
+                                 initializer=_init_worker, initargs=(slots, events, limiter_share(len(shards)))) as pool:
+            futures = [pool.submit(run_shard, shard, items, out_dir, args.concurrency) for shard, items in shards]
+            for future in futures:
+                future.result()
+    finally:
+        events.put(None)
+        collector.join()
+    summary = summarize(args, len(topics), results, started)
+    write_summary(summary_path, summary)
+    print(f"{summary['progress']['done']}/{len(topics)} reports in {summary['elapsed_s']}s "
+          f"({summary['throughput_per_min']}/min, p50 {summary['latency_s']['p50']}s, "
+          f"p90 {summary['latency_s']['p90']}s); summary: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
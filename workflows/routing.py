@@ -1,17 +1,21 @@
-from typing_extensions import TypedDict, Literal
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
-from fpdf import FPDF
-from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from pydantic import BaseModel, Field
 import os
 import re
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from functools import lru_cache
+from typing import TYPE_CHECKING
+from typing_extensions import TypedDict, Literal
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+# langgraph, langchain and the model client are imported on first use, so
+# importing this module (e.g. to pick one graph out of the package) stays cheap
 
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.9)
 class Route(BaseModel):
     step: Literal["story", "poem", "joke"] = Field(..., description="Type of creative output to generate")
 
@@ -20,42 +24,93 @@ class State(TypedDict):
     decision: str
     output:str
 
-router = llm.with_structured_output(Route)
+@lru_cache(maxsize=None)
+def get_llm(node=None):
+    from dotenv import load_dotenv
+    from .model_tiers import node_model
+    load_dotenv()
+    # the generators' tier and output cap come from model_tiers.py
+    return node_model(node and f"routing.{node}", model="gpt-4.1-mini", temperature=0.9)
 
-def poem_generator(state: State):
-    msg = llm.invoke(f"Write a poem about: '{state['input']}'")
-    return {"output": msg.content}
+@lru_cache(maxsize=None)
+def get_router():
+    from dotenv import load_dotenv
+    from .llm_cache import cached
+    from .model_tiers import structured_model
+    load_dotenv()
+    # classification of a repeated input is served from the disk cache; a small model first,
+    # a larger one only if its answer is not a valid Route
+    return structured_model("routing.decide_router", Route, model="gpt-4.1-mini", temperature=0.9,
+                            wrap=lambda llm: cached(llm, allow_nonzero_temperature=True))
 
-def joke_generator(state: State):
-    msg = llm.invoke(f"Tell a joke about: '{state['input']}'")
-    return {"output": msg.content}
+@lru_cache(maxsize=None)
+def get_fast_router():
+    from .fast_router import FAST_ROUTER, FastRouter
+    # obvious inputs ("poem about ...") are routed locally, the LLM router is the fallback
+    return FastRouter.from_log() if FAST_ROUTER else None
+
+# decision -> prompt template (prompts.py)
+GENERATOR_TEMPLATES = {"story": "write_story", "poem": "write_poem", "joke": "write_joke"}
 
-def story_generator(state: State):   
-    msg = llm.invoke(f"Write a short story about: '{state['input']}'")
+def generator_messages(decision: str, text: str):
+    from .prompts import prompt
+    return prompt(GENERATOR_TEMPLATES[decision], input=text)
+
+def generate(messages, config: "RunnableConfig"):
+    from .output_sink import get_sink, stream_text
+    sink = get_sink(config)
+    if sink is not None:
+        return {"output": stream_text(get_llm("generate"), messages, sink)}
+    msg = get_llm("generate").invoke(messages)
     return {"output": msg.content}
 
-def decide_router(state: State):
-    msg = router.invoke([
-        SystemMessage(content="You are a router that decides whether to create a story, poem, or joke based on user input."),
-        HumanMessage(content=f"Decide whether to create a 'story', 'poem', or 'joke' based on the following input: '{state['input']}'. "
-                     "Respond with only one of the following options: story, poem, joke.")]
-    )
-    decision = msg.step.lower()
+def poem_generator(state: State, config: "RunnableConfig"):
+    return generate(generator_messages("poem", state["input"]), config)
+
+def joke_generator(state: State, config: "RunnableConfig"):
+    return generate(generator_messages("joke", state["input"]), config)
+
+def story_generator(state: State, config: "RunnableConfig"):
+    return generate(generator_messages("story", state["input"]), config)
+
+def router_messages(text: str):
+    from .prompts import prompt
+    return prompt("route", input=text)
+
+def normalize_decision(step: str):
+    decision = step.lower()
     if decision not in ["story", "poem", "joke"]:
         decision = "story"  # Default to story if unclear
-    return {"decision": decision}
+    return decision
+
+def llm_route(text: str):
+    return normalize_decision(get_router().invoke(router_messages(text)).step)
+
+def decide_router(state: State):
+    fast_router = get_fast_router()
+    if fast_router is not None:
+        return {"decision": fast_router.route(state["input"], llm_route)}
+    return {"decision": llm_route(state["input"])}
 
-def output_writer(state: State):
+def output_writer(state: State, config: "RunnableConfig"):
+    from .output_sink import get_sink
     safe_title = re.sub(r'[\\/*?:"<>|\n]', "", state["input"]).strip()
     if len(safe_title) > 20:
         safe_title = safe_title[:20]
     base_name = safe_title
     counter = 0
-    while True:
-        filename = f"{base_name}.txt" if counter == 0 else f"{base_name}_{counter}.txt"
-        if not os.path.exists(filename):
-            break
+    # server.py names the file after the run (`configurable.output`)
+    filename = (config or {}).get("configurable", {}).get("output")
+    while filename is None:
+        candidate = f"{base_name}.txt" if counter == 0 else f"{base_name}_{counter}.txt"
+        if not os.path.exists(candidate):
+            filename = candidate
         counter += 1
+    sink = get_sink(config)
+    if sink is not None:
+        sink.close(filename, header=state["input"] + "\n\n"+"-"*100+"\n\n")
+        print(f"Content saved as {filename}")
+        return
     with open(filename, "w", encoding="utf-8") as f:
         f.write(state["input"] + "\n\n"+"-"*100+"\n\n")
         f.write(state["output"])
@@ -72,23 +127,139 @@ def route_checker(state: State):
     else:
         return "story_generator"  
 
-graph = StateGraph(State)
-graph.add_node("decide_router", decide_router)
-graph.add_node("story_generator", story_generator)
-graph.add_node("poem_generator", poem_generator)
-graph.add_node("joke_generator", joke_generator)
-graph.add_node("output_writer", output_writer)
-graph.add_edge(START, "decide_router")
-graph.add_conditional_edges("decide_router",route_checker,{"story_generator": "story_generator",
-                                                          "poem_generator": "poem_generator", "joke_generator": "joke_generator"})
-graph.add_edge("story_generator", "output_writer")
-graph.add_edge("poem_generator", "output_writer")
-graph.add_edge("joke_generator", "output_writer")
-graph.add_edge("output_writer", END)
+@lru_cache(maxsize=None)
+def build_graph():
+    """Compile the routing graph once per process."""
+    from langgraph.graph import StateGraph, START, END
+    graph = StateGraph(State)
+    graph.add_node("decide_router", decide_router)
+    graph.add_node("story_generator", story_generator)
+    graph.add_node("poem_generator", poem_generator)
+    graph.add_node("joke_generator", joke_generator)
+    graph.add_node("output_writer", output_writer)
+    graph.add_edge(START, "decide_router")
+    graph.add_conditional_edges("decide_router",route_checker,{"story_generator": "story_generator",
+                                                              "poem_generator": "poem_generator", "joke_generator": "joke_generator"})
+    graph.add_edge("story_generator", "output_writer")
+    graph.add_edge("poem_generator", "output_writer")
+    graph.add_edge("joke_generator", "output_writer")
+    graph.add_edge("output_writer", END)
+    return graph.compile()
+
+# --- Batch mode ---
+async def generate_batch(decision: str, texts, concurrency: int):
+    """The `decision` generator node's output for each of `texts`, as one `abatch` call.
+
+    Failed items come back as exceptions in their place.
+    """
+    messages = [generator_messages(decision, text) for text in texts]
+    return await get_llm("generate").abatch(messages, config={"max_concurrency": concurrency},
+                                            return_exceptions=True)
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 8):
+    """Route every `{"input": ...}` line of a JSONL file and write the results to another JSONL file.
 
-app = graph.compile()
-app.invoke({"input": "poem about mom"})
+    Inputs are classified with one `abatch` call and grouped by decision; each group is
+    generated with one `abatch` call of at most `concurrency` requests in flight, and its
+    rows are written as soon as it is done. An input the router failed on gets an
+    `error` row and is not generated.
+    """
+    with open(input_path, encoding="utf-8") as f:
+        inputs = [json.loads(line)["input"] for line in f if line.strip()]
 
+    started = time.perf_counter()
+    router, fast_router = get_router(), get_fast_router()
+    decisions, guesses, audited = [None] * len(inputs), [None] * len(inputs), []
+    if fast_router is not None:
+        for i, text in enumerate(inputs):
+            decisions[i], guesses[i] = fast_router.try_route(text)
+            if decisions[i] is not None and fast_router.should_audit():
+                audited.append(i)
+    remaining = [i for i, decision in enumerate(decisions) if decision is None]
+    routes = await router.abatch([router_messages(inputs[i]) for i in remaining + audited],
+                                 config={"max_concurrency": concurrency}, return_exceptions=True)
+    for i, route in zip(audited, routes[len(remaining):]):
+        if not isinstance(route, Exception):
+            fast_router.audit(decisions[i], normalize_decision(route.step))
+    router_errors = {}
+    for i, route in zip(remaining, routes):
+        if isinstance(route, Exception):
+            router_errors[i] = repr(route)
+            continue
+        decisions[i] = normalize_decision(route.step)
+        if fast_router is not None:
+            fast_router.learn(inputs[i], decisions[i], guess=guesses[i])
+    classify_seconds = time.perf_counter() - started
+    groups = defaultdict(list)
+    for i, decision in enumerate(decisions):
+        if decision is not None:
+            groups[decision].append(i)
 
+    stats = {}
+    with open(output_path, "w", encoding="utf-8") as out:
+        def write(row):
+            out.write(json.dumps(row) + "\n")
+            out.flush()
+
+        for i, error in router_errors.items():
+            write({"index": i, "input": inputs[i], "decision": None, "error": error})
+        for decision, idxs in groups.items():
+            # a route's throughput is measured from its own batch, not from batch start
+            first_start = time.perf_counter()
+            results = await generate_batch(decision, [inputs[i] for i in idxs], concurrency)
+            errors = 0
+            for i, msg in zip(idxs, results):
+                if isinstance(msg, Exception):
+                    errors += 1
+                    write({"index": i, "input": inputs[i], "decision": decision, "error": repr(msg)})
+                else:
+                    write({"index": i, "input": inputs[i], "decision": decision, "output": msg.content})
+            stats[decision] = {"count": len(idxs), "errors": errors, "first_start": first_start,
+                               "last_done": time.perf_counter()}
+
+    total_seconds = time.perf_counter() - started
+    report = {
+        "inputs": len(inputs),
+        "classify_seconds": round(classify_seconds, 3),
+        "classify_per_second": round(len(inputs) / classify_seconds, 2) if classify_seconds else None,
+        "total_seconds": round(total_seconds, 3),
+        "router_errors": len(router_errors),
+        "fast_router": fast_router.stats() if fast_router is not None else None,
+        "routes": {},
+    }
+    for decision, st in stats.items():
+        seconds = st["last_done"] - st["first_start"]
+        report["routes"][decision] = {
+            "count": st["count"],
+            "errors": st["errors"],
+            "seconds": round(seconds, 3),
+            "per_second": round(st["count"] / seconds, 2) if seconds else None,
+        }
+    return report
+
+
+def main():
+    from .llm_cache import cache_stats
+    from .output_sink import make_sink
+    from .tracing import trace_config, export_traces
+    parser = argparse.ArgumentParser(description="Route an input to a story, poem or joke generator.")
+    parser.add_argument("--batch", help="JSONL file with one {\"input\": ...} object per line")
+    parser.add_argument("--out", default="routing_results.jsonl", help="where batch results are written")
+    parser.add_argument("--concurrency", type=int, default=8, help="max model calls in flight in batch mode")
+    args = parser.parse_args()
+
+    if args.batch:
+        print(json.dumps(asyncio.run(run_batch(args.batch, args.out, args.concurrency)), indent=2))
+    else:
+        # STREAM_OUTPUT=file,stdout: the generator's tokens reach the file and the terminal as they arrive
+        sink = make_sink("output.txt")
+        run_config = {"configurable": {"sink": sink}} if sink is not None else {}
+        build_graph().invoke({"input": "poem about mom"}, config=trace_config(run_config))
+        if get_fast_router() is not None:
+            print(f"Fast router: {get_fast_router().stats()}")
+    print(f"LLM cache: {cache_stats()}")
+    export_traces()
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Report sections kept across runs, keyed by section name + description + model.
+
+The report workers (orchestrator_worker.py) look a section up here before
+generating it and store it once it is written, so a rerun, or a new report
+whose plan shares sections with an earlier one, only generates what changed.
+Each entry keeps how long the section took to generate, which is what a
+reuse saves. `SECTION_STORE=0` turns it off; the file is `SECTION_STORE_PATH`.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+SECTION_STORE_ENABLED = os.getenv("SECTION_STORE", "1") == "1"
+SECTION_STORE_PATH = os.getenv("SECTION_STORE_PATH", ".sections.sqlite")
+
+
+def section_key(name, description, model=""):
+    normalized = "\0".join(" ".join(part.split()).lower() for part in (name, description, model or ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SectionStore:
+    def __init__(self, path=SECTION_STORE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sections ("
+            "key TEXT PRIMARY KEY, name TEXT NOT NULL, content TEXT NOT NULL, seconds REAL NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, name, description, model=""):
+        """(content, seconds it took to generate) of a stored section, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT content, seconds FROM sections WHERE key = ?",
+                                     (section_key(name, description, model),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_s += row[1]
+        return row
+
+    def put(self, name, description, content, seconds, model=""):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sections (key, name, content, seconds, created) VALUES (?, ?, ?, ?, ?)",
+                (section_key(name, description, model), name, content, seconds, time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "saved_s": round(self.saved_s, 3), "entries": entries}
+
+
+_store = None
+
+
+def get_section_store():
+    """The shared store, or None when `SECTION_STORE=0`."""
+    global _store
+    if _store is None and SECTION_STORE_ENABLED:
+        _store = SectionStore()
+    return _store
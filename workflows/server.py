@@ -0,0 +1,423 @@
+"""HTTP service for the workflow graphs, streamed over server-sent events.
+
+    uvicorn workflows.server:app --port 8000          # or: python -m workflows.server
+    curl -N -X POST localhost:8000/graphs/routing/stream -H 'content-type: application/json' \\
+         -d '{"input": {"input": "poem about mom"}}'
+
+Served graphs: `routing`, `story` (parallelization), `report`
+(orchestrator_worker), `react` (ReAct agent) and `hitl`. Every run goes
+through `graph.astream` with the `updates` and `messages` stream modes, so a
+client sees each node's update as it finishes (`event: update`) and the model
+tokens as they are generated (`event: token`). Checkpointed graphs take a
+`thread_id` (one is generated when missing); HITL interrupts arrive as
+`event: interrupt` and are answered with `{"thread_id": ..., "resume": {...}}`.
+`POST /graphs/{name}/invoke` runs the same way and returns the final state.
+
+Approvals: every interrupted thread is also parked in an approval queue
+(workflows/approvals.py), so reviewers need not hold the stream open.
+`GET /approvals` lists the pending ones and `POST /approvals/{id}` with
+`{"proceed": true|false, "reason": ...}` resumes the thread and returns its
+state like `invoke`. Approval wait latency is part of `GET /stats`.
+
+Admission control: at most `SERVER_MAX_RUNS` graph runs execute at once and
+up to `SERVER_MAX_QUEUE` more wait for a slot (for at most
+`SERVER_QUEUE_TIMEOUT` seconds); beyond that requests get 429 with a
+`Retry-After` header instead of piling up.
+
+Coalescing: identical requests (same graph, input and thread) that arrive
+while a run for them is in flight join that run instead of starting another;
+late joiners get the last `SERVER_REPLAY_EVENTS` events replayed (a client
+that falls further behind gets a `dropped` event with the number it missed).
+A run is cancelled once its last client disconnects, and its events are freed
+once it has ended and every client is gone. `GET /stats` reports admission,
+coalescing, model connection pool and rate limiter numbers.
+
+Files: a run that writes its output (the routing, story and report graphs)
+writes `SERVER_OUTPUT_DIR/<run id>.txt`; the path is in the `metadata` event.
+"""
+import asyncio
+import dataclasses
+import json
+import os
+import statistics
+import time
+import uuid
+from collections import deque
+from typing import Any, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from . import get_graph
+
+SERVER_MAX_RUNS = int(os.getenv("SERVER_MAX_RUNS", "8"))                 # graph runs executing at once
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "32"))              # runs waiting for a slot
+SERVER_QUEUE_TIMEOUT = float(os.getenv("SERVER_QUEUE_TIMEOUT", "60"))    # seconds a run may wait
+SERVER_REPLAY_EVENTS = int(os.getenv("SERVER_REPLAY_EVENTS", "1000"))    # events kept per run for late joiners
+SERVER_OUTPUT_DIR = os.getenv("SERVER_OUTPUT_DIR", "server_runs")        # where runs write their files
+
+# public name -> (graph in the workflows package, needs a thread_id)
+SERVED = {
+    "routing": ("routing", False),
+    "story": ("parallelization", False),
+    "report": ("orchestrator_worker", False),
+    "react": ("react_agent", True),
+    "hitl": ("hitl", True),
+}
+PUBLIC_NAMES = {graph: name for name, (graph, _) in SERVED.items()}
+
+
+class RunRequest(BaseModel):
+    input: Optional[dict] = None
+    thread_id: Optional[str] = None
+    resume: Any = None
+
+
+class Decision(BaseModel):
+    proceed: bool
+    reason: Optional[str] = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _jsonable(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=_jsonable)}\n\n"
+
+
+class Admission:
+    """A bounded number of running graphs plus a bounded wait queue."""
+
+    def __init__(self, max_running=SERVER_MAX_RUNS, max_queue=SERVER_MAX_QUEUE, timeout=SERVER_QUEUE_TIMEOUT):
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_running)
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_ms = []
+
+    def reserve(self):
+        """Take a place in line right away, or raise QueueFull."""
+        if self.running + self.queued >= self.max_running + self.max_queue:
+            self.rejected += 1
+            raise QueueFull()
+        self.queued += 1
+        return self.queued
+
+    async def acquire(self):
+        """Wait for a slot; the caller moves from the queue to running when this returns."""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        self.queued -= 1
+        self.running += 1
+        self.admitted += 1
+        self.wait_ms.append((time.perf_counter() - started) * 1000)
+        del self.wait_ms[:-1000]
+
+    def leave_queue(self):
+        self.queued -= 1
+
+    def release(self):
+        self.running -= 1
+        self._slots.release()
+
+    def stats(self):
+        waits = sorted(self.wait_ms)
+        return {
+            "running": self.running, "queued": self.queued,
+            "max_running": self.max_running, "max_queue": self.max_queue,
+            "admitted": self.admitted, "rejected": self.rejected, "timed_out": self.timed_out,
+            "queue_wait_ms_p50": round(statistics.median(waits), 2) if waits else None,
+            "queue_wait_ms_p95": round(waits[int(0.95 * (len(waits) - 1))], 2) if waits else None,
+        }
+
+
+class Run:
+    """One graph run whose events are fanned out to every client attached to it."""
+
+    def __init__(self, key, name, payload, config):
+        self.key = key
+        self.name = name
+        self.payload = payload
+        self.config = config
+        self.events = deque(maxlen=SERVER_REPLAY_EVENTS)   # the latest (event, data), replayed to late joiners
+        self.emitted = 0          # events emitted so far, including those no longer kept
+        self.result = None        # last full state of a checkpointed run
+        self.slot = "queued"      # queued -> running -> None once the admission slot is given back
+        self.done = False
+        self.clients = 0
+        self.task = None
+        self._waiter = asyncio.Event()
+
+    def _wake(self):
+        waiter, self._waiter = self._waiter, asyncio.Event()
+        waiter.set()
+
+    def emit(self, event, data):
+        self.events.append((event, data))
+        self.emitted += 1
+        self._wake()
+
+    def finish(self):
+        self.done = True
+        self._wake()
+
+    async def follow(self):
+        """Yield the events of the run, from the oldest one still kept, until it ends."""
+        seen = 0
+        while True:
+            waiter = self._waiter
+            while seen < self.emitted:
+                oldest = self.emitted - len(self.events)
+                if seen < oldest:
+                    yield "dropped", {"events": oldest - seen}
+                    seen = oldest
+                    continue
+                seen += 1
+                yield self.events[seen - 1 - oldest]
+            if self.done:
+                return
+            await waiter.wait()
+
+    def release_events(self):
+        """Free the replay buffer once the run has ended and nobody follows it."""
+        if self.done and self.clients == 0:
+            self.events.clear()
+
+
+class GraphService:
+    def __init__(self, admission=None):
+        from .approvals import ApprovalQueue
+        self.admission = admission or Admission()
+        self.approvals = ApprovalQueue(resume=self._resume)
+        self.in_flight = {}       # coalescing key -> Run
+        self.started = 0
+        self.coalesced = 0
+
+    def _key(self, name, request):
+        if SERVED[name][1] and request.thread_id is None:
+            return None       # every such request starts its own conversation
+        return json.dumps([name, request.thread_id, request.input, request.resume], sort_keys=True, default=str)
+
+    def attach(self, name, request):
+        """The run serving this request: an identical in-flight one, or a newly started one."""
+        graph_name, threaded = SERVED[name]
+        key = self._key(name, request)
+        run = self.in_flight.get(key) if key is not None else None
+        if run is not None and not run.done:
+            self.coalesced += 1
+            run.clients += 1
+            return run, True
+        position = self.admission.reserve()
+        if request.resume is not None and request.thread_id:
+            # answered on the stream: the parked approval is no longer pending
+            self.approvals.discard(request.thread_id, request.resume)
+        thread_id = request.thread_id or (str(uuid.uuid4()) if threaded else None)
+        output = os.path.join(SERVER_OUTPUT_DIR, f"{uuid.uuid4().hex}.txt")
+        config = {"configurable": {"output": output}}
+        if thread_id:
+            config["configurable"]["thread_id"] = thread_id
+        if request.resume is not None:
+            from langgraph.types import Command
+            payload = Command(resume=request.resume)
+        else:
+            payload = request.input or {}
+        run = Run(key, graph_name, payload, config)
+        run.clients = 1
+        if key is not None:
+            self.in_flight[key] = run
+        self.started += 1
+        run.task = asyncio.create_task(self._execute(run, thread_id, position))
+        run.task.add_done_callback(lambda task: self._finished(run))
+        return run, False
+
+    def detach(self, run):
+        run.clients -= 1
+        if run.clients == 0 and not run.done:
+            # nobody is listening anymore: free the slot for someone who is
+            run.task.cancel()
+        run.release_events()
+
+    async def _execute(self, run, thread_id, position):
+        from .tracing import trace_config
+        output = run.config["configurable"]["output"]
+        run.emit("metadata", {"graph": run.name, "thread_id": thread_id, "queue_position": position,
+                              "output": output})
+        try:
+            await self.admission.acquire()
+        except asyncio.TimeoutError:
+            run.emit("error", {"status": 503, "message": "timed out waiting for a free slot"})
+            return
+        run.slot = "running"
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        config = trace_config(run.config)
+        try:
+            # the first request for a graph pays for building it, off the event loop
+            graph = await asyncio.to_thread(get_graph, run.name)
+            async for mode, chunk in graph.astream(run.payload, config=config, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    message, metadata = chunk
+                    if message.content and message.type != "tool":
+                        run.emit("token", {"node": metadata.get("langgraph_node"), "content": message.content})
+                    continue
+                for node, update in chunk.items():
+                    if node == "__interrupt__":
+                        self.approvals.add(thread_id, update[0].value, graph=PUBLIC_NAMES[run.name])
+                        run.emit("interrupt", {"thread_id": thread_id, "interrupts": update})
+                    else:
+                        run.emit("update", {"node": node, "update": update})
+            if thread_id:
+                run.result = (await graph.aget_state(config)).values
+            run.emit("end", {"thread_id": thread_id})
+        except Exception as e:
+            run.emit("error", {"status": 500, "message": repr(e)})
+
+    def _finished(self, run):
+        # also runs for tasks cancelled before they started, so the slot accounting lives here
+        if run.slot == "queued":
+            self.admission.leave_queue()
+        elif run.slot == "running":
+            self.admission.release()
+        run.slot = None
+        run.finish()
+        if self.in_flight.get(run.key) is run:
+            del self.in_flight[run.key]
+        run.release_events()
+
+    async def _resume(self, approval, decision):
+        run, coalesced = self.attach(approval.graph, RunRequest(thread_id=approval.thread_id, resume=decision))
+        return await collect(run, coalesced)
+
+    def stats(self):
+        from .blob_store import get_blob_store
+        from .model_tiers import tier_stats
+        from .models import pool_stats, rate_limit_stats
+        blobs = get_blob_store()
+        return {"admission": self.admission.stats(), "runs_started": self.started,
+                "coalesced": self.coalesced, "in_flight": len(self.in_flight),
+                "approvals": self.approvals.stats(), "model_pools": pool_stats(),
+                "rate_limits": rate_limit_stats(), "model_tiers": tier_stats(),
+                "blob_store": blobs.stats() if blobs is not None else None}
+
+
+async def collect(run, coalesced):
+    """Follow a run to its end; (status, body) with the final state, like `invoke` returns it."""
+    updates, interrupts, error = {}, [], None
+    try:
+        async for event, data in run.follow():
+            if event == "update" and isinstance(data["update"], dict):
+                updates.update(data["update"])
+            elif event == "interrupt":
+                interrupts.extend(data["interrupts"])
+            elif event == "error":
+                error = data
+    finally:
+        get_service().detach(run)
+    if error is not None:
+        return error["status"], json.loads(json.dumps(error))
+    body = {"thread_id": run.config.get("configurable", {}).get("thread_id"), "coalesced": coalesced,
+            "state": run.result if run.result is not None else updates, "interrupts": interrupts}
+    return 200, json.loads(json.dumps(body, default=_jsonable))
+
+
+app = FastAPI(title="AgenticAI workflows")
+service = None
+
+
+def get_service():
+    # created lazily so the semaphore belongs to the server's event loop
+    global service
+    if service is None:
+        service = GraphService()
+    return service
+
+
+def _attach(name, request):
+    if name not in SERVED:
+        raise HTTPException(404, f"unknown graph '{name}', expected one of {sorted(SERVED)}")
+    try:
+        return get_service().attach(name, request)
+    except QueueFull:
+        raise HTTPException(429, "too many requests in flight, retry later", headers={"Retry-After": "1"})
+
+
+@app.get("/graphs")
+def list_served():
+    return sorted(SERVED)
+
+
+@app.get("/stats")
+def stats():
+    return get_service().stats()
+
+
+@app.post("/graphs/{name}/stream")
+async def stream(name: str, request: RunRequest):
+    run, coalesced = _attach(name, request)
+
+    async def events():
+        try:
+            if coalesced:
+                yield sse("coalesced", {"clients": run.clients})
+            async for event, data in run.follow():
+                yield sse(event, data)
+        finally:
+            get_service().detach(run)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/graphs/{name}/invoke")
+async def invoke(name: str, request: RunRequest):
+    status, body = await collect(*_attach(name, request))
+    return JSONResponse(body, status_code=status)
+
+
+@app.get("/approvals")
+def list_approvals():
+    return json.loads(json.dumps(get_service().approvals.pending(), default=_jsonable))
+
+
+@app.post("/approvals/{approval_id}")
+async def decide(approval_id: str, decision: Decision):
+    try:
+        status, body = await get_service().approvals.resolve(approval_id, decision.model_dump())
+    except KeyError:
+        raise HTTPException(404, f"no pending approval '{approval_id}'")
+    except QueueFull:
+        raise HTTPException(429, "too many requests in flight, retry later", headers={"Retry-After": "1"})
+    return JSONResponse(body, status_code=status)
+
+
+def main():
+    import argparse
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve the workflow graphs over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""TTL cache and request coalescing for search tools (arxiv, wikipedia, tavily).
+
+`cached_tool(tool, ttl)` returns a tool with the same name, description and
+arguments whose results are looked up by a normalized query key: first in an
+in-process LRU, then in a SQLite file shared by every process. Expired rows
+are deleted as new ones are written, and the file keeps at most
+`TOOL_CACHE_MAX_ENTRIES`. Identical queries that arrive while the first one
+is still running wait for its result instead of sending their own request.
+An async request runs as a task of its own, so a caller that gives up (e.g.
+a tool timeout) leaves it running for the others and for the cache.
+
+`stub_search_tool` is a local stand-in backend with a configurable latency so
+hit rates and savings can be measured offline (see benchmarks/bench_tool_cache.py).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langchain_core.tools import StructuredTool
+
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE", "1") == "1"
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", ".tool_cache.sqlite")
+TOOL_CACHE_MEMORY_ITEMS = int(os.getenv("TOOL_CACHE_MEMORY_ITEMS", "512"))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "10000"))
+
+
+def normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {k: normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def tool_key(tool_name, args):
+    return hashlib.sha256(f"{tool_name}\0{json.dumps(normalize(args), sort_keys=True)}".encode("utf-8")).hexdigest()
+
+
+class ToolResultCache:
+    def __init__(self, path=TOOL_CACHE_PATH, memory_items=TOOL_CACHE_MEMORY_ITEMS, max_entries=TOOL_CACHE_MAX_ENTRIES):
+        self.memory_items = memory_items
+        self.max_entries = max_entries
+        self._memory = OrderedDict()     # key -> (expires_at, value)
+        self._inflight = {}              # key -> Future of the request already on its way
+        self._tasks = set()              # requests running on behalf of async callers
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache (key TEXT PRIMARY KEY, tool TEXT, value TEXT, expires REAL)"
+            )
+            self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _remember(self, key, expires, value):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return `(found, value)`."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return True, entry[1]
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value, expires FROM tool_cache WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.disk_hits += 1
+                    return True, value
+            return False, None
+
+    def put(self, key, tool_name, value, ttl):
+        now = time.time()
+        expires = now + ttl
+        with self._lock:
+            self._remember(key, expires, value)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?)",
+                                   (key, tool_name, json.dumps(value, default=str), expires))
+                self._evict(now)
+                self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired rows, then the ones closest to expiry beyond `max_entries`."""
+        expired = self._conn.execute("DELETE FROM tool_cache WHERE expires < ?", (now,)).rowcount
+        overflow = self._conn.execute(
+            "DELETE FROM tool_cache WHERE key IN ("
+            "SELECT key FROM tool_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + overflow
+
+    def _join(self, key):
+        """Return `(future, leader)`: the leader runs the request, everyone else waits on its future."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            self.misses += 1
+            return future, True
+
+    def _settle(self, key, future, tool_name, ttl, value=None, error=None):
+        if error is None:
+            self.put(key, tool_name, value, ttl)
+            future.set_result(value)
+        else:
+            # waiters must see a failed request, never a cancellation that is not theirs
+            future.set_exception(error if isinstance(error, Exception)
+                                 else RuntimeError(f"{tool_name} request was interrupted: {error!r}"))
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def call(self, tool_name, args, ttl, fetch):
+        key = tool_key(tool_name, args)
+        found, value = self.get(key)
+        if found:
+            return value
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            value = fetch()
+        except BaseException as e:
+            self._settle(key, future, tool_name, ttl, error=e)
+            raise
+        self._settle(key, future, tool_name, ttl, value=value)
+        return value
+
+    async def _fetch(self, key, future, tool_name, ttl, afetch):
+        try:
+            value = await afetch()
+        except BaseException as e:
+            # callers get the error through the future
+            self._settle(key, future, tool_name, ttl, error=e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        self._settle(key, future, tool_name, ttl, value=value)
+
+    async def acall(self, tool_name, args, ttl, afetch):
+        key = tool_key(tool_name, args)
+        found, value = self.get(key)
+        if found:
+            return value
+        future, leader = self._join(key)
+        if leader:
+            # the request runs as its own task: a caller that times out stops waiting, the request goes on
+            task = asyncio.ensure_future(self._fetch(key, future, tool_name, ttl, afetch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        # shielded, so cancelling one waiter does not cancel the shared future
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses + self.coalesced
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+_cache = None
+
+
+def get_tool_cache():
+    global _cache
+    if _cache is None:
+        _cache = ToolResultCache()
+    return _cache
+
+
+def cached_tool(tool, ttl, cache=None):
+    """Wrap `tool` so its results are cached for `ttl` seconds and identical in-flight calls are coalesced."""
+    if not TOOL_CACHE_ENABLED:
+        return tool
+    cache = cache or get_tool_cache()
+
+    def run(**kwargs):
+        return cache.call(tool.name, kwargs, ttl, lambda: tool.invoke(kwargs))
+
+    async def arun(**kwargs):
+        return await cache.acall(tool.name, kwargs, ttl, lambda: tool.ainvoke(kwargs))
+
+    return StructuredTool.from_function(func=run, coroutine=arun, name=tool.name,
+                                        description=tool.description, args_schema=tool.args_schema)
+
+
+def stub_search_tool(name, latency=0.5, jitter=0.2, result_chars=500):
+    """Offline stand-in for a search tool: sleeps like a remote backend and returns deterministic text.
+
+    The returned tool counts the requests that reached it in `tool.metadata["upstream_calls"]`.
+    """
+    def _result(query):
+        search.metadata["upstream_calls"] += 1
+        seed = int(hashlib.sha256(query.encode("utf-8")).hexdigest(), 16)
+        words = [f"w{(seed >> i) % 997}" for i in range(0, 256, 4)]
+        text = f"[{name}] results for {query!r}: " + " ".join(words)
+        return (text * (result_chars // len(text) + 1))[:result_chars]
+
+    def run(query: str) -> str:
+        time.sleep(max(0.0, random.gauss(latency, jitter)))
+        return _result(query)
+
+    async def arun(query: str) -> str:
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+        return _result(query)
+
+    search = StructuredTool.from_function(func=run, coroutine=arun, name=name, metadata={"upstream_calls": 0},
+                                          description=f"Search {name} for a query (local stub).")
+    return search
@@ -0,0 +1,302 @@
+"""Per-node timing of graph runs, exportable as JSONL, Prometheus text and Chrome traces.
+
+`NodeTracer` is a callback handler: pass it in the run config (or use
+`trace_config(config)`, which adds the shared tracer only when `TRACE=1`) and
+every node execution becomes a span with
+
+- queue wait: from the moment the node's step could start (all nodes of the
+  previous step finished) until the node actually started;
+- model latency, time to first token (streaming calls only) and prompt /
+  completion tokens of the chat model calls made inside the node;
+- size of the state the node received and the update it returned.
+
+A run named after a node and tagged with it (`langgraph_node` metadata) that
+another node starts ahead of time, like the sections the pipelined planner
+writes while the plan streams, gets a span of its own with `started_by` set.
+
+`export(prefix)` writes `<prefix>.jsonl`, `<prefix>.prom` and
+`<prefix>.trace.json`; open the last one in chrome://tracing or Perfetto to
+see parallel branches and Send workers side by side. A long-lived process
+keeps only the last `TRACE_MAX_SPANS` spans for the JSONL and Chrome exports;
+the Prometheus metrics are totals over every span. With `TRACE` unset no
+handler is registered, so an untraced run pays nothing.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from langchain_core.callbacks import BaseCallbackHandler, BaseCallbackManager
+
+TRACE_ENABLED = os.getenv("TRACE", "0") == "1"
+TRACE_PATH = os.getenv("TRACE_PATH", "traces/run")     # export prefix
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "10000"))   # spans kept for the JSONL and Chrome exports
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Prometheus counter -> value of one finished span
+COUNTERS = (
+    ("langgraph_node_queue_seconds_total", lambda s: s["queue_ms"] / 1000),
+    ("langgraph_node_model_seconds_total", lambda s: s["model_ms"] / 1000),
+    ("langgraph_node_model_calls_total", lambda s: len(s["model_calls"])),
+    ("langgraph_node_prompt_tokens_total", lambda s: s["prompt_tokens"]),
+    ("langgraph_node_completion_tokens_total", lambda s: s["completion_tokens"]),
+    ("langgraph_node_state_in_bytes_total", lambda s: s["state_in_bytes"]),
+    ("langgraph_node_state_out_bytes_total", lambda s: s["state_out_bytes"]),
+    ("langgraph_node_errors_total", lambda s: int(s["error"] is not None)),
+)
+
+
+def state_size(value):
+    """Approximate size in bytes of a state dict or update as JSON."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+def _usage(response):
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class NodeTracer(BaseCallbackHandler):
+    # record timestamps on the calling thread instead of an executor
+    run_inline = True
+
+    def __init__(self, max_spans=TRACE_MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)   # the latest finished node spans, in completion order
+        self._totals = {}        # node -> running totals over every finished span, for Prometheus
+        self._open = {}          # run id -> node span
+        self._graphs = {}        # graph run id -> start time
+        self._step_end = {}      # (graph run id, step) -> time the last node of that step ended
+        self._models = {}        # model run id -> model call record
+        self._parents = {}       # run id -> parent run id, for runs below a node
+        self._lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    # --- node spans ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        now = time.perf_counter()
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        with self._lock:
+            if parent_run_id is None or node is None:
+                self._graphs[run_id] = now
+                return
+            if kwargs.get("name") != node:
+                self._parents[run_id] = parent_run_id
+                return
+            step = metadata.get("langgraph_step", 0)
+            outer = self._node_of(parent_run_id)
+            if any(t.startswith("graph:step:") for t in tags or ()):
+                graph, started_by = parent_run_id, None
+                ready = self._step_end.get((graph, step - 1), self._graphs.get(graph, now))
+            elif outer is not None and outer["node"] != node:
+                # work another node started ahead for this one, e.g. sections written while the plan streams
+                graph, started_by, ready = outer["graph"], outer["node"], now
+            else:
+                self._parents[run_id] = parent_run_id
+                return
+            self._open[run_id] = {
+                "node": node,
+                "step": step,
+                "graph": graph,
+                "started_by": started_by,
+                "start": now,
+                "queue_ms": max(0.0, now - ready) * 1000,
+                "state_in_bytes": state_size(inputs),
+                "model_calls": [],
+            }
+
+    def _close(self, run_id, outputs=None, error=None):
+        now = time.perf_counter()
+        with self._lock:
+            self._parents.pop(run_id, None)
+            if self._graphs.pop(run_id, None) is not None:
+                self._step_end = {k: v for k, v in self._step_end.items() if k[0] != run_id}
+                return
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            if span["started_by"] is None:
+                key = (span["graph"], span["step"])
+                self._step_end[key] = max(self._step_end.get(key, now), now)
+            calls = span["model_calls"]
+            span.update({
+                "end": now,
+                "duration_ms": (now - span["start"]) * 1000,
+                "model_ms": sum(c["duration_ms"] for c in calls),
+                "ttft_ms": calls[0]["ttft_ms"] if calls else None,
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+                "state_out_bytes": state_size(outputs) if outputs is not None else 0,
+                "error": error,
+            })
+            self.spans.append(span)
+            self._add_to_totals(span)
+
+    def _add_to_totals(self, span):
+        totals = self._totals.setdefault(span["node"], {
+            "count": 0, "seconds": 0.0, "buckets": [0] * len(DURATION_BUCKETS), "counters": [0] * len(COUNTERS)})
+        seconds = span["duration_ms"] / 1000
+        totals["count"] += 1
+        totals["seconds"] += seconds
+        for i, bound in enumerate(DURATION_BUCKETS):
+            totals["buckets"][i] += seconds <= bound
+        for i, (_, value) in enumerate(COUNTERS):
+            totals["counters"][i] += value(span)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._close(run_id, outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._close(run_id, error=type(error).__name__)
+
+    # --- model calls inside a node ---
+
+    def _node_of(self, run_id):
+        while run_id is not None and run_id not in self._open:
+            run_id = self._parents.get(run_id)
+        return self._open.get(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            span = self._node_of(parent_run_id)
+            if span is not None:
+                self._models[run_id] = {"span": span, "start": time.perf_counter(), "first_token": None}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self._models.get(run_id)
+        if call is not None and call["first_token"] is None:
+            call["first_token"] = time.perf_counter()
+
+    def _model_done(self, run_id, prompt_tokens=0, completion_tokens=0):
+        now = time.perf_counter()
+        with self._lock:
+            call = self._models.pop(run_id, None)
+            if call is None:
+                return
+            call["span"]["model_calls"].append({
+                "start": call["start"],
+                "end": now,
+                "duration_ms": (now - call["start"]) * 1000,
+                "ttft_ms": (call["first_token"] - call["start"]) * 1000 if call["first_token"] else None,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            })
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._model_done(run_id, *_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._model_done(run_id)
+
+    # --- export ---
+
+    def records(self):
+        """Finished spans with times relative to the tracer's creation, in seconds."""
+        with self._lock:
+            spans = list(self.spans)
+        rows = []
+        for span in spans:
+            row = {k: v for k, v in span.items() if k not in ("start", "end", "model_calls")}
+            row["graph"] = str(span["graph"])
+            row["start_s"] = span["start"] - self.origin
+            row["model_calls"] = [
+                {**{k: v for k, v in c.items() if k not in ("start", "end")}, "start_s": c["start"] - self.origin}
+                for c in span["model_calls"]
+            ]
+            rows.append(row)
+        return rows
+
+    def to_jsonl(self):
+        return "".join(json.dumps(row) + "\n" for row in self.records())
+
+    def to_prometheus(self):
+        with self._lock:
+            totals = {node: {**t, "buckets": list(t["buckets"]), "counters": list(t["counters"])}
+                      for node, t in self._totals.items()}
+        lines = [
+            "# TYPE langgraph_node_duration_seconds histogram",
+        ]
+        for node, t in sorted(totals.items()):
+            for bound, count in zip(DURATION_BUCKETS, t["buckets"]):
+                lines.append(f'langgraph_node_duration_seconds_bucket{{node="{node}",le="{bound}"}} {count}')
+            lines.append(f'langgraph_node_duration_seconds_bucket{{node="{node}",le="+Inf"}} {t["count"]}')
+            lines.append(f'langgraph_node_duration_seconds_sum{{node="{node}"}} {t["seconds"]:.6f}')
+            lines.append(f'langgraph_node_duration_seconds_count{{node="{node}"}} {t["count"]}')
+        for i, (metric, _) in enumerate(COUNTERS):
+            lines.append(f"# TYPE {metric} counter")
+            for node, t in sorted(totals.items()):
+                lines.append(f'{metric}{{node="{node}"}} {t["counters"][i]:g}')
+        return "\n".join(lines) + "\n"
+
+    def to_chrome_trace(self):
+        """Trace-event JSON; overlapping nodes get their own rows so fan-out is visible."""
+        events, lanes = [], []     # lanes: end time of the last span on each row
+        for row in sorted(self.records(), key=lambda r: r["start_s"]):
+            start, end = row["start_s"], row["start_s"] + row["duration_ms"] / 1000
+            lane = next((i for i, busy_until in enumerate(lanes) if busy_until <= start), len(lanes))
+            if lane == len(lanes):
+                lanes.append(end)
+            lanes[lane] = end
+            args = {k: row[k] for k in ("step", "started_by", "queue_ms", "model_ms", "ttft_ms", "prompt_tokens",
+                                        "completion_tokens", "state_in_bytes", "state_out_bytes", "error")}
+            events.append({"name": row["node"], "cat": "node", "ph": "X", "pid": 1, "tid": lane,
+                           "ts": start * 1e6, "dur": row["duration_ms"] * 1000, "args": args})
+            for call in row["model_calls"]:
+                events.append({"name": "model", "cat": "llm", "ph": "X", "pid": 1, "tid": lane,
+                               "ts": call["start_s"] * 1e6, "dur": call["duration_ms"] * 1000,
+                               "args": {k: call[k] for k in ("ttft_ms", "prompt_tokens", "completion_tokens")}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, prefix=TRACE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        with open(prefix + ".jsonl", "w") as f:
+            f.write(self.to_jsonl())
+        with open(prefix + ".prom", "w") as f:
+            f.write(self.to_prometheus())
+        with open(prefix + ".trace.json", "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return prefix
+
+
+_tracer = None
+
+
+def get_tracer():
+    """The process-wide tracer, or None when `TRACE` is off."""
+    global _tracer
+    if TRACE_ENABLED and _tracer is None:
+        _tracer = NodeTracer()
+    return _tracer
+
+
+def trace_config(config=None):
+    """Return `config` with the shared tracer added to its callbacks when tracing is on."""
+    config = dict(config or {})
+    tracer = get_tracer()
+    if tracer is None:
+        return config
+    callbacks = config.get("callbacks")
+    if isinstance(callbacks, BaseCallbackManager):
+        # a parent run's manager: add to a copy, so the caller's manager is left as it was
+        callbacks = callbacks.copy()
+        callbacks.add_handler(tracer, inherit=True)
+        config["callbacks"] = callbacks
+    else:
+        config["callbacks"] = list(callbacks or []) + [tracer]
+    return config
+
+
+def export_traces(prefix=TRACE_PATH):
+    if _tracer is not None:
+        print(f"Traces written to {_tracer.export(prefix)}.{{jsonl,prom,trace.json}}")